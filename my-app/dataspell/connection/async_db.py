@@ -0,0 +1,408 @@
+"""
+asyncio query helpers for DataSpell.
+This file provides async counterparts to db_config.get_connection() and
+db_config.query_to_dataframe().
+
+Connections use psycopg2's native asynchronous mode and are polled from the
+running event loop, so many queries can be awaited concurrently:
+
+    dfs = await asyncio.gather(
+        query_to_dataframe_async("SELECT ..."),
+        query_to_dataframe_async("SELECT ..."),
+    )
+
+A query that times out or whose task is cancelled is also cancelled on the
+server, so abandoned dashboard queries do not keep running.
+"""
+
+import asyncio
+import time
+import warnings
+import weakref
+from contextlib import asynccontextmanager
+
+from db_config import DB_PARAMS, POOL_PARAMS, PoolTimeoutError, _connect_params, _pool_key
+
+
+async def _wait_fd(fileno, writable=False):
+    """Wait until a socket is readable (or writable)."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def ready():
+        if not future.done():
+            future.set_result(None)
+
+    if writable:
+        loop.add_writer(fileno, ready)
+    else:
+        loop.add_reader(fileno, ready)
+    try:
+        await future
+    finally:
+        if writable:
+            loop.remove_writer(fileno)
+        else:
+            loop.remove_reader(fileno)
+
+
+async def _wait(conn):
+    """Drive an asynchronous psycopg2 connection until its current operation completes."""
+    from psycopg2 import extensions
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            return
+        if state == extensions.POLL_READ:
+            await _wait_fd(conn.fileno())
+        elif state == extensions.POLL_WRITE:
+            await _wait_fd(conn.fileno(), writable=True)
+        else:
+            raise RuntimeError(f"Unexpected connection poll state: {state}")
+
+
+async def _cancel_and_drain(conn):
+    """Ask the server to cancel the running statement and consume its error response."""
+    import psycopg2
+
+    try:
+        conn.cancel()
+    except psycopg2.Error:
+        return
+
+    try:
+        await _wait(conn)
+    except psycopg2.Error:
+        # Expected: QueryCanceled once the server has stopped the statement
+        pass
+
+
+async def connect_async(params=None):
+    """
+    Open a new, unpooled asynchronous psycopg2 connection.
+
+    Args:
+        params (dict): DB_PARAMS-style connection parameters (default: DB_PARAMS)
+
+    Returns:
+        psycopg2 connection object in asynchronous mode
+    """
+    import psycopg2
+
+    conn = psycopg2.connect(async_=True, **_connect_params(params or DB_PARAMS))
+    try:
+        await _wait(conn)
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+async def execute_async(conn, query, params=None, timeout=None):
+    """
+    Run a statement on an asynchronous connection.
+
+    If the timeout expires or the awaiting task is cancelled, the statement
+    is cancelled on the server before the exception propagates.
+
+    Args:
+        conn: Asynchronous psycopg2 connection
+        query (str): SQL statement
+        params (tuple or dict): Query parameters
+        timeout (float): Seconds to wait for the statement (default: no limit)
+
+    Returns:
+        psycopg2 cursor holding the results
+    """
+    cur = conn.cursor()
+    cur.execute(query, params)
+    try:
+        if timeout is None:
+            await _wait(conn)
+        else:
+            await asyncio.wait_for(_wait(conn), timeout)
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        await _cancel_and_drain(conn)
+        raise
+    return cur
+
+
+class AsyncConnectionPool:
+    """
+    Pool of asynchronous psycopg2 connections to a single database.
+
+    Uses the same size, idle and health-check settings as the synchronous
+    pool (see db_config.POOL_PARAMS). A pool belongs to the event loop it was
+    created in (see get_async_pool).
+    """
+
+    def __init__(self, params, maxconn=10, max_idle_seconds=300,
+                 health_check_after_seconds=30, acquire_timeout_seconds=30, **_):
+        self.params = dict(params)
+        self.maxconn = maxconn
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_after_seconds = health_check_after_seconds
+        self.acquire_timeout_seconds = acquire_timeout_seconds
+
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._slots = asyncio.Semaphore(maxconn)
+        self._loop = asyncio.get_running_loop()
+
+    async def acquire(self, timeout=None):
+        """
+        Check an asynchronous connection out of the pool.
+
+        Args:
+            timeout (float): Seconds to wait for a free connection
+                (default: acquire_timeout_seconds)
+
+        Returns:
+            psycopg2 connection object in asynchronous mode
+        """
+        if timeout is None:
+            timeout = self.acquire_timeout_seconds
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeoutError(
+                f"No async connection available after {timeout}s (maxconn={self.maxconn})"
+            )
+
+        try:
+            while self._idle:
+                conn, last_used = self._idle.pop()
+                if await self._is_healthy(conn, last_used):
+                    return conn
+                conn.close()
+            return await connect_async(self.params)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool, dropping it if it is broken or mid-statement."""
+        try:
+            if conn.closed or conn.isexecuting():
+                conn.close()
+            else:
+                self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def release_leaked(self, conn):
+        """
+        Take back a connection whose holder was garbage collected without releasing it.
+
+        Its state is unknown, so it is closed; the slot is freed on the pool's loop.
+        """
+        conn.close()
+        if self._loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._slots.release()
+        else:
+            self._loop.call_soon_threadsafe(self._slots.release)
+
+    def close(self):
+        """Close all idle connections."""
+        idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+    async def _is_healthy(self, conn, last_used):
+        idle_for = time.monotonic() - last_used
+        if conn.closed or (self.max_idle_seconds and idle_for > self.max_idle_seconds):
+            return False
+        if idle_for < self.health_check_after_seconds:
+            return True
+
+        try:
+            await execute_async(conn, "SELECT 1;", timeout=self.acquire_timeout_seconds)
+            return True
+        except Exception:
+            return False
+
+
+class AsyncPooledConnection:
+    """
+    Proxy around a pooled asynchronous connection.
+
+    close() (or leaving "async with") returns the connection to the pool
+    instead of disconnecting. A proxy that is garbage collected while still
+    holding its connection gives the pool slot back and emits a ResourceWarning.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise AttributeError(f"'{name}' is not available on a released pooled connection")
+        return getattr(self._conn, name)
+
+    @property
+    def closed(self):
+        return self._conn is None or self._conn.closed
+
+    @property
+    def raw_connection(self):
+        """The underlying psycopg2 connection."""
+        return self._conn
+
+    def close(self):
+        """Return the connection to the pool."""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            return
+        self._conn = None
+        warnings.warn("Pooled async connection was garbage collected without close(); "
+                      "use 'async with' or call close()", ResourceWarning, stacklevel=2)
+        try:
+            self._pool.release_leaked(conn)
+        except Exception:
+            pass
+
+
+# Event loop -> {pool key: AsyncConnectionPool}. Pools (and their semaphores
+# and connections) only work on the loop that created them, so every loop,
+# e.g. each asyncio.run() in a notebook kernel, gets its own.
+_async_pools = weakref.WeakKeyDictionary()
+
+
+def get_async_pool(params=None):
+    """
+    Get the running event loop's asynchronous pool for a set of connection parameters.
+
+    Pools of event loops that have been closed are closed and dropped.
+
+    Args:
+        params (dict): DB_PARAMS-style connection parameters (default: DB_PARAMS)
+
+    Returns:
+        AsyncConnectionPool: Pool for those parameters, created on first use
+
+    Raises:
+        RuntimeError: If called outside a running event loop
+    """
+    loop = asyncio.get_running_loop()
+    for other_loop in [other for other in list(_async_pools) if other.is_closed()]:
+        for pool in _async_pools.pop(other_loop).values():
+            pool.close()
+
+    params = params or DB_PARAMS
+    key = _pool_key(params)
+    pools = _async_pools.setdefault(loop, {})
+    pool = pools.get(key)
+    if pool is None:
+        pool = AsyncConnectionPool(params, **POOL_PARAMS)
+        pools[key] = pool
+    return pool
+
+
+def close_async_pool():
+    """Close every asynchronous connection pool, of every event loop."""
+    pools = [pool for loop_pools in list(_async_pools.values()) for pool in loop_pools.values()]
+    _async_pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+async def get_connection_async():
+    """
+    Get an asynchronous connection to the PostgreSQL database.
+
+    Async counterpart to db_config.get_connection(): the connection comes
+    from the async pool and close() hands it back. Async connections run in
+    autocommit mode; run statements on them with execute_async().
+
+    Returns:
+        AsyncPooledConnection: Pooled asynchronous connection
+    """
+    pool = get_async_pool()
+    return AsyncPooledConnection(pool, await pool.acquire())
+
+
+@asynccontextmanager
+async def async_connection():
+    """
+    Async context manager that checks a connection out of the async pool.
+
+    Yields:
+        psycopg2 connection object in asynchronous mode
+    """
+    pool = get_async_pool()
+    conn = await pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+async def query_to_dataframe_async(query, params=None, timeout=None):
+    """
+    Execute a SQL query asynchronously and return the results as a pandas DataFrame.
+
+    Args:
+        query (str): SQL query to execute
+        params (tuple or dict): Query parameters
+        timeout (float): Seconds before the query is cancelled on the server
+            and asyncio.TimeoutError is raised (default: no limit)
+
+    Returns:
+        pandas.DataFrame: Query results
+    """
+    import pandas as pd
+
+    async with async_connection() as conn:
+        cur = await execute_async(conn, query, params, timeout=timeout)
+        try:
+            columns = [col.name for col in cur.description]
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+
+    return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+
+async def gather_dataframes(queries, timeout=None):
+    """
+    Run several queries concurrently and collect their results.
+
+    Total time is roughly that of the slowest query (bounded by the pool size).
+    If any query fails, the others are cancelled on the server.
+
+    Args:
+        queries (dict): Mapping of name -> SQL query
+        timeout (float): Per-query timeout in seconds
+
+    Returns:
+        dict: Mapping of name -> pandas.DataFrame
+    """
+    names = list(queries)
+    tasks = [asyncio.ensure_future(query_to_dataframe_async(queries[name], timeout=timeout))
+             for name in names]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return dict(zip(names, results))
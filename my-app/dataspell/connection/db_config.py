@@ -1,8 +1,26 @@
 """
 Database connection configuration for DataSpell.
 This file provides connection parameters for PostgreSQL database.
+
+Connections handed out by get_connection() come from a process-wide pool,
+so notebooks and report jobs that run many queries back to back reuse the
+same server sessions instead of paying connection setup for every query.
 """
 
+import atexit
+import functools
+import hashlib
+import io
+import itertools
+import os
+import re
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
 # PostgreSQL connection parameters
 DB_PARAMS = {
     'host': 'localhost',
@@ -19,41 +37,1063 @@ SQLALCHEMY_CONNECTION_STRING = (
     f"{DB_PARAMS['host']}:{DB_PARAMS['port']}/{DB_PARAMS['database']}"
 )
 
+# Connection pool settings (change with configure_pool())
+POOL_PARAMS = {
+    'minconn': 1,                       # Idle connections kept open even when unused
+    'maxconn': 10,                      # Upper bound on open connections per database
+    'max_idle_seconds': 300,            # Close idle connections above minconn after this long
+    'health_check_after_seconds': 30,   # Ping connections that sat idle for longer than this
+    'acquire_timeout_seconds': 30,      # How long to wait for a free connection
+}
+
+# Read-only replica endpoints for analytics queries (set with configure_replicas()).
+# Each entry is a DB_PARAMS-style dict; missing keys default to DB_PARAMS, and an
+# optional 'weight' (default 1) biases load balancing towards larger replicas.
+REPLICA_PARAMS = []
+
+# Replica routing settings (change with configure_replicas())
+REPLICA_ROUTING = {
+    'max_lag_seconds': 30,              # Skip replicas further behind the primary than this
+    'lag_check_interval_seconds': 10,   # How often each replica's lag is re-measured
+    'retry_down_after_seconds': 30,     # How long an unreachable replica is skipped
+    'probe_timeout_seconds': 2,         # Connect and statement timeout of a lag probe
+}
+
+# Default number of rows per DataFrame chunk for streaming queries
+DEFAULT_CHUNKSIZE = 50000
+
+# Server-side prepared statements kept per pooled connection (least recently used are deallocated)
+MAX_PREPARED_STATEMENTS = 100
+
+# PostgreSQL type OIDs, used to pick column dtypes for COPY-based loading
+_FLOAT_OIDS = {700, 701, 1700}           # float4, float8, numeric
+_INTEGER_OIDS = {20, 21, 23, 26}         # int8, int2, int4, oid
+_BOOL_OIDS = {16}
+_TIMESTAMP_OIDS = {1082, 1114}           # date, timestamp
+_TIMESTAMPTZ_OIDS = {1184}
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+def _connect_params(params):
+    """Return the subset of a DB_PARAMS-style dict that psycopg2.connect() accepts."""
+    return {
+        'host': params['host'],
+        'port': params['port'],
+        'database': params['database'],
+        'user': params['user'],
+        'password': params['password'],
+    }
+
+
+def _connect(params=None, **options):
+    """Open a new, unpooled psycopg2 connection (options are passed to psycopg2.connect)."""
+    import psycopg2
+
+    return psycopg2.connect(**_connect_params(params or DB_PARAMS), **options)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections to a single database.
+
+    Idle connections are reused last-in first-out, pinged before reuse when
+    they have been idle for a while, and closed once they have been idle for
+    longer than max_idle_seconds (never dropping below minconn).
+    """
+
+    def __init__(self, params, minconn=1, maxconn=10, max_idle_seconds=300,
+                 health_check_after_seconds=30, acquire_timeout_seconds=30):
+        if maxconn < 1 or minconn < 0 or minconn > maxconn:
+            raise ValueError("Pool sizes must satisfy 0 <= minconn <= maxconn and maxconn >= 1")
+
+        self.params = dict(params)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_after_seconds = health_check_after_seconds
+        self.acquire_timeout_seconds = acquire_timeout_seconds
+
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._size = 0   # Open connections, idle or checked out
+        self._closed = False
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+
+    def acquire(self, timeout=None):
+        """
+        Check a raw connection out of the pool.
+
+        Args:
+            timeout (float): Seconds to wait for a free connection
+                (default: acquire_timeout_seconds)
+
+        Returns:
+            psycopg2 connection object
+        """
+        if timeout is None:
+            timeout = self.acquire_timeout_seconds
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeoutError("Connection pool is closed")
+
+                self._evict_idle_locked()
+
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+
+                if self._size < self.maxconn:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"No connection available after {timeout}s "
+                        f"(maxconn={self.maxconn})"
+                    )
+                self._cond.wait(remaining)
+
+        if conn is not None and self._is_healthy(conn, last_used):
+            return conn
+
+        if conn is not None:
+            self._close_quietly(conn)
+
+        try:
+            return _connect(self.params)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool, resetting any open transaction."""
+        if os.getpid() != self._pid:
+            # Inherited from a parent process; leave its socket alone.
+            return
+
+        try:
+            reusable = self._reset(conn)
+        except Exception:
+            reusable = False
+
+        with self._cond:
+            if reusable and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+            self._cond.notify()
+
+        if not reusable or self._closed:
+            self._close_quietly(conn)
+
+    def close(self):
+        """Close all idle connections and refuse new checkouts."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+
+        if os.getpid() == self._pid:
+            for conn, _ in idle:
+                self._close_quietly(conn)
+
+    def stats(self):
+        """Return a dict with the current pool occupancy."""
+        with self._cond:
+            return {
+                'open': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'maxconn': self.maxconn,
+            }
+
+    def _evict_idle_locked(self):
+        """Close connections idle for longer than max_idle_seconds (caller holds the lock)."""
+        if not self.max_idle_seconds:
+            return
+
+        cutoff = time.monotonic() - self.max_idle_seconds
+        # The oldest idle connections sit at the front of the list
+        while (self._idle and self._size > self.minconn
+               and self._idle[0][1] < cutoff):
+            conn, _ = self._idle.pop(0)
+            self._size -= 1
+            self._close_quietly(conn)
+
+    def _is_healthy(self, conn, last_used):
+        """Check that an idle connection is still usable before handing it out."""
+        if conn.closed:
+            return False
+
+        if time.monotonic() - last_used < self.health_check_after_seconds:
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _reset(self, conn):
+        """Bring a returned connection back to a clean state; False if it should be dropped."""
+        from psycopg2 import extensions
+
+        if conn.closed:
+            return False
+
+        status = conn.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        if conn.autocommit:
+            conn.autocommit = False
+        if conn.isolation_level is not None or conn.readonly is not None or conn.deferrable is not None:
+            conn.set_session(isolation_level='DEFAULT', readonly='DEFAULT', deferrable='DEFAULT')
+
+        return True
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class PooledConnection:
+    """
+    Proxy around a pooled psycopg2 connection.
+
+    Behaves like the underlying connection, except that close() hands the
+    connection back to the pool instead of closing the server session.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise AttributeError(f"'{name}' is not available on a released pooled connection")
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        # Settings such as autocommit must reach the real connection
+        if name in ('_pool', '_conn'):
+            object.__setattr__(self, name, value)
+        elif self._conn is None:
+            raise AttributeError(f"'{name}' cannot be set on a released pooled connection")
+        else:
+            setattr(self._conn, name, value)
+
+    @property
+    def closed(self):
+        return self._conn is None or self._conn.closed
+
+    @property
+    def raw_connection(self):
+        """The underlying psycopg2 connection."""
+        return self._conn
+
+    @property
+    def endpoint(self):
+        """Name of the database endpoint this connection belongs to."""
+        return _endpoint_name(self._pool.params)
+
+    def close(self):
+        """Return the connection to the pool."""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __enter__(self):
+        # Same transaction semantics as "with psycopg2_connection:"
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(params):
+    return tuple(sorted(_connect_params(params).items()))
+
+
+def get_pool(params=None):
+    """
+    Get the process-wide connection pool for a set of connection parameters.
+
+    Args:
+        params (dict): DB_PARAMS-style connection parameters (default: DB_PARAMS)
+
+    Returns:
+        ConnectionPool: Pool for those parameters, created on first use
+    """
+    params = params or DB_PARAMS
+    key = _pool_key(params)
+
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._pid != os.getpid() or pool._closed:
+            pool = ConnectionPool(params, **POOL_PARAMS)
+            _pools[key] = pool
+        return pool
+
+
+def configure_pool(**settings):
+    """
+    Change connection pool settings.
+
+    Existing pools are closed so the new settings apply to the next checkout.
+
+    Args:
+        **settings: Any of the keys in POOL_PARAMS
+    """
+    unknown = set(settings) - set(POOL_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown pool settings: {', '.join(sorted(unknown))}")
+
+    POOL_PARAMS.update(settings)
+    close_pool()
+
+
+def close_pool():
+    """Close every connection pool in this process."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_pool)
+
+
 # psycopg2 connection function
-def get_connection():
+def get_connection(pooled=True):
     """
     Get a connection to the PostgreSQL database using psycopg2.
-    
+
+    The connection is checked out of the process-wide pool; calling close()
+    on it returns it to the pool rather than disconnecting.
+
+    Args:
+        pooled (bool): Set to False to open a dedicated connection that is
+            really closed by close()
+
     Returns:
         psycopg2 connection object
     """
-    import psycopg2
-    
-    conn = psycopg2.connect(
-        host=DB_PARAMS['host'],
-        port=DB_PARAMS['port'],
-        database=DB_PARAMS['database'],
-        user=DB_PARAMS['user'],
-        password=DB_PARAMS['password']
-    )
-    
-    return conn
+    if not pooled:
+        return _connect()
+
+    pool = get_pool()
+    return PooledConnection(pool, pool.acquire())
+
+
+@contextmanager
+def connection(readonly=False):
+    """
+    Context manager that checks a connection out of the pool and returns it afterwards.
+
+    Args:
+        readonly (bool): Route to a read replica when replicas are configured
+            (see get_read_connection)
+
+    Yields:
+        psycopg2 connection object
+    """
+    conn = get_read_connection() if readonly else get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _endpoint_name(params):
+    return params.get('name') or f"{params['host']}:{params['port']}"
+
+
+class ReplicaRouter:
+    """
+    Chooses a read replica for each read-only checkout.
+
+    Replicas whose replay lag exceeds max_lag_seconds, or that could not be
+    reached recently, are skipped. Among the rest, the one with the fewest
+    connections in use per unit of weight is preferred, with ties rotated
+    round-robin.
+    """
+
+    def __init__(self, replicas, max_lag_seconds=30, lag_check_interval_seconds=10,
+                 retry_down_after_seconds=30, probe_timeout_seconds=2):
+        self.endpoints = [{**DB_PARAMS, **replica} for replica in replicas]
+        self.max_lag_seconds = max_lag_seconds
+        self.lag_check_interval_seconds = lag_check_interval_seconds
+        self.retry_down_after_seconds = retry_down_after_seconds
+        self.probe_timeout_seconds = probe_timeout_seconds
+
+        self._status = {}  # pool key -> (checked_at, lag seconds or None when down)
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+
+    def candidates(self):
+        """Return the replicas eligible for a read, most preferred first."""
+        eligible = []
+        for params in self.endpoints:
+            lag = self.lag(params)
+            if lag is not None and lag <= self.max_lag_seconds:
+                eligible.append(params)
+        if not eligible:
+            return []
+
+        # Rotate before sorting so equally loaded replicas take turns
+        offset = next(self._turn) % len(eligible)
+        eligible = eligible[offset:] + eligible[:offset]
+        return sorted(eligible, key=lambda p: get_pool(p).stats()['in_use'] / p.get('weight', 1))
+
+    def lag(self, params):
+        """Return the replica's cached replay lag in seconds, or None if it is down."""
+        key = _pool_key(params)
+        now = time.monotonic()
+        with self._lock:
+            checked_at, lag = self._status.get(key, (None, None))
+
+        if checked_at is not None:
+            max_age = (self.lag_check_interval_seconds if lag is not None
+                       else self.retry_down_after_seconds)
+            if now - checked_at < max_age:
+                return lag
+
+        lag = self._measure_lag(params)
+        with self._lock:
+            self._status[key] = (now, lag)
+        return lag
+
+    def mark_down(self, params):
+        """Skip a replica until retry_down_after_seconds have passed."""
+        with self._lock:
+            self._status[_pool_key(params)] = (time.monotonic(), None)
+
+    def status(self):
+        """Return name, lag and connections in use for each replica."""
+        return [
+            {
+                'endpoint': _endpoint_name(params),
+                'lag_seconds': self.lag(params),
+                'in_use': get_pool(params).stats()['in_use'],
+                'weight': params.get('weight', 1),
+            }
+            for params in self.endpoints
+        ]
+
+    def _measure_lag(self, params):
+        """
+        Replay lag of a standby (0 when caught up or not in recovery); None if unreachable.
+
+        The probe opens its own short-lived connection instead of borrowing one
+        from the replica's pool, so a replica that is merely busy serving reads
+        is not mistaken for one that is down.
+        """
+        timeout = max(1, int(self.probe_timeout_seconds))
+        try:
+            conn = _connect(params, connect_timeout=timeout,
+                            options=f"-c statement_timeout={timeout * 1000}")
+        except Exception:
+            return None
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT CASE
+                        WHEN NOT pg_is_in_recovery() THEN 0
+                        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                    END;
+                """)
+                return float(cur.fetchone()[0])
+        except Exception:
+            return None
+        finally:
+            conn.close()
+
+
+_replica_router = None
+_routing = threading.local()
+
+
+def configure_replicas(replicas, **settings):
+    """
+    Route read-only queries to a list of replica endpoints.
+
+    Args:
+        replicas (list): DB_PARAMS-style dicts (e.g. [{'host': 'replica1', 'port': 5433}]);
+            an empty list sends everything to the primary again
+        **settings: Any of the keys in REPLICA_ROUTING
+    """
+    global _replica_router
+
+    unknown = set(settings) - set(REPLICA_ROUTING)
+    if unknown:
+        raise ValueError(f"Unknown replica routing settings: {', '.join(sorted(unknown))}")
+
+    REPLICA_ROUTING.update(settings)
+    REPLICA_PARAMS[:] = list(replicas)
+    _replica_router = ReplicaRouter(REPLICA_PARAMS, **REPLICA_ROUTING) if REPLICA_PARAMS else None
+
+
+def replica_status():
+    """Return lag and load for each configured replica (empty when none are configured)."""
+    if _replica_router is None:
+        return []
+    return _replica_router.status()
+
+
+@contextmanager
+def use_primary():
+    """Send read-only queries in this block (and thread) to the primary, e.g. to read your own writes."""
+    previous = getattr(_routing, 'primary', False)
+    _routing.primary = True
+    try:
+        yield
+    finally:
+        _routing.primary = previous
+
+
+def get_read_connection():
+    """
+    Get a pooled connection for read-only queries.
+
+    Uses the least loaded replica that is reachable and within the lag limit,
+    and falls back to the primary when no replica qualifies.
+
+    Returns:
+        psycopg2 connection object
+    """
+    router = _replica_router
+    if router is None or getattr(_routing, 'primary', False):
+        return get_connection()
+
+    for params in router.candidates():
+        pool = get_pool(params)
+        try:
+            return PooledConnection(pool, pool.acquire())
+        except Exception:
+            router.mark_down(params)
+
+    return get_connection()
+
+
+# Query result cache, off until enable_cache() is called
+_query_cache = None
+
+
+def enable_cache(max_bytes=256 * 1024 * 1024, cache_dir=None, default_ttl=3600):
+    """
+    Turn on result caching for query_to_dataframe().
+
+    Results are cached by normalized SQL in memory (LRU within max_bytes) and
+    spilled to Parquet files under cache_dir, so repeated notebook runs do not
+    hit the database again until the TTL expires or the tables are invalidated.
+
+    Args:
+        max_bytes (int): Memory budget for cached results
+        cache_dir (str or Path): Directory for the Parquet tier
+            (default: query_cache.DEFAULT_CACHE_DIR); pass False for memory only
+        default_ttl (float): Seconds a cached result stays valid
+
+    Returns:
+        QueryCache: The active cache
+    """
+    global _query_cache
+    from query_cache import DEFAULT_CACHE_DIR, QueryCache
+
+    if cache_dir is None:
+        cache_dir = DEFAULT_CACHE_DIR
+    _query_cache = QueryCache(max_bytes=max_bytes, cache_dir=cache_dir, default_ttl=default_ttl)
+    return _query_cache
+
+
+def disable_cache():
+    """Turn off result caching (cached files on disk are kept)."""
+    global _query_cache
+    _query_cache = None
+
+
+def invalidate_cache(*tables):
+    """
+    Drop cached results that read from the given tables (all results if none are given).
+
+    Returns:
+        int: Number of cache entries removed
+    """
+    if _query_cache is None:
+        return 0
+    return _query_cache.invalidate(*tables)
+
+
+def cache_stats():
+    """Return the result cache hit/miss statistics, or None if caching is off."""
+    if _query_cache is None:
+        return None
+    return _query_cache.stats()
+
+
+# Query instrumentation, off until enable_instrumentation() is called
+_recorder = None
+
+
+def enable_instrumentation(sink=None, explain=False):
+    """
+    Record metrics for every query run through the db_config helpers.
+
+    Each call records wall time, pool wait, execute time, rows, approximate
+    bytes and the calling site (see query_metrics.py for all fields).
+
+    Args:
+        sink: Where records go. An object with a write(record) method, a path
+            to a JSON Lines file, or None for an in-memory MemorySink
+        explain (bool): Also capture EXPLAIN (ANALYZE, BUFFERS) plans and server
+            execution time. Read-only queries are run a second time to do this.
+
+    Returns:
+        The sink, e.g. for MemorySink.summary()
+    """
+    global _recorder
+    from query_metrics import JsonlSink, MemorySink, QueryRecorder
+
+    if sink is None:
+        sink = MemorySink()
+    elif isinstance(sink, (str, os.PathLike)):
+        sink = JsonlSink(sink)
+    _recorder = QueryRecorder(sink, explain=explain)
+    return sink
+
+
+def disable_instrumentation():
+    """Stop recording query metrics."""
+    global _recorder
+    _recorder = None
+
+
+def _measure(query, loader, params=None):
+    """Start measuring a query call (a no-op measurement when instrumentation is off)."""
+    if _recorder is None:
+        from query_metrics import NULL_MEASUREMENT
+        return NULL_MEASUREMENT
+    return _recorder.measure(query, loader, params)
+
 
 # pandas read_sql helper function
-def query_to_dataframe(query):
+def query_to_dataframe(query, params=None, chunksize=None, use_cache=True, ttl=None,
+                       compact=False, prepare=False):
     """
     Execute a SQL query and return the results as a pandas DataFrame.
-    
+
+    Args:
+        query (str): SQL query to execute, with %s or %(name)s placeholders
+            when params are given
+        params (tuple or dict): Values bound to the placeholders
+        chunksize (int): If given, stream the results instead and return an
+            iterator of DataFrames with at most this many rows (see stream_query)
+        use_cache (bool): Read and store the result in the cache when
+            enable_cache() is active
+        ttl (float): Seconds to keep this result cached (default: the cache's default_ttl)
+        compact (bool): Convert the result to memory-compact dtypes
+            (see portal_dtypes.compact_dataframe)
+        prepare (bool): Run the query as a server-side prepared statement that
+            is reused on the same pooled connection. Queries the server cannot
+            prepare (e.g. a bare "SELECT %s", whose type it cannot infer) fall
+            back to client-side binding.
+
+    Returns:
+        pandas.DataFrame: Query results
+    """
+    import pandas as pd
+
+    if chunksize is not None:
+        return stream_query(query, chunksize=chunksize, params=params)
+
+    cache = _query_cache if use_cache else None
+    with _measure(query, 'read_sql', params) as measurement:
+        df = cache.get(query, params) if cache is not None else None
+        if df is not None:
+            measurement.note(loader='cache')
+            measurement.add_dataframe(df)
+        else:
+            with connection(readonly=True) as conn:
+                measurement.connected(conn)
+                prepared = _prepared_execute(conn, query, params) if prepare else None
+                if prepared is not None:
+                    measurement.note(loader='prepared')
+                    statement, values = prepared
+                    df = pd.read_sql(statement, measurement.wrap(conn), params=values)
+                else:
+                    df = pd.read_sql(query, measurement.wrap(conn), params=params)
+                measurement.add_dataframe(df)
+                measurement.capture_plan(conn)
+
+            if cache is not None:
+                cache.put(query, df, params=params, ttl=ttl)
+
+    return _compact(df) if compact else df
+
+
+# %s and %(name)s placeholders (psycopg2 paramstyle) and escaped %%, after any
+# string literal, quoted identifier or comment (copied apart from %% escapes)
+_PLACEHOLDER_RE = re.compile(
+    r"(?P<skip>\b[Ee]'(?:[^'\\]|\\.|'')*'|'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\""
+    r"|\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?\$(?P=tag)\$|--[^\n]*|/\*.*?\*/)"
+    r"|%%|%s|%\((?P<name>\w+)\)s",
+    re.S,
+)
+
+# Statements prepared on each raw connection, in least-recently-used order
+_prepared_by_connection = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=256)
+def _to_server_placeholders(query):
+    """
+    Rewrite psycopg2 placeholders as PostgreSQL $n parameters.
+
+    Returns:
+        tuple: (statement name, rewritten SQL, parameter names or count)
+    """
+    names = []
+    positional = 0
+
+    def replace(match):
+        nonlocal positional
+        if match.group('skip') is not None:
+            # psycopg2 would still read %% as an escaped % here
+            return match.group('skip').replace('%%', '%')
+        if match.group(0) == '%%':
+            return '%'
+        name = match.group('name')
+        if name is not None:
+            if name not in names:
+                names.append(name)
+            return f"${names.index(name) + 1}"
+        positional += 1
+        return f"${positional}"
+
+    sql = _PLACEHOLDER_RE.sub(replace, _strip_statement(query))
+    if names and positional:
+        raise ValueError("Cannot mix %s and %(name)s placeholders in one query")
+
+    name = 'dataspell_' + hashlib.sha1(sql.encode('utf-8')).hexdigest()[:16]
+    return name, sql, tuple(names) if names else positional
+
+
+def _prepared_execute(conn, query, params):
+    """
+    Make sure a query is prepared on this connection.
+
+    Returns:
+        tuple: (EXECUTE statement, parameter values) to run on the same
+        connection, or None if the server could not prepare the query
+    """
+    import psycopg2
+
+    name, sql, signature = _to_server_placeholders(query)
+    if isinstance(signature, tuple):
+        values = [params[key] for key in signature]
+    else:
+        values = list(params or ())
+        if len(values) != signature:
+            raise ValueError(f"Query expects {signature} parameters, got {len(values)}")
+
+    raw = getattr(conn, 'raw_connection', conn)
+    with _prepared_lock:
+        prepared = _prepared_by_connection.setdefault(raw, OrderedDict())
+
+    if name in prepared:
+        prepared.move_to_end(name)
+    else:
+        with conn.cursor() as cur:
+            try:
+                cur.execute(f"PREPARE {name} AS {sql}")
+            except psycopg2.Error:
+                # e.g. "could not determine data type of parameter $1"
+                conn.rollback()
+                return None
+            prepared[name] = True
+            while len(prepared) > MAX_PREPARED_STATEMENTS:
+                oldest, _ = prepared.popitem(last=False)
+                cur.execute(f"DEALLOCATE {oldest}")
+
+    if not values:
+        return f"EXECUTE {name}", None
+    placeholders = ', '.join(['%s'] * len(values))
+    return f"EXECUTE {name} ({placeholders})", values
+
+
+def prepared_statement_count(conn):
+    """Return how many statements this module has prepared on a connection."""
+    raw = getattr(conn, 'raw_connection', conn)
+    return len(_prepared_by_connection.get(raw, ()))
+
+
+def _compact(df):
+    from portal_dtypes import compact_dataframe
+
+    return compact_dataframe(df)
+
+
+def stream_query(query, chunksize=DEFAULT_CHUNKSIZE, params=None):
+    """
+    Execute a SELECT query and yield the results as DataFrame chunks.
+
+    Rows are read through a named (server-side) cursor, so only one chunk is
+    held in client memory at a time no matter how large the result set is.
+    The query must be a single SELECT statement.
+
+    Args:
+        query (str): SQL query to execute
+        chunksize (int): Maximum number of rows per DataFrame
+        params (tuple or dict): Query parameters passed to cursor.execute()
+
+    Yields:
+        pandas.DataFrame: Consecutive chunks of the result set. A single empty
+        DataFrame with the result columns is yielded when there are no rows.
+    """
+    import pandas as pd
+
+    if chunksize < 1:
+        raise ValueError("chunksize must be a positive number of rows")
+
+    with _measure(query, 'stream', params) as measurement, \
+            connection(readonly=True) as conn:
+        measurement.connected(conn)
+        cursor_name = f"dataspell_stream_{uuid.uuid4().hex}"
+        with conn.cursor(name=cursor_name) as cur:
+            cur.itersize = chunksize
+            cur.execute(query, params)
+
+            columns = None
+            yielded = False
+            while True:
+                start = time.perf_counter()
+                rows = cur.fetchmany(chunksize)
+                measurement.add_execute_time(time.perf_counter() - start)
+                if columns is None:
+                    # Named cursors only describe the result after the first fetch
+                    columns = [col.name for col in cur.description]
+                if not rows:
+                    break
+
+                yielded = True
+                chunk = pd.DataFrame.from_records(rows, columns=columns)
+                measurement.add_dataframe(chunk)
+                yield chunk
+
+            if not yielded:
+                yield pd.DataFrame(columns=columns)
+
+        measurement.capture_plan(conn)
+
+
+_MISSING = object()
+
+
+def reduce_query(query, reducer, initial=_MISSING, chunksize=DEFAULT_CHUNKSIZE, params=None):
+    """
+    Fold a streamed query result into a single value, one chunk at a time.
+
+    Works like functools.reduce() over the chunks from stream_query(), so
+    aggregates can be computed over tables that do not fit in memory:
+
+        counts = reduce_query(
+            "SELECT action FROM audit_logs;",
+            lambda total, chunk: total.add(chunk['action'].value_counts(), fill_value=0),
+            initial=pd.Series(dtype='float64'),
+        )
+
     Args:
         query (str): SQL query to execute
-        
+        reducer (callable): Function (accumulator, chunk) -> accumulator
+        initial: Starting accumulator (default: the first chunk)
+        chunksize (int): Maximum number of rows per chunk
+        params (tuple or dict): Query parameters passed to cursor.execute()
+
+    Returns:
+        The final accumulator value
+    """
+    chunks = stream_query(query, chunksize=chunksize, params=params)
+    if initial is _MISSING:
+        return functools.reduce(reducer, chunks)
+    return functools.reduce(reducer, chunks, initial)
+
+
+def _strip_statement(query):
+    """Remove surrounding whitespace and a trailing semicolon so a query can be nested."""
+    query = query.strip()
+    while query.endswith(';'):
+        query = query[:-1].rstrip()
+    return query
+
+
+def _parse_timestamps(series, utc=False):
+    """Convert PostgreSQL ISO timestamp text to datetime64."""
+    import pandas as pd
+
+    try:
+        return pd.to_datetime(series, utc=utc, format='ISO8601')
+    except (TypeError, ValueError):
+        # pandas < 2.0 has no ISO8601 format shortcut
+        return pd.to_datetime(series, utc=utc)
+
+
+def copy_query_to_dataframe(query, params=None, engine='auto', compact=False):
+    """
+    Execute a SQL query via COPY and return the results as a pandas DataFrame.
+
+    Drop-in alternative to query_to_dataframe() for large results: the server
+    streams the rows as CSV with COPY (query) TO STDOUT and the text is parsed
+    column-wise by pandas' C parser (or Arrow) instead of building Python
+    tuples row by row.
+
+    Column dtypes follow the result description and match query_to_dataframe()
+    for integer, float, boolean, text and timestamp columns. Differences:
+    numeric columns become float64 instead of Decimal objects, date columns
+    become datetime64, timestamptz columns are converted to UTC, and
+    json/array/interval columns are returned as their text form.
+
+    Args:
+        query (str): SQL query to execute (a single SELECT statement)
+        params (tuple or dict): Values bound to %s / %(name)s placeholders
+        engine (str): 'pandas' for pandas.read_csv, 'arrow' for pyarrow.csv,
+            or 'auto' to use Arrow when pyarrow is installed
+        compact (bool): Convert the result to memory-compact dtypes
+            (see portal_dtypes.compact_dataframe)
+
     Returns:
         pandas.DataFrame: Query results
     """
+    if engine == 'auto':
+        try:
+            import pyarrow  # noqa: F401
+            engine = 'arrow'
+        except ImportError:
+            engine = 'pandas'
+    elif engine not in ('pandas', 'arrow'):
+        raise ValueError("engine must be 'auto', 'pandas' or 'arrow'")
+
+    buffer = io.BytesIO()
+
+    with _measure(query, 'copy', params) as measurement:
+        with connection(readonly=True) as conn:
+            measurement.connected(conn)
+            with conn.cursor() as cur:
+                if params is not None:
+                    from psycopg2.extensions import encodings
+
+                    # COPY cannot take server-side parameters, so bind them client-side
+                    query = cur.mogrify(query, params).decode(encodings[conn.encoding])
+                query = _strip_statement(query)
+                cur.execute("SET LOCAL DateStyle = 'ISO';")
+                cur.execute(f"SELECT * FROM ({query}) AS copy_source LIMIT 0;")
+                columns = [(col.name, col.type_code) for col in cur.description]
+                start = time.perf_counter()
+                cur.copy_expert(
+                    f"COPY ({query}) TO STDOUT WITH (FORMAT csv, NULL '\\N');",
+                    buffer
+                )
+                measurement.add_execute_time(time.perf_counter() - start)
+            measurement.capture_plan(conn)
+
+        buffer.seek(0)
+        if engine == 'arrow':
+            df = _read_copy_csv_arrow(buffer, columns)
+        else:
+            df = _read_copy_csv_pandas(buffer, columns)
+
+        for label, (_, type_code) in zip(df.columns, columns):
+            if type_code in _TIMESTAMP_OIDS or type_code in _TIMESTAMPTZ_OIDS:
+                df[label] = _parse_timestamps(df[label], utc=type_code in _TIMESTAMPTZ_OIDS)
+
+        # Columns are parsed positionally so duplicate result names survive
+        df.columns = [name for name, _ in columns]
+        measurement.add_result(len(df), buffer.getbuffer().nbytes)
+
+    return _compact(df) if compact else df
+
+
+def _read_copy_csv_pandas(buffer, columns):
+    """Parse COPY CSV output with pandas.read_csv."""
     import pandas as pd
-    
-    conn = get_connection()
-    df = pd.read_sql(query, conn)
-    conn.close()
-    
-    return df
+
+    dtypes = {}
+    for position, (_, type_code) in enumerate(columns):
+        if type_code in _FLOAT_OIDS:
+            dtypes[position] = 'float64'
+        elif type_code not in _INTEGER_OIDS and type_code not in _BOOL_OIDS:
+            # Text, uuid, enums and timestamps (converted afterwards)
+            dtypes[position] = object
+
+    return pd.read_csv(
+        buffer,
+        header=None,
+        names=list(range(len(columns))),
+        dtype=dtypes,
+        keep_default_na=False,
+        na_values=['\\N'],
+        true_values=['t'],
+        false_values=['f'],
+    )
+
+
+def _read_copy_csv_arrow(buffer, columns):
+    """Parse COPY CSV output with pyarrow.csv."""
+    try:
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+    except ImportError:
+        raise ImportError("engine='arrow' requires pyarrow: pip install pyarrow")
+
+    names = [str(position) for position in range(len(columns))]
+    column_types = {}
+    for name, (_, type_code) in zip(names, columns):
+        if type_code in _FLOAT_OIDS:
+            column_types[name] = pa.float64()
+        elif type_code not in _INTEGER_OIDS and type_code not in _BOOL_OIDS:
+            column_types[name] = pa.string()
+
+    table = pa_csv.read_csv(
+        buffer,
+        read_options=pa_csv.ReadOptions(column_names=names),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=column_types,
+            null_values=['\\N'],
+            true_values=['t'],
+            false_values=['f'],
+            strings_can_be_null=True,
+        ),
+    )
+    return table.to_pandas()
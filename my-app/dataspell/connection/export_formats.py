@@ -0,0 +1,597 @@
+"""
+Columnar output formats for the table export script.
+This file turns PostgreSQL COPY CSV streams into Parquet and Arrow IPC files.
+
+Rows are parsed block by block with pyarrow's streaming CSV reader, using
+column types taken from the PostgreSQL result (timestamps, booleans,
+integers, ...), and written out one row group at a time, so memory stays
+bounded by the row group size. Enum-like text columns are dictionary
+encoded and load as pandas categoricals.
+
+Arrow output uses the IPC stream format (.arrows), which can be memory-mapped:
+
+    import pyarrow as pa
+    table = pa.ipc.open_stream(pa.memory_map('users.arrows')).read_all()
+
+CSV output can be gzip or zstd compressed and split into numbered files of a
+bounded size or row count (CsvFileWriter). CSV that has to be changed on the
+way (masking) is read as text batches and written back with
+write_csv_batches() in the same format as COPY. Every file written is
+checksummed while it is written (ExportedFile.sha256).
+
+The writers report rows, bytes and encode / write time to an ExportStats
+(see export_progress); by default they report to nowhere.
+"""
+
+import gzip
+import hashlib
+import os
+import time
+from collections import namedtuple
+
+from export_progress import NULL_STATS
+from portal_dtypes import PORTAL_COLUMN_KINDS
+
+# File extension for each export format
+FILE_EXTENSIONS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'arrow': '.arrows',
+}
+
+# Codecs accepted by each format; the first one is the default
+COMPRESSIONS = {
+    'csv': ['none', 'gzip', 'zstd'],
+    'parquet': ['zstd', 'snappy', 'gzip', 'lz4', 'brotli', 'none'],
+    # Uncompressed IPC can be loaded zero-copy from a memory map
+    'arrow': ['none', 'zstd', 'lz4'],
+}
+
+# Extra extension of compressed CSV files
+COMPRESSED_EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+DEFAULT_COMPRESSION_LEVELS = {
+    'gzip': 6,
+    'zstd': 3,
+}
+
+DEFAULT_ROW_GROUP_ROWS = 250000
+
+# CSV rows are collected into blocks of about this size before compressing
+CSV_FLUSH_BYTES = 1024 * 1024
+
+# Write buffer of output files
+FILE_BUFFER_SIZE = 1024 * 1024
+
+# Bytes of CSV parsed per record batch
+CSV_BLOCK_SIZE = 4 * 1024 * 1024
+
+# masking is an export_masking.MaskingPolicy, or None to export values as they are
+ExportOptions = namedtuple(
+    'ExportOptions',
+    ['file_format', 'compression', 'row_group_rows', 'compression_level',
+     'max_file_bytes', 'max_file_rows', 'masking'],
+    defaults=('csv', None, DEFAULT_ROW_GROUP_ROWS, None, None, None, None)
+)
+
+# A file written by an export
+ExportedFile = namedtuple('ExportedFile', ['path', 'rows', 'bytes', 'sha256'])
+
+# Result columns described as (name, type_name, is_enum), see arrow_schema()
+ColumnType = namedtuple('ColumnType', ['name', 'type_name', 'is_enum'])
+
+
+def file_extension(options):
+    """Extension of export files, e.g. '.parquet' or '.csv.gz'."""
+    extension = FILE_EXTENSIONS[options.file_format]
+    if options.file_format == 'csv':
+        extension += COMPRESSED_EXTENSIONS.get(options.compression, '')
+    return extension
+
+
+class HashingFile:
+    """Binary output file that tracks the size and SHA-256 of what is written."""
+
+    def __init__(self, path, stats=NULL_STATS):
+        self.path = path
+        self.bytes_written = 0
+        # Time spent checksumming and writing, also reported as the 'write' phase
+        self.write_seconds = 0.0
+        self._stats = stats
+        self._sha256 = hashlib.sha256()
+        self._file = open(path, 'wb', buffering=FILE_BUFFER_SIZE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        start = time.perf_counter()
+        self._sha256.update(data)
+        self.bytes_written += len(data)
+        written = self._file.write(data)
+        elapsed = time.perf_counter() - start
+        self.write_seconds += elapsed
+        self._stats.add_time('write', elapsed)
+        self._stats.add_written(len(data))
+        return written
+
+    def tell(self):
+        return self.bytes_written
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+
+def _remove_quietly(path):
+    """Delete a partly written file, if it exists."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _open_compressor(raw, compression, level):
+    """Wrap a HashingFile in a streaming compressor (or return it unchanged)."""
+    if compression == 'gzip':
+        # mtime=0 keeps the output identical for identical data
+        return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=level, mtime=0)
+    if compression == 'zstd':
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=False)
+    return raw
+
+
+class CsvFileWriter:
+    """
+    File-like target for COPY ... TO STDOUT WITH (FORMAT csv, HEADER) output.
+
+    COPY sends one row per write() call (one CopyData message per row), the
+    first being the header. Rows are compressed in blocks and, when a size or
+    row limit is set, split into numbered files (users.0001.csv.gz, ...)
+    that each start with the header. Sizes are checked after each compressed
+    block, so a file can exceed max_file_bytes by up to one block.
+
+    Args:
+        output_path (Path): File to write, e.g. exports/users.csv.gz; with
+            limits the file number is inserted before the extension
+        options (ExportOptions): compression, compression_level,
+            max_file_bytes and max_file_rows
+        stats (ExportStats): Receives rows, bytes and encode / write time
+    """
+
+    def __init__(self, output_path, options, stats=NULL_STATS):
+        self.output_path = output_path
+        self.compression = options.compression if options.compression != 'none' else None
+        self.level = options.compression_level or DEFAULT_COMPRESSION_LEVELS.get(self.compression)
+        self.max_bytes = options.max_file_bytes
+        self.max_rows = options.max_file_rows
+        self.numbered = bool(self.max_bytes or self.max_rows)
+        self.extension = file_extension(options)
+        self.files = []
+        self.stats = stats
+
+        self._header = None
+        self._raw = None
+        self._out = None
+        self._rows = 0
+        self._buffered_rows = 0
+        self._block_bytes = 0
+        self._buffer = bytearray()
+
+    def write(self, row):
+        if self._header is None:
+            self._header = bytes(row)
+            return
+        if self._out is None or self._is_full():
+            if not self.files:
+                self.stats.data_started()
+            self._next_file()
+        self._buffer += row
+        self._rows += 1
+        self._buffered_rows += 1
+        if len(self._buffer) >= CSV_FLUSH_BYTES:
+            self._flush()
+
+    def write_block(self, data, rows):
+        """
+        Append several complete CSV rows at once (after the header was written).
+
+        A block is never split, so it can take a file past its limits; use
+        rows_available() to cut blocks at the row limit.
+        """
+        if self._out is None or self._is_full():
+            self._next_file()
+        self._buffer += data
+        self._rows += rows
+        self._buffered_rows += rows
+        # Blocks are re-encoded rows whose input size was counted by the reader
+        self._block_bytes += len(data)
+        if len(self._buffer) >= CSV_FLUSH_BYTES:
+            self._flush()
+
+    def rows_available(self):
+        """Rows that still fit in the current (or next) file; None without a row limit."""
+        if not self.max_rows:
+            return None
+        if self._out is None or self._is_full():
+            return self.max_rows
+        return self.max_rows - self._rows
+
+    def close(self):
+        """
+        Finish the last file.
+
+        Returns:
+            list: ExportedFile for every file written, in order
+        """
+        if self._out is None:
+            # Empty result: still write a file with the header
+            self._next_file()
+        self._finish_file()
+        return self.files
+
+    def abort(self):
+        """
+        Close the open file after a failure and delete every file written.
+
+        The files only hold part of the result, so none of them is left for a
+        resumed run or a reader to mistake for a complete export.
+        """
+        if self._out is not None:
+            try:
+                self._out.close()
+                if self._raw is not self._out:
+                    self._raw.close()
+            except Exception:
+                pass
+            _remove_quietly(self._raw.path)
+            self._out = None
+        for exported in self.files:
+            _remove_quietly(exported.path)
+        self.files = []
+
+    def _is_full(self):
+        if self.max_rows and self._rows >= self.max_rows:
+            return True
+        if self.max_bytes:
+            pending = len(self._buffer) if self.compression is None else 0
+            return self._raw.bytes_written + pending >= self.max_bytes
+        return False
+
+    def _path(self, number):
+        if not self.numbered:
+            return self.output_path
+        stem = self.output_path.name[:-len(self.extension)]
+        return self.output_path.with_name(f"{stem}.{number:04d}{self.extension}")
+
+    def _encode(self, method, *args):
+        """Call a compressor method, booking its time minus file writes as 'encode'."""
+        written_before = self._raw.write_seconds
+        start = time.perf_counter()
+        method(*args)
+        elapsed = time.perf_counter() - start
+        self.stats.add_time('encode', elapsed - (self._raw.write_seconds - written_before))
+
+    def _flush(self):
+        if self._buffer:
+            self.stats.add_rows(self._buffered_rows, len(self._buffer) - self._block_bytes)
+            self._encode(self._out.write, self._buffer)
+            self._buffer = bytearray()
+            self._buffered_rows = 0
+            self._block_bytes = 0
+
+    def _next_file(self):
+        if self._out is not None:
+            self._finish_file()
+        self._raw = HashingFile(self._path(len(self.files) + 1), self.stats)
+        self._out = _open_compressor(self._raw, self.compression, self.level)
+        self._rows = 0
+        self._buffer += self._header or b''
+
+    def _finish_file(self):
+        self._flush()
+        self._encode(self._out.close)
+        if self._raw is not self._out:
+            self._raw.close()
+        self.files.append(
+            ExportedFile(self._raw.path, self._rows, self._raw.bytes_written, self._raw.hexdigest())
+        )
+        self._out = None
+
+
+def _arrow_types():
+    import pyarrow as pa
+
+    return {
+        'bool': pa.bool_(),
+        'int2': pa.int16(),
+        'int4': pa.int32(),
+        'int8': pa.int64(),
+        'float4': pa.float32(),
+        'float8': pa.float64(),
+        'date': pa.date32(),
+        'timestamp': pa.timestamp('us'),
+        # The exporter sets TimeZone to UTC and DateStyle to ISO, so timestamptz values are UTC
+        'timestamptz': pa.timestamp('us', tz='UTC'),
+    }
+
+
+def arrow_schema(columns, as_text=False):
+    """
+    Build the Arrow schema for a query result.
+
+    Types without an exact Arrow counterpart (numeric, uuid, json, arrays, ...)
+    are kept as strings so no precision is lost.
+
+    Args:
+        columns (list): ColumnType tuples in result order
+        as_text (bool): Keep every column as a string, so values written back
+            to CSV keep PostgreSQL's formatting
+
+    Returns:
+        pyarrow.Schema
+    """
+    import pyarrow as pa
+
+    types = _arrow_types()
+    fields = []
+    for column in columns:
+        if as_text:
+            arrow_type = pa.string()
+        elif column.type_name in types:
+            arrow_type = types[column.type_name]
+        elif column.is_enum or PORTAL_COLUMN_KINDS.get(column.name) == 'category':
+            arrow_type = pa.dictionary(pa.int32(), pa.string())
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+class _TimedReader:
+    """
+    Buffered binary stream wrapper that reports the time spent waiting for data.
+
+    The first call waits for the first bytes separately (the end of the query
+    phase); after that, time blocked in read() is transfer time.
+    """
+
+    def __init__(self, stream, stats):
+        self._stream = stream
+        self._stats = stats
+        self._waiting_for_data = True
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def read(self, size=-1):
+        if self._waiting_for_data:
+            self._stream.peek(1)
+            self._stats.data_started()
+            self._waiting_for_data = False
+        start = time.perf_counter()
+        data = self._stream.read(size)
+        self._stats.add_time('transfer', time.perf_counter() - start)
+        self._stats.add_rows(0, len(data))
+        return data
+
+
+def open_csv_batches(stream, schema, stats=NULL_STATS):
+    """
+    Read headerless PostgreSQL COPY CSV output as record batches.
+
+    Unquoted empty fields are NULL and quoted empty fields are empty strings,
+    matching how COPY writes them.
+
+    Args:
+        stream: Buffered binary file object with the COPY output
+        schema (pyarrow.Schema): Schema from arrow_schema()
+        stats (ExportStats): Receives the bytes read and the time spent waiting for them
+
+    Returns:
+        pyarrow.csv.CSVStreamingReader
+    """
+    from pyarrow import csv as pa_csv
+
+    if stats is not NULL_STATS:
+        stream = _TimedReader(stream, stats)
+    return pa_csv.open_csv(
+        stream,
+        read_options=pa_csv.ReadOptions(column_names=schema.names, block_size=CSV_BLOCK_SIZE),
+        # A single-column NULL row is an empty line
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True, ignore_empty_lines=False),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={field.name: field.type for field in schema},
+            true_values=['t'],
+            false_values=['f'],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+        ),
+    )
+
+
+def _copy_csv_fields(array, single_column=False):
+    """
+    Format a StringArray the way COPY ... (FORMAT csv) writes text values.
+
+    A value is quoted (with quotes doubled) when it is empty or contains a
+    delimiter, quote or line break, and a lone \\. when it is the only column;
+    NULL becomes an empty, unquoted field.
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    count = len(array)
+    offsets = np.frombuffer(array.buffers()[1], dtype=np.int32)[array.offset:array.offset + count + 1]
+    data = array.buffers()[2]
+    data = np.frombuffer(data, dtype=np.uint8)[offsets[0]:offsets[-1]] if data is not None else np.zeros(0, np.uint8)
+
+    # Rows holding a delimiter, quote or line break (most columns have none)
+    needs_quotes = np.diff(offsets) == 0
+    text = data.tobytes()
+    if any(char in text for char in (b',', b'"', b'\r', b'\n')):
+        special = np.flatnonzero((data == ord(',')) | (data == ord('"'))
+                                 | (data == ord('\r')) | (data == ord('\n')))
+        needs_quotes[np.searchsorted(offsets, special + offsets[0], side='right') - 1] = True
+    if single_column:
+        needs_quotes |= pc.fill_null(pc.equal(array, '\\.'), False).to_numpy(zero_copy_only=False)
+    if array.null_count:
+        needs_quotes &= array.is_valid().to_numpy(zero_copy_only=False)
+
+    if needs_quotes.any():
+        mask = pa.array(needs_quotes)
+        if b'"' in text:
+            # replace_substring is slow, so only the quoted values go through it
+            doubled = pc.replace_substring(pc.filter(array, mask), '"', '""')
+            array = pc.replace_with_mask(array, mask, pc.binary_join_element_wise('"', doubled, '"', ''))
+        else:
+            array = pc.if_else(mask, pc.binary_join_element_wise('"', array, '"', ''), array)
+    return pc.fill_null(array, '')
+
+
+def _copy_csv_rows(columns):
+    """Encode string columns of equal length as CSV lines, like COPY does."""
+    import numpy as np
+    import pyarrow.compute as pc
+
+    if not len(columns[0]):
+        return b''
+    fields = [_copy_csv_fields(column, single_column=len(columns) == 1) for column in columns]
+    lines = pc.binary_join_element_wise(pc.binary_join_element_wise(*fields, ','), '\n', '')
+    # Each line ends with its newline, so the value buffer is the CSV text
+    offsets = np.frombuffer(lines.buffers()[1], dtype=np.int32)
+    start, end = offsets[lines.offset], offsets[lines.offset + len(lines)]
+    return lines.buffers()[2][start:end].to_pybytes()
+
+
+def write_csv_batches(batches, output_path, schema, options, stats=NULL_STATS):
+    """
+    Write record batches as CSV with a header, through CsvFileWriter.
+
+    The output is byte for byte what COPY ... (FORMAT csv, HEADER) writes for
+    the same text values, so masked and unmasked exports only differ in the
+    masked columns: NULLs are empty fields, and only values that need it
+    (empty strings, delimiters, quotes, line breaks) are quoted.
+
+    Args:
+        batches (iterable): pyarrow.RecordBatch objects of string columns
+            matching schema (see arrow_schema(as_text=True))
+        output_path (Path): File to write (numbered when options set limits)
+        schema (pyarrow.Schema): Schema of the batches
+        options (ExportOptions): compression, compression_level,
+            max_file_bytes and max_file_rows
+        stats (ExportStats): Receives the row count and encode / write time
+
+    Returns:
+        list: ExportedFile for every file written, in order
+    """
+    import pyarrow as pa
+
+    writer = CsvFileWriter(output_path, options, stats)
+    try:
+        # COPY quotes column names by the same rules as values
+        writer.write(_copy_csv_rows([pa.array([name], pa.string()) for name in schema.names]))
+        for batch in batches:
+            offset = 0
+            while offset < batch.num_rows:
+                piece = batch.slice(offset, writer.rows_available() or batch.num_rows)
+                writer.write_block(_copy_csv_rows(piece.columns), piece.num_rows)
+                offset += piece.num_rows
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
+
+
+def _open_writer(sink, schema, options):
+    import pyarrow as pa
+
+    compression = options.compression or COMPRESSIONS[options.file_format][0]
+    if options.file_format == 'parquet':
+        from pyarrow import parquet as pq
+
+        return pq.ParquetWriter(sink, schema, compression=compression,
+                                compression_level=options.compression_level)
+    if options.file_format == 'arrow':
+        if compression != 'none' and options.compression_level is not None:
+            compression = pa.Codec(compression, options.compression_level)
+        ipc_options = pa.ipc.IpcWriteOptions(
+            compression=None if compression == 'none' else compression)
+        return pa.ipc.new_stream(sink, schema, options=ipc_options)
+    raise ValueError(f"Unsupported columnar format: {options.file_format}")
+
+
+def _write_row_group(writer, table):
+    # Each CSV block has its own dictionaries; one row group gets one dictionary
+    table = table.unify_dictionaries().combine_chunks()
+    writer.write_table(table, table.num_rows)
+
+
+def write_columnar(batches, output_path, schema, options, stats=NULL_STATS):
+    """
+    Write record batches to a Parquet or Arrow IPC file in fixed-size row groups.
+
+    If a batch fails mid-stream, the partly written file is deleted.
+
+    Args:
+        batches (iterable): pyarrow.RecordBatch objects matching schema
+        output_path (Path): File to write
+        schema (pyarrow.Schema): Schema of the batches
+        options (ExportOptions): file_format 'parquet' or 'arrow', compression,
+            compression_level and row_group_rows
+        stats (ExportStats): Receives the row count and file write time
+
+    Returns:
+        ExportedFile: The file written
+    """
+    import pyarrow as pa
+
+    row_group_rows = options.row_group_rows or DEFAULT_ROW_GROUP_ROWS
+    total_rows = 0
+    pending = []
+    pending_rows = 0
+
+    sink = HashingFile(output_path, stats)
+    try:
+        with sink, _open_writer(sink, schema, options) as writer:
+            for batch in batches:
+                stats.add_rows(batch.num_rows, 0)
+                pending.append(batch)
+                pending_rows += batch.num_rows
+                while pending_rows >= row_group_rows:
+                    table = pa.Table.from_batches(pending, schema)
+                    _write_row_group(writer, table.slice(0, row_group_rows))
+                    rest = table.slice(row_group_rows)
+                    pending, pending_rows = rest.to_batches(), rest.num_rows
+                    total_rows += row_group_rows
+
+            if pending_rows:
+                _write_row_group(writer, pa.Table.from_batches(pending, schema))
+                total_rows += pending_rows
+    except BaseException:
+        # Leaving the writer's block wrote a footer, so the truncated file would look valid
+        _remove_quietly(output_path)
+        raise
+
+    return ExportedFile(output_path, total_rows, sink.bytes_written, sink.hexdigest())
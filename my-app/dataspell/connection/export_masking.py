@@ -0,0 +1,342 @@
+"""
+PII masking for the table export script.
+This file pseudonymizes and redacts columns while tables are exported.
+
+Masking rules are declared per table and column:
+    - hash:        replace the value with a keyed hash (32 hex characters).
+                   The same value and key always give the same token, so
+                   masked ids still join across tables and exports.
+    - hash_email:  like hash, after trimming and lower-casing the address;
+                   the token keeps an email shape (<token>@masked.invalid)
+    - redact:      replace non-NULL values with '[redacted]'
+    - year, month, day: truncate a date or timestamp to a date at that precision
+    - keep:        export the column unchanged (overrides a default rule)
+
+Redaction and date truncation are added to the COPY query, so the original
+values never leave the database. Hashing needs the secret key, which is kept
+out of SQL text (and so out of server logs): it runs on the Arrow record
+batches as they stream in, vectorized with NumPy over the string buffers.
+
+The keyed hash is SipHash-2-4 with 128-bit output, a PRF with a 128-bit key
+derived from EXPORT_MASKING_KEY. Without the key, tokens cannot be reversed
+or recomputed from guessed values.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+from portal_dtypes import PORTAL_COLUMN_KINDS
+
+# Environment variable holding the secret masking key
+MASK_KEY_ENV = 'EXPORT_MASKING_KEY'
+
+# Shortest key accepted, in characters
+MIN_MASK_KEY_LENGTH = 16
+
+REDACTED = '[redacted]'
+MASKED_EMAIL_DOMAIN = '@masked.invalid'
+
+RULES = ('hash', 'hash_email', 'redact', 'year', 'month', 'day', 'keep')
+
+# Identifiers are hashed in every table, so joins between masked tables work
+ID_MASKING_RULES = {
+    column: 'hash' for column, kind in PORTAL_COLUMN_KINDS.items() if kind == 'id'
+}
+
+# PII of the tables shared with analysts: table -> column -> rule
+PII_MASKING_RULES = {
+    'users': {
+        'email': 'hash_email',
+        'passwordHash': 'redact',
+        'firstName': 'redact',
+        'lastName': 'redact',
+        'phoneNumber': 'redact',
+        'dateOfBirth': 'year',
+    },
+    'patient_profiles': {
+        'address': 'redact',
+        'emergencyContact': 'redact',
+        'insuranceId': 'hash',
+    },
+    'messages': {
+        'content': 'redact',
+    },
+    'medical_records': {
+        'content': 'redact',
+        'recordDate': 'month',
+    },
+}
+
+# SipHash initialization constants ("somepseudorandomlygeneratedbytes")
+_SIP_INIT = (0x736f6d6570736575, 0x646f72616e646f6d, 0x6c7967656e657261, 0x7465646279746573)
+
+# The two ASCII hex digits of every byte value, as one uint16 each
+_HEX_DIGITS = np.frombuffer(b''.join(b'%02x' % byte for byte in range(256)), dtype='<u2')
+
+
+def load_masking_rules(path):
+    """
+    Load per-table rules from a JSON file ({"table": {"column": "rule"}}).
+
+    Raises:
+        ValueError: If a rule is not one of RULES
+    """
+    with open(path) as f:
+        rules = json.load(f)
+    for table, columns in rules.items():
+        for column, rule in columns.items():
+            if rule not in RULES:
+                raise ValueError(f"Unknown masking rule {rule!r} for {table}.{column} "
+                                 f"(use one of: {', '.join(RULES)})")
+    return rules
+
+
+class MaskingPolicy:
+    """
+    Masking rules plus the secret key for one export.
+
+    Args:
+        key (str): Secret masking key (see MASK_KEY_ENV)
+        table_rules (dict): Table -> column -> rule (default: PII_MASKING_RULES)
+    """
+
+    def __init__(self, key, table_rules=None):
+        self.table_rules = PII_MASKING_RULES if table_rules is None else table_rules
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        self._key = (int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:16], 'little'))
+        # Identifies the key (e.g. in checkpoints) without revealing it
+        self.key_id = hashlib.sha256(b'key-id:' + digest).hexdigest()[:16]
+
+    def describe(self):
+        """JSON-serializable description of the policy (the key only by its key_id)."""
+        return {'key_id': self.key_id, 'id_rules': ID_MASKING_RULES, 'table_rules': self.table_rules}
+
+    def table_masker(self, table_name, column_names):
+        """
+        Build the masker for one table.
+
+        Args:
+            table_name (str): Exported table
+            column_names (list): Columns of the exported query, in order
+
+        Returns:
+            TableMasker
+        """
+        rules = dict(ID_MASKING_RULES)
+        rules.update(self.table_rules.get(table_name, {}))
+        present = {
+            column: rules[column] for column in column_names
+            if column in rules and rules[column] != 'keep'
+        }
+        return TableMasker(column_names, present, self._key)
+
+
+class TableMasker:
+    """
+    Applies masking rules to one table's export.
+
+    Use select_sql() to wrap the export query, then mask_batches() on the
+    Arrow record batches read from its COPY output.
+    """
+
+    def __init__(self, column_names, rules, key):
+        self.column_names = column_names
+        self.rules = rules
+        self.hashed_columns = [
+            column for column, rule in rules.items() if rule in ('hash', 'hash_email')
+        ]
+        self._key = key
+
+    def select_sql(self, select_sql):
+        """
+        Wrap a SELECT so redaction and date truncation happen in the database.
+
+        Args:
+            select_sql (psycopg2.sql.Composable): Original export query
+
+        Returns:
+            psycopg2.sql.Composable: The masked query (unchanged if no rule
+            needs the database)
+        """
+        from psycopg2 import sql
+
+        if not any(rule not in ('hash', 'hash_email') for rule in self.rules.values()):
+            return select_sql
+
+        expressions = []
+        for column in self.column_names:
+            rule = self.rules.get(column)
+            identifier = sql.Identifier(column)
+            if rule == 'redact':
+                expression = sql.SQL("CASE WHEN {column} IS NULL THEN NULL ELSE {redacted} END").format(
+                    column=identifier, redacted=sql.Literal(REDACTED))
+            elif rule in ('year', 'month', 'day'):
+                expression = sql.SQL("date_trunc({unit}, {column})::date").format(
+                    unit=sql.Literal(rule), column=identifier)
+            else:
+                expressions.append(identifier)
+                continue
+            expressions.append(sql.SQL("{} AS {}").format(expression, identifier))
+
+        return sql.SQL("SELECT {} FROM ({}) AS unmasked").format(sql.SQL(', ').join(expressions), select_sql)
+
+    def masked_schema(self, schema):
+        """Schema of the batches returned by mask_batches() (hashed columns are strings)."""
+        import pyarrow as pa
+
+        for column in self.hashed_columns:
+            index = schema.get_field_index(column)
+            schema = schema.set(index, pa.field(column, pa.string()))
+        return schema
+
+    def mask_batches(self, batches, schema):
+        """
+        Hash the hashed columns of each record batch.
+
+        Args:
+            batches (iterable): pyarrow.RecordBatch objects read from the masked query
+            schema (pyarrow.Schema): Schema of the input batches
+
+        Yields:
+            pyarrow.RecordBatch: Batches matching masked_schema(schema)
+        """
+        import pyarrow as pa
+
+        masked_schema = self.masked_schema(schema)
+        positions = [(schema.get_field_index(column), self.rules[column]) for column in self.hashed_columns]
+        for batch in batches:
+            if not positions:
+                yield batch
+                continue
+            columns = list(batch.columns)
+            for index, rule in positions:
+                columns[index] = self.hash_array(columns[index], email=(rule == 'hash_email'))
+            yield pa.RecordBatch.from_arrays(columns, schema=masked_schema)
+
+    def hash_array(self, array, email=False):
+        """
+        Replace every value of an Arrow array with its keyed hash token.
+
+        Repeated values (foreign keys) are hashed once. NULLs stay NULL.
+
+        Args:
+            array (pyarrow.Array): Values to hash (non-string values are cast to string)
+            email (bool): Normalize as an email address and keep an email shape
+
+        Returns:
+            pyarrow.StringArray: 32-character hex tokens
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if pa.types.is_dictionary(array.type):
+            array = array.cast(array.type.value_type)
+        if not pa.types.is_string(array.type):
+            array = array.cast(pa.string())
+        if email:
+            array = pc.utf8_lower(pc.utf8_trim_whitespace(array))
+
+        encoded = pc.dictionary_encode(array)
+        tokens = _hex_tokens(_siphash128(encoded.dictionary, self._key))
+        tokens = tokens.take(encoded.indices)
+        if email:
+            tokens = pc.binary_join_element_wise(tokens, MASKED_EMAIL_DOMAIN, '')
+        return tokens
+
+
+def _rotate_left(values, bits, scratch):
+    np.left_shift(values, np.uint64(bits), out=scratch)
+    np.right_shift(values, np.uint64(64 - bits), out=values)
+    np.bitwise_or(values, scratch, out=values)
+
+
+def _sip_round(v0, v1, v2, v3, scratch):
+    # One SipRound on every row at once, in place
+    v0 += v1
+    _rotate_left(v1, 13, scratch)
+    v1 ^= v0
+    _rotate_left(v0, 32, scratch)
+    v2 += v3
+    _rotate_left(v3, 16, scratch)
+    v3 ^= v2
+    v0 += v3
+    _rotate_left(v3, 21, scratch)
+    v3 ^= v0
+    v2 += v1
+    _rotate_left(v1, 17, scratch)
+    v1 ^= v2
+    _rotate_left(v2, 32, scratch)
+
+
+def _siphash128_words(words, key):
+    """SipHash-2-4-128 of rows of padded little-endian message words."""
+    rows = len(words)
+    k0, k1 = np.uint64(key[0]), np.uint64(key[1])
+    v0 = np.full(rows, k0 ^ np.uint64(_SIP_INIT[0]))
+    v1 = np.full(rows, k1 ^ np.uint64(_SIP_INIT[1] ^ 0xee))
+    v2 = np.full(rows, k0 ^ np.uint64(_SIP_INIT[2]))
+    v3 = np.full(rows, k1 ^ np.uint64(_SIP_INIT[3]))
+    scratch = np.empty(rows, dtype=np.uint64)
+    message = np.empty(rows, dtype=np.uint64)
+
+    for position in range(words.shape[1]):
+        message[:] = words[:, position]
+        v3 ^= message
+        _sip_round(v0, v1, v2, v3, scratch)
+        _sip_round(v0, v1, v2, v3, scratch)
+        v0 ^= message
+
+    v2 ^= np.uint64(0xee)
+    for _ in range(4):
+        _sip_round(v0, v1, v2, v3, scratch)
+    low = v0 ^ v1 ^ v2 ^ v3
+    v1 ^= np.uint64(0xdd)
+    for _ in range(4):
+        _sip_round(v0, v1, v2, v3, scratch)
+    return low, v0 ^ v1 ^ v2 ^ v3
+
+
+def _siphash128(array, key):
+    """
+    SipHash-2-4-128 of the UTF-8 bytes of every value in a StringArray.
+
+    Values are grouped by length, so each group is one fixed-width matrix of
+    message words hashed with whole-array NumPy operations.
+
+    Returns:
+        numpy.ndarray: (len(array), 2) little-endian uint64 hash halves
+    """
+    count = len(array)
+    offsets = np.frombuffer(array.buffers()[1], dtype=np.int32)[array.offset:array.offset + count + 1]
+    offsets = offsets.astype(np.int64)
+    data_buffer = array.buffers()[2]
+    data = np.frombuffer(data_buffer, dtype=np.uint8) if data_buffer is not None else np.zeros(0, np.uint8)
+    lengths = np.diff(offsets)
+    hashes = np.empty((count, 2), dtype='<u8')
+
+    with np.errstate(over='ignore'):
+        for length in np.unique(lengths).tolist():
+            rows = np.nonzero(lengths == length)[0]
+            # The last word holds the message tail and the length in its top byte
+            width = (length // 8 + 1) * 8
+            block = np.zeros((len(rows), width), dtype=np.uint8)
+            if len(rows) == count and offsets[-1] - offsets[0] == count * length:
+                block[:, :length] = data[offsets[0]:offsets[-1]].reshape(count, length)
+            elif length:
+                block[:, :length] = data[offsets[rows][:, None] + np.arange(length)]
+            block[:, width - 1] = length & 0xff
+            hashes[rows, 0], hashes[rows, 1] = _siphash128_words(block.view('<u8'), key)
+    return hashes
+
+
+def _hex_tokens(hashes):
+    """Format (n, 2) uint64 hashes as a StringArray of 32 hex characters each."""
+    import pyarrow as pa
+
+    count = len(hashes)
+    digits = _HEX_DIGITS.take(hashes.view(np.uint8)).view(np.uint8).reshape(count * 32)
+    offsets = np.arange(0, 32 * (count + 1), 32, dtype=np.int32)
+    return pa.StringArray.from_buffers(count, pa.py_buffer(offsets), pa.py_buffer(digits))
+
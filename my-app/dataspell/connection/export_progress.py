@@ -0,0 +1,265 @@
+"""
+Progress and throughput reporting for the table export script.
+This file tracks how fast each export runs and where its time goes.
+
+Every export (a table, or one shard or chunk of a table) gets an ExportStats
+that the writers in export_formats update as data streams through. Its wall
+time is divided into four phases:
+    - query:    from sending the COPY until the first row arrives
+    - transfer: waiting for the rest of the rows from the server
+    - encode:   compressing CSV, or parsing and encoding Parquet / Arrow
+    - write:    writing (and checksumming) the output files
+
+A large transfer share points at the database or network, encode at the CPU
+and write at the disk.
+
+ExportProgress prints a progress line per running table at a fixed interval
+(rows, rows/s, MB/s and an ETA from the planner's row estimate) and builds
+the summary written to export_summary.json.
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+PHASES = ('query', 'transfer', 'encode', 'write')
+
+_local = threading.local()
+
+
+class ExportStats:
+    """
+    Counters for one export unit.
+
+    rows and bytes_read count the COPY data received so far (bytes_read is
+    the uncompressed CSV size); bytes_written counts the output files.
+    """
+
+    def __init__(self, key, table):
+        self.key = key
+        self.table = table
+        self.rows = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.started = time.perf_counter()
+        self.finished = None
+        self.first_data = None
+        self.error = None
+
+    def data_started(self):
+        """Mark the arrival of the first row; everything before it is query time."""
+        if self.first_data is None:
+            self.first_data = time.perf_counter()
+
+    def add_rows(self, rows, nbytes):
+        self.rows += rows
+        self.bytes_read += nbytes
+
+    def add_written(self, nbytes):
+        self.bytes_written += nbytes
+
+    def add_time(self, phase, seconds):
+        self.seconds[phase] += seconds
+
+    def finish(self, remainder):
+        """
+        Stop the clock and book the time not measured directly.
+
+        Args:
+            remainder (str): Phase that receives the wall time not assigned
+                to query or the measured phases ('transfer' or 'encode')
+        """
+        self.finished = time.perf_counter()
+        first_data = self.first_data if self.first_data is not None else self.finished
+        self.seconds['query'] = first_data - self.started
+        measured = sum(seconds for phase, seconds in self.seconds.items() if phase != remainder)
+        self.seconds[remainder] = max(0.0, self.wall_seconds - measured)
+
+    @property
+    def wall_seconds(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+
+class _NullStats:
+    """Stand-in used when an export is not tracked; every hook is a no-op."""
+
+    def data_started(self):
+        pass
+
+    def add_rows(self, rows, nbytes):
+        pass
+
+    def add_written(self, nbytes):
+        pass
+
+    def add_time(self, phase, seconds):
+        pass
+
+    def finish(self, remainder):
+        pass
+
+
+NULL_STATS = _NullStats()
+
+
+def current_stats():
+    """ExportStats of the export running in this thread (see ExportProgress.track)."""
+    return getattr(_local, 'stats', None) or NULL_STATS
+
+
+def _rate(amount, seconds):
+    return amount / seconds if seconds > 0 else 0.0
+
+
+def _format_eta(seconds):
+    if seconds is None:
+        return "ETA ?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"ETA {hours}h{minutes:02d}m"
+    if minutes:
+        return f"ETA {minutes}m{seconds:02d}s"
+    return f"ETA {seconds}s"
+
+
+class ExportProgress:
+    """
+    Collects ExportStats for a run and reports progress while it runs.
+
+    Args:
+        estimated_rows (dict): Table -> row estimate (pg_class.reltuples),
+            None where unknown
+        interval (float): Seconds between progress reports (0 disables them)
+        stream: Where progress lines are written (default: stdout)
+    """
+
+    def __init__(self, estimated_rows, interval=5.0, stream=None):
+        self.estimated_rows = estimated_rows
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.units = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = time.perf_counter()
+
+    def __enter__(self):
+        if self.interval and self.interval > 0:
+            self._thread = threading.Thread(target=self._report_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return False
+
+    @contextmanager
+    def track(self, key, table):
+        """
+        Track the export run inside the block (in this thread) as one unit.
+
+        Args:
+            key (str): Unit name, e.g. 'audit_logs.part-0003'
+            table (str): Table the unit belongs to
+        """
+        stats = ExportStats(key, table)
+        with self._lock:
+            self.units.append(stats)
+        previous = getattr(_local, 'stats', None)
+        _local.stats = stats
+        try:
+            yield stats
+        except BaseException as e:
+            stats.error = f"{type(e).__name__}: {e}".strip()
+            raise
+        finally:
+            _local.stats = previous
+            if stats.finished is None:
+                stats.finish('transfer')
+
+    def _table_units(self):
+        with self._lock:
+            units = list(self.units)
+        tables = {}
+        for stats in units:
+            tables.setdefault(stats.table, []).append(stats)
+        return tables
+
+    def _report_loop(self):
+        while not self._stop.wait(self.interval):
+            for table, units in self._table_units().items():
+                if all(stats.finished is not None for stats in units):
+                    continue
+                self.stream.write(self.progress_line(table, units) + "\n")
+            self.stream.flush()
+
+    def progress_line(self, table, units):
+        """One progress line, e.g. 'big_logs: 1,200,000 / 5,000,000 rows (24%) ...'."""
+        rows = sum(stats.rows for stats in units)
+        bytes_read = sum(stats.bytes_read for stats in units)
+        elapsed = time.perf_counter() - min(stats.started for stats in units)
+        rows_per_second = _rate(rows, elapsed)
+        estimate = self.estimated_rows.get(table)
+
+        if estimate:
+            done = f"{rows:,} / {estimate:,} rows ({min(100, 100 * rows // estimate)}%)"
+            eta = _format_eta((estimate - rows) / rows_per_second if rows_per_second and estimate > rows else None)
+        else:
+            done, eta = f"{rows:,} rows", _format_eta(None)
+        return (f"  {table}: {done}  {rows_per_second:,.0f} rows/s  "
+                f"{_rate(bytes_read, elapsed) / (1024 * 1024):.1f} MB/s  {eta}")
+
+    def summary(self):
+        """
+        Throughput and per-phase timing for the run.
+
+        Phase seconds are summed over units, so with --jobs > 1 they can add
+        up to more than the elapsed time; compare their shares.
+
+        Returns:
+            dict: elapsed_seconds, totals and a 'tables' dict of per-table
+            rows, bytes, wall seconds, rates and phase seconds
+        """
+        elapsed = time.perf_counter() - self._started
+        tables = {}
+        for table, units in self._table_units().items():
+            tables[table] = self._totals(units, self.estimated_rows.get(table))
+        totals = self._totals([stats for units in self._table_units().values() for stats in units])
+        # Throughput of the whole run is measured against its elapsed time
+        totals['rows_per_second'] = round(_rate(totals['rows'], elapsed))
+        totals['mb_per_second'] = round(_rate(totals['bytes_read'], elapsed) / (1024 * 1024), 2)
+        return {'elapsed_seconds': round(elapsed, 3), 'totals': totals, 'tables': tables}
+
+    def _totals(self, units, estimated_rows=None):
+        rows = sum(stats.rows for stats in units)
+        bytes_read = sum(stats.bytes_read for stats in units)
+        wall = sum(stats.wall_seconds for stats in units)
+        phases = {phase: round(sum(stats.seconds[phase] for stats in units), 3) for phase in PHASES}
+        totals = {
+            'units': len(units),
+            'rows': rows,
+            'bytes_read': bytes_read,
+            'bytes_written': sum(stats.bytes_written for stats in units),
+            'wall_seconds': round(wall, 3),
+            'rows_per_second': round(_rate(rows, wall)),
+            'mb_per_second': round(_rate(bytes_read, wall) / (1024 * 1024), 2),
+            'phase_seconds': phases,
+            'errors': [stats.error for stats in units if stats.error],
+        }
+        if estimated_rows is not None:
+            totals['estimated_rows'] = estimated_rows
+        return totals
+
+
+def phase_breakdown(phase_seconds):
+    """Describe phase seconds as shares, e.g. 'query 1%, transfer 62%, encode 30%, write 7%'."""
+    total = sum(phase_seconds.values())
+    if not total:
+        return "no time recorded"
+    return ", ".join(f"{phase} {100 * phase_seconds[phase] / total:.0f}%" for phase in PHASES)
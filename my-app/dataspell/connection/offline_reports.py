@@ -0,0 +1,238 @@
+"""
+Offline report engine for DataSpell.
+This file runs the queries/*.sql reports on exported table files with DuckDB.
+
+The files written by scripts/export_data_to_csv.py (CSV, compressed CSV,
+Parquet or Arrow IPC, including sharded and multi-file tables) are registered
+as views in an embedded DuckDB database named after their tables, so the
+reports run on a laptop without access to PostgreSQL. DuckDB scans
+the files column-wise and uses every core for each query.
+
+A few PostgreSQL constructs that DuckDB handles differently are translated
+before a report runs (see DUCKDB_REWRITES), and integer division is switched
+to PostgreSQL semantics.
+
+Reports see the data as of the export, so CURRENT_DATE windows such as
+"last 30 days" are evaluated against today's date, not the export date.
+"""
+
+import json
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from portal_dtypes import PORTAL_COLUMN_KINDS
+from report_runner import check_unique_titles, find_report_file, split_report_file
+
+# <table>[.part-0001][.0001].<format>[.gz|.zst]; incremental deltas are not matched
+_EXPORT_FILE_RE = re.compile(
+    r'^(?P<table>[A-Za-z_][A-Za-z0-9_]*)(?:\.part-\d+)?(?:\.\d+)?\.(?P<format>csv|parquet|arrows)(?:\.(?:gz|zst))?$'
+)
+
+# DuckDB types for known portal columns in CSV files (others are sniffed)
+_CSV_COLUMN_TYPES = {
+    'id': 'VARCHAR',
+    'category': 'VARCHAR',
+    'integer': 'BIGINT',
+    'boolean': 'BOOLEAN',
+    'timestamp': 'TIMESTAMP',
+}
+
+# (pattern, replacement) applied to report SQL before it runs in DuckDB:
+#   - DuckDB cannot subtract TIME values, so "x"::time becomes the time of
+#     day as an INTERVAL (ordering and differences are unchanged)
+DUCKDB_REWRITES = [
+    (re.compile(r'("[^"]+"|\b[A-Za-z_][\w.]*)::time\b', re.IGNORECASE), r'time_of_day(\1)'),
+]
+
+# Macros created in every offline database (used by DUCKDB_REWRITES)
+_DUCKDB_MACROS = [
+    "CREATE MACRO time_of_day(ts) AS ts - date_trunc('day', ts)",
+]
+
+
+def find_export_files(export_dir):
+    """
+    Find the files of each table in an export directory.
+
+    export_manifest.json is used when present, so files left over from an
+    interrupted run are not picked up. Otherwise the directory is scanned
+    for file names written by export_data_to_csv.py.
+
+    Args:
+        export_dir (str or Path): Directory of a full export
+
+    Returns:
+        OrderedDict: table -> (format, [Path, ...]) where format is 'csv',
+        'parquet' or 'arrows'
+
+    Raises:
+        ValueError: If a table's files have mixed formats
+    """
+    export_dir = Path(export_dir)
+    manifest_path = export_dir / 'export_manifest.json'
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        names = [record['file'] for files in manifest['tables'].values() for record in files]
+    else:
+        names = sorted(path.name for path in export_dir.iterdir() if path.is_file())
+
+    found = OrderedDict()
+    for name in names:
+        match = _EXPORT_FILE_RE.match(name)
+        if not match:
+            continue
+        table, file_format = match.group('table'), match.group('format')
+        current_format, paths = found.setdefault(table, (file_format, []))
+        if current_format != file_format:
+            raise ValueError(f"Table {table} has both {current_format} and {file_format} files in {export_dir}")
+        paths.append(export_dir / name)
+
+    return found
+
+
+def _sql_list(paths):
+    return '[' + ', '.join("'" + str(path).replace("'", "''") + "'" for path in paths) + ']'
+
+
+def _quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _csv_view_source(con, paths):
+    """read_csv() call for a table's CSV files, with known portal columns typed."""
+    sniffed = con.execute(f"DESCRIBE SELECT * FROM read_csv({_sql_list(paths[:1])}, header = true)").fetchall()
+    types = {
+        column: _CSV_COLUMN_TYPES[PORTAL_COLUMN_KINDS[column]]
+        for column, *_ in sniffed if column in PORTAL_COLUMN_KINDS
+    }
+    types_sql = ', '.join(f"'{column}': '{column_type}'" for column, column_type in types.items())
+    return f"read_csv({_sql_list(paths)}, header = true, types = {{{types_sql}}})"
+
+
+def connect_export(export_dir, tables=None, threads=None, memory_limit=None):
+    """
+    Open an in-memory DuckDB database with a view per exported table.
+
+    Args:
+        export_dir (str or Path): Directory of a full export
+        tables (iterable): Tables to register (default: every exported table)
+        threads (int): DuckDB worker threads (default: one per core)
+        memory_limit (str): DuckDB memory limit, e.g. '4GB' (default: DuckDB's)
+
+    Returns:
+        duckdb.DuckDBPyConnection: Connection with the tables as views
+
+    Raises:
+        ImportError: If duckdb (or pyarrow, for Arrow files) is not installed
+        ValueError: If a requested table has no files in export_dir
+    """
+    import duckdb
+
+    export_files = find_export_files(export_dir)
+    if tables is not None:
+        missing = [table for table in tables if table not in export_files]
+        if missing:
+            raise ValueError(f"No exported files for {', '.join(missing)} in {export_dir}")
+        export_files = OrderedDict((table, export_files[table]) for table in tables)
+
+    con = duckdb.connect(':memory:')
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+    if memory_limit:
+        con.execute("SET memory_limit = '{}'".format(memory_limit.replace("'", "''")))
+    # PostgreSQL semantics: integer / integer truncates
+    con.execute("SET integer_division = true")
+    for macro in _DUCKDB_MACROS:
+        con.execute(macro)
+
+    for table, (file_format, paths) in export_files.items():
+        if file_format == 'arrows':
+            import pyarrow as pa
+
+            # Memory-mapped, so the tables are not copied into memory
+            con.register(table, pa.concat_tables([
+                pa.ipc.open_stream(pa.memory_map(str(path))).read_all() for path in paths
+            ]))
+            continue
+        if file_format == 'parquet':
+            source = f"read_parquet({_sql_list(paths)})"
+        else:
+            source = _csv_view_source(con, paths)
+        con.execute(f"CREATE VIEW {_quote_identifier(table)} AS SELECT * FROM {source}")
+
+    return con
+
+
+def translate_report_sql(sql):
+    """
+    Translate PostgreSQL report SQL for DuckDB.
+
+    Args:
+        sql (str): Report query as written for PostgreSQL
+
+    Returns:
+        str: The query with DUCKDB_REWRITES applied
+    """
+    for pattern, replacement in DUCKDB_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def run_offline_reports(con, reports):
+    """
+    Run report queries on an offline export.
+
+    Reports run one after another; DuckDB runs each one on all of its threads.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): Connection from connect_export()
+        reports (list): ReportQuery tuples (see report_runner.split_report_file)
+
+    Returns:
+        tuple: (dataframes, timings) where dataframes maps report title ->
+        pandas.DataFrame and timings maps report title -> seconds, both in
+        file order
+
+    Raises:
+        ValueError: If two reports have the same title
+    """
+    check_unique_titles(reports)
+    dataframes = OrderedDict()
+    timings = OrderedDict()
+
+    for report in reports:
+        start = time.perf_counter()
+        dataframes[report.title] = con.execute(translate_report_sql(report.sql)).df()
+        timings[report.title] = time.perf_counter() - start
+
+    return dataframes, timings
+
+
+def run_offline_report_file(path, export_dir, only=None, threads=None, memory_limit=None):
+    """
+    Split a .sql report file and run its reports on exported files.
+
+    Args:
+        path (str or Path): Path to the .sql file; a bare name such as
+            'patient_analytics' is looked up in the queries directory
+        export_dir (str or Path): Directory of a full export
+        only (iterable): Report numbers to run (default: all)
+        threads (int): DuckDB worker threads (default: one per core)
+        memory_limit (str): DuckDB memory limit, e.g. '4GB'
+
+    Returns:
+        tuple: (dataframes, timings) as returned by run_offline_reports()
+    """
+    reports = split_report_file(find_report_file(path))
+    if only is not None:
+        wanted = set(only)
+        reports = [report for report in reports if report.number in wanted]
+
+    con = connect_export(export_dir, threads=threads, memory_limit=memory_limit)
+    try:
+        return run_offline_reports(con, reports)
+    finally:
+        con.close()
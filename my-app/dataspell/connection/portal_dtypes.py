@@ -0,0 +1,194 @@
+"""
+Memory-compact dtypes for DataFrames loaded from the portal schema.
+This file maps the mental health portal's columns to compact pandas dtypes.
+
+Enum-like text columns (role, status, action, ...) become categoricals,
+integers are downcast, id columns use Arrow-backed strings when pyarrow is
+installed, and timestamp columns are parsed to datetime64. Columns that are
+not in the schema map are only converted when their content leaves no doubt:
+integers, *Id columns, and text with very few distinct values in a large result.
+A column whose values do not all convert is left unchanged.
+"""
+
+import pandas as pd
+
+# Known portal columns (as named in the Prisma schema) and how to store them
+PORTAL_COLUMN_KINDS = {
+    # Low-cardinality enums and lookup values
+    'role': 'category',
+    'status': 'category',
+    'appointmentType': 'category',
+    'recordType': 'category',
+    'documentType': 'category',
+    'mimeType': 'category',
+    'medicationName': 'category',
+    'dosage': 'category',
+    'frequency': 'category',
+    'specialty': 'category',
+    'action': 'category',
+    'resourceType': 'category',
+    # Identifiers
+    'id': 'id',
+    'userId': 'id',
+    'patientId': 'id',
+    'providerId': 'id',
+    'prescriberId': 'id',
+    'senderId': 'id',
+    'recipientId': 'id',
+    'resourceId': 'id',
+    # Numbers and flags
+    'fileSize': 'integer',
+    'isRead': 'boolean',
+    # Timestamps
+    'dateOfBirth': 'timestamp',
+    'appointmentTime': 'timestamp',
+    'recordDate': 'timestamp',
+    'startDate': 'timestamp',
+    'endDate': 'timestamp',
+    'sentAt': 'timestamp',
+    'uploadDate': 'timestamp',
+    'timestamp': 'timestamp',
+    'createdAt': 'timestamp',
+    'updatedAt': 'timestamp',
+}
+
+# Unmapped text columns become categoricals only with at least this many rows
+# and at most this share of distinct values, so names and notes stay strings
+CATEGORY_MIN_ROWS = 10000
+CATEGORY_MAX_UNIQUE_RATIO = 0.01
+
+# Id columns with at most this share of distinct values (foreign keys) become categoricals
+ID_CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+def _arrow_string_dtype():
+    """Arrow-backed string dtype, or None when pyarrow is not installed."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return pd.StringDtype('pyarrow')
+
+
+def _is_text(series):
+    return series.dtype == object or pd.api.types.is_string_dtype(series.dtype)
+
+
+def _to_category(series):
+    return series.astype('category')
+
+
+def _to_id(series):
+    """Repeated ids (foreign keys) become categoricals, unique ids compact strings."""
+    if not _is_text(series):
+        return series
+    if len(series) and series.nunique(dropna=True) / len(series) <= ID_CATEGORY_MAX_UNIQUE_RATIO:
+        return _to_category(series)
+    string_dtype = _arrow_string_dtype()
+    return series.astype(string_dtype) if string_dtype is not None else series
+
+
+def _to_integer(series):
+    """Downcast integers; integral floats holding NULLs become nullable integers."""
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return pd.to_numeric(series, downcast='integer')
+
+    if pd.api.types.is_float_dtype(series.dtype):
+        values = series.dropna()
+        if (values == values.round()).all():
+            downcast = pd.to_numeric(values, downcast='integer')
+            nullable = pd.api.types.pandas_dtype(downcast.dtype.name.capitalize())
+            return series.astype(nullable)
+    return series
+
+
+def _to_boolean(series):
+    if series.dtype == object:
+        return series.astype('boolean')
+    return series
+
+
+def _to_timestamp(series):
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series
+    # Raises on unparseable values, so the column is left as it is instead of losing them
+    return pd.to_datetime(series)
+
+
+_CONVERTERS = {
+    'category': _to_category,
+    'id': _to_id,
+    'integer': _to_integer,
+    'boolean': _to_boolean,
+    'timestamp': _to_timestamp,
+}
+
+
+def _infer_kind(name, series):
+    """Pick a storage kind for a column that is not in PORTAL_COLUMN_KINDS."""
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return 'integer'
+    if _is_text(series) and series.notna().any():
+        if name.endswith('Id'):
+            return 'id'
+        if (len(series) >= CATEGORY_MIN_ROWS
+                and series.nunique(dropna=True) / len(series) <= CATEGORY_MAX_UNIQUE_RATIO):
+            return 'category'
+    return None
+
+
+def compact_dataframe(df, column_kinds=None):
+    """
+    Convert a DataFrame to memory-compact dtypes.
+
+    The memory use before and after is stored in df.attrs['memory_report']
+    (see memory_report()).
+
+    Args:
+        df (pandas.DataFrame): DataFrame loaded from the portal database
+        column_kinds (dict): Extra or overriding column -> kind entries, where
+            kind is 'category', 'id', 'integer', 'boolean', 'timestamp' or
+            None to leave the column unchanged
+
+    Returns:
+        pandas.DataFrame: A new DataFrame with compact dtypes
+    """
+    kinds = dict(PORTAL_COLUMN_KINDS)
+    kinds.update(column_kinds or {})
+
+    before = int(df.memory_usage(index=True, deep=True).sum())
+    compact = df.copy()
+    for position, name in enumerate(compact.columns):
+        series = compact.iloc[:, position]
+        kind = kinds[name] if name in kinds else _infer_kind(str(name), series)
+        if kind is None:
+            continue
+        try:
+            compact.isetitem(position, _CONVERTERS[kind](series))
+        except (TypeError, ValueError):
+            # Leave columns whose content does not fit the expected kind as they are
+            continue
+
+    after = int(compact.memory_usage(index=True, deep=True).sum())
+    compact.attrs['memory_report'] = {'before_bytes': before, 'after_bytes': after}
+    return compact
+
+
+def memory_report(df):
+    """
+    Describe the memory saved by compact_dataframe().
+
+    Args:
+        df (pandas.DataFrame): Result of compact_dataframe()
+
+    Returns:
+        str: e.g. "Memory: 12.40 MB -> 1.35 MB (9.2x smaller)"
+    """
+    report = df.attrs.get('memory_report')
+    if not report:
+        return "Memory: no compaction report available"
+
+    before, after = report['before_bytes'], report['after_bytes']
+    ratio = before / after if after else float('inf')
+    return (f"Memory: {before / (1024 * 1024):.2f} MB -> "
+            f"{after / (1024 * 1024):.2f} MB ({ratio:.1f}x smaller)")
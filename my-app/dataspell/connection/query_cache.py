@@ -0,0 +1,467 @@
+"""
+Query result cache for DataSpell.
+This file provides a two-tier cache for query results used by db_config.
+
+Results are kept in an in-memory LRU tier bounded by a byte budget. Entries
+evicted from memory (or too large for it) are spilled to Parquet files on
+disk, where they survive kernel restarts until their TTL runs out.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from pathlib import Path
+
+# Default location of the on-disk tier (gitignored)
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / '.query_cache'
+
+# Quoted strings/identifiers are kept verbatim; comments and whitespace runs are normalized
+_SQL_TOKEN_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|\s+", re.S)
+
+# Tokens of normalized SQL: string literals, quoted identifiers, words and single symbols
+_WORD_TOKEN_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\w+|\S")
+
+# Stands in for "any table" when a query's tables cannot be determined, so
+# its cache entries are dropped by every invalidation
+ANY_TABLE = '*'
+
+# Words that start a subquery after an opening parenthesis
+_SUBQUERY_WORDS = {'SELECT', 'WITH', 'VALUES', 'TABLE'}
+
+# Keywords that can come right before "(" without it being a function call
+_PAREN_KEYWORDS = {
+    'ALL', 'AND', 'ANY', 'ARRAY', 'AS', 'EXISTS', 'FROM', 'IN', 'JOIN', 'LATERAL', 'MATERIALIZED',
+    'NOT', 'ON', 'OR', 'SELECT', 'SOME', 'THEN', 'UNION', 'INTERSECT', 'EXCEPT', 'USING',
+    'WHEN', 'ELSE', 'WHERE', 'WITH',
+}
+
+# Keywords that can follow a FROM item, so they are never taken as its alias
+_CLAUSE_KEYWORDS = {
+    'CROSS', 'EXCEPT', 'FETCH', 'FOR', 'FULL', 'GROUP', 'HAVING', 'INNER', 'INTERSECT', 'JOIN',
+    'LEFT', 'LIMIT', 'NATURAL', 'OFFSET', 'ON', 'ORDER', 'RETURNING', 'RIGHT', 'TABLESAMPLE',
+    'UNION', 'USING', 'WHERE', 'WINDOW',
+}
+
+
+def normalize_sql(query):
+    """
+    Normalize a SQL string so formatting differences map to the same cache key.
+
+    Comments are dropped, whitespace runs collapse to one space and trailing
+    semicolons are removed. Quoted literals and identifiers are left untouched.
+
+    Args:
+        query (str): SQL query
+
+    Returns:
+        str: Normalized SQL
+    """
+    def replace(match):
+        token = match.group(0)
+        if token[0] in ('\'', '"'):
+            return token
+        return ' '
+
+    normalized = _SQL_TOKEN_RE.sub(replace, query).strip()
+    while normalized.endswith(';'):
+        normalized = normalized[:-1].rstrip()
+    return normalized
+
+
+def referenced_tables(query):
+    """
+    Return the lowercase names of the tables a query reads from.
+
+    Every item of a FROM list is included (comma joins, LATERAL items and
+    DELETE ... USING lists), as are JOINed tables and those of subqueries.
+    Schema prefixes and quotes are dropped, so "public"."users" becomes users.
+    If a FROM list cannot be parsed, the result is {ANY_TABLE}.
+
+    Args:
+        query (str): SQL query
+
+    Returns:
+        set: Table names
+    """
+    tokens = _WORD_TOKEN_RE.findall(normalize_sql(query))
+    words = [token.upper() for token in tokens]
+    tables = set()
+    ctes = set()
+    # Positions of "(" that open a FROM item (subquery, function call or
+    # parenthesized join); the FROM list carries on after the matching ")"
+    items = set()
+    # One (position, from_allowed) pair per open parenthesis: FROM starts a
+    # FROM list at the top level of a subquery, not in e.g. EXTRACT(x FROM y)
+    parens = []
+
+    for position, word in enumerate(words):
+        previous = words[position - 1] if position else ''
+        following = words[position + 1] if position + 1 < len(words) else ''
+        if word == '(':
+            function_call = position > 0 and _is_identifier(tokens[position - 1]) \
+                and previous not in _PAREN_KEYWORDS
+            parens.append((position, following in _SUBQUERY_WORDS or not function_call))
+        elif word == ')':
+            if parens and parens.pop()[0] in items:
+                rest = _skip_alias(tokens, words, position + 1)
+                if rest < len(words) and words[rest] == ',' \
+                        and not _read_from_list(tokens, words, rest + 1, tables, items):
+                    return {ANY_TABLE}
+        elif word == 'AS' and (following == '(' or following in ('MATERIALIZED', 'NOT')):
+            # WITH name AS (...): a CTE, not a table
+            if position and _is_identifier(tokens[position - 1]):
+                ctes.add(_identifier_name(tokens[position - 1]))
+        elif parens and not parens[-1][1]:
+            continue
+        elif word == 'FROM' and previous != 'DISTINCT' or word == 'JOIN' \
+                or word == 'USING' and following != '(':
+            if not _read_from_list(tokens, words, position + 1, tables, items):
+                return {ANY_TABLE}
+
+    return tables - ctes
+
+
+def _is_identifier(token):
+    return token[0] == '"' or token[0].isalpha() or token[0] == '_'
+
+
+def _identifier_name(token):
+    if token[0] == '"':
+        return token[1:-1].replace('""', '"').lower()
+    return token.lower()
+
+
+def _skip_alias(tokens, words, position):
+    """Position after an optional "[AS] alias [(columns)]"."""
+    if position < len(words) and words[position] == 'AS':
+        position += 1
+    if position < len(words) and _is_identifier(tokens[position]) \
+            and words[position] not in _CLAUSE_KEYWORDS:
+        position += 1
+        if position < len(words) and words[position] == '(':
+            while position < len(words) and words[position] != ')':
+                position += 1
+            position += 1
+    return position
+
+
+def _read_from_list(tokens, words, position, tables, items):
+    """
+    Add the tables of a FROM list starting at a token position.
+
+    An item in parentheses (or a function call) ends the reading here; its
+    position is added to items so the caller resumes the list after it.
+
+    Returns:
+        bool: False if the list could not be parsed
+    """
+    while True:
+        while position < len(words) and words[position] in ('ONLY', 'LATERAL'):
+            position += 1
+        if position >= len(words):
+            return False
+
+        if words[position] == '(':
+            items.add(position)
+            if position + 1 < len(words) and words[position + 1] in _SUBQUERY_WORDS:
+                return True
+            # Parenthesized join: it starts with a FROM item
+            position += 1
+            continue
+        if not _is_identifier(tokens[position]):
+            return False
+
+        name = tokens[position]
+        position += 1
+        while position + 1 < len(words) and words[position] == '.' and _is_identifier(tokens[position + 1]):
+            name = tokens[position + 1]
+            position += 2
+        if position < len(words) and words[position] == '(':
+            # Set-returning function such as generate_series(...)
+            items.add(position)
+            return True
+        tables.add(_identifier_name(name))
+
+        position = _skip_alias(tokens, words, position)
+        if position < len(words) and words[position] == ',':
+            position += 1
+            continue
+        return True
+
+
+def cache_key(query, params=None):
+    """
+    Build the cache key for a query and its parameters.
+
+    Args:
+        query (str): SQL query
+        params (tuple or dict): Query parameters
+
+    Returns:
+        str: Hex digest identifying the query
+    """
+    payload = json.dumps([normalize_sql(query), params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Entry:
+    """A cached DataFrame with its expiry time, size and source tables."""
+
+    __slots__ = ('df', 'expires_at', 'nbytes', 'tables')
+
+    def __init__(self, df, expires_at, nbytes, tables):
+        self.df = df
+        self.expires_at = expires_at
+        self.nbytes = nbytes
+        self.tables = tables
+
+
+class QueryCache:
+    """
+    Two-tier (memory LRU + Parquet on disk) cache of query results.
+
+    Args:
+        max_bytes (int): Memory budget for cached DataFrames
+        cache_dir (str or Path): Directory for the Parquet tier, or None to
+            keep results in memory only
+        default_ttl (float): Seconds an entry stays valid when put() is not
+            given a ttl; None keeps entries until invalidated
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, cache_dir=DEFAULT_CACHE_DIR, default_ttl=3600):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+
+        if self.cache_dir is not None:
+            try:
+                from pandas.io.parquet import get_engine
+                get_engine('auto')
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+            except ImportError:
+                warnings.warn("No Parquet engine installed (pip install pyarrow); "
+                              "query cache will be kept in memory only.")
+                self.cache_dir = None
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+            'spills': 0,
+            'spill_errors': 0,
+            'invalidations': 0,
+        }
+
+    def get(self, query, params=None):
+        """
+        Look up a cached result.
+
+        Args:
+            query (str): SQL query
+            params (tuple or dict): Query parameters
+
+        Returns:
+            pandas.DataFrame: A copy of the cached result, or None on a miss
+        """
+        key = cache_key(query, params)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_expired(entry.expires_at, now):
+                    self._remove_memory(key)
+                    self._stats['expired'] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return entry.df.copy()
+
+            entry = self._load_disk(key, now)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+            self._stats['disk_hits'] += 1
+            if entry.nbytes <= self.max_bytes:
+                # Promote to memory; the entry is written again if evicted
+                self._remove_disk(key)
+                self._store_memory(key, entry)
+            return entry.df.copy()
+
+    def put(self, query, df, params=None, ttl=None, tables=None):
+        """
+        Store a query result.
+
+        Args:
+            query (str): SQL query
+            df (pandas.DataFrame): Query result
+            params (tuple or dict): Query parameters
+            ttl (float): Seconds the entry stays valid (default: default_ttl)
+            tables (iterable): Tables the result depends on (default: parsed from the query)
+        """
+        if ttl is None:
+            ttl = self.default_ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        tables = {t.lower() for t in tables} if tables is not None else referenced_tables(query)
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        entry = _Entry(df.copy(), expires_at, nbytes, tables)
+        key = cache_key(query, params)
+
+        with self._lock:
+            self._remove_memory(key)
+            self._remove_disk(key)
+            if nbytes > self.max_bytes:
+                # Too large for the memory tier; keep it on disk only
+                self._spill(key, entry)
+            else:
+                self._store_memory(key, entry)
+
+    def invalidate(self, *tables):
+        """
+        Drop cached results that read from any of the given tables.
+
+        Called without arguments, drops everything.
+
+        Args:
+            *tables (str): Table names
+
+        Returns:
+            int: Number of entries removed
+        """
+        wanted = {t.lower() for t in tables}
+
+        def matches(entry_tables):
+            entry_tables = set(entry_tables)
+            return not wanted or ANY_TABLE in entry_tables or bool(wanted & entry_tables)
+
+        removed = 0
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if matches(e.tables)]:
+                self._remove_memory(key)
+                removed += 1
+
+            for meta_path in self._disk_metadata_paths():
+                try:
+                    meta = json.loads(meta_path.read_text())
+                except (OSError, ValueError):
+                    continue
+                if matches(meta.get('tables', [])):
+                    self._remove_disk(meta_path.stem)
+                    removed += 1
+
+            self._stats['invalidations'] += removed
+        return removed
+
+    def clear(self):
+        """Drop every cached result from both tiers."""
+        return self.invalidate()
+
+    def stats(self):
+        """
+        Return cache hit/miss counters and current size.
+
+        Returns:
+            dict: Counters plus hit_rate, memory_entries, memory_bytes and disk_entries
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            hits = stats['memory_hits'] + stats['disk_hits']
+            lookups = hits + stats['misses']
+            stats['hit_rate'] = hits / lookups if lookups else 0.0
+            stats['memory_entries'] = len(self._entries)
+            stats['memory_bytes'] = self._bytes
+            stats['disk_entries'] = len(self._disk_metadata_paths())
+            return stats
+
+    @staticmethod
+    def _is_expired(expires_at, now):
+        return expires_at is not None and expires_at <= now
+
+    def _store_memory(self, key, entry):
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self.max_bytes and self._entries:
+            old_key, old_entry = self._entries.popitem(last=False)
+            self._bytes -= old_entry.nbytes
+            self._stats['evictions'] += 1
+            self._spill(old_key, old_entry)
+
+    def _remove_memory(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def _paths(self, key):
+        return self.cache_dir / f"{key}.parquet", self.cache_dir / f"{key}.json"
+
+    def _disk_metadata_paths(self):
+        if self.cache_dir is None:
+            return []
+        return list(self.cache_dir.glob('*.json'))
+
+    def _spill(self, key, entry):
+        """Write an entry to the Parquet tier (no-op without a cache_dir)."""
+        if self.cache_dir is None or self._is_expired(entry.expires_at, time.time()):
+            return
+
+        data_path, meta_path = self._paths(key)
+        # Parquet needs unique string column names; the originals are kept in the metadata
+        df = entry.df.set_axis([str(i) for i in range(entry.df.shape[1])], axis=1)
+        try:
+            df.to_parquet(data_path)
+        except Exception:
+            # Columns such as Decimal or mixed objects cannot always be written
+            self._stats['spill_errors'] += 1
+            data_path.unlink(missing_ok=True)
+            return
+
+        meta_path.write_text(json.dumps({
+            'expires_at': entry.expires_at,
+            'nbytes': entry.nbytes,
+            'tables': sorted(entry.tables),
+            'columns': list(entry.df.columns),
+        }, default=str))
+        self._stats['spills'] += 1
+
+    def _load_disk(self, key, now):
+        """Read an entry from the Parquet tier, dropping it if it has expired."""
+        if self.cache_dir is None:
+            return None
+
+        import pandas as pd
+
+        data_path, meta_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+        if self._is_expired(meta.get('expires_at'), now):
+            self._remove_disk(key)
+            self._stats['expired'] += 1
+            return None
+
+        try:
+            df = pd.read_parquet(data_path)
+        except Exception:
+            self._remove_disk(key)
+            return None
+        df.columns = meta['columns']
+
+        return _Entry(df, meta.get('expires_at'), meta.get('nbytes', 0), set(meta.get('tables', [])))
+
+    def _remove_disk(self, key):
+        if self.cache_dir is None:
+            return
+        for path in self._paths(key):
+            path.unlink(missing_ok=True)
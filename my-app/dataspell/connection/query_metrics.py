@@ -0,0 +1,371 @@
+"""
+Query instrumentation for DataSpell.
+This file records per-query metrics for the db_config query helpers.
+
+For each call a record is written to a sink with:
+    - wall_seconds:      total time spent in the helper
+    - pool_wait_seconds: time spent waiting for a pooled connection
+    - endpoint:          database (primary or replica) that served the query
+    - execute_seconds:   time in cursor.execute()/COPY (server execution plus transfer)
+    - server_seconds:    server execution time from EXPLAIN ANALYZE (explain mode only)
+    - rows, bytes:       result size (bytes are approximate except for COPY loads)
+    - call_site, label:  where the query came from
+
+Turn it on with db_config.enable_instrumentation().
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from query_cache import normalize_sql
+
+# Frames from these locations are skipped when looking for the calling site
+_INTERNAL_DIR = str(Path(__file__).parent.resolve())
+_SKIPPED_PATH_PARTS = (
+    f"{os.sep}pandas{os.sep}",
+    f"{os.sep}concurrent{os.sep}futures{os.sep}",
+    f"{os.sep}threading.py",
+    f"{os.sep}contextlib.py",
+)
+
+# Quoted literals and identifiers, ignored when looking for keywords
+_QUOTED_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+
+# Data-modifying statements that can appear inside a WITH query
+_WRITE_KEYWORD_RE = re.compile(r'\b(?:INSERT|UPDATE|DELETE|MERGE)\b', re.I)
+
+_local = threading.local()
+
+
+@contextmanager
+def query_label(label):
+    """
+    Tag every query run inside the block with a label (e.g. a report title).
+
+    Args:
+        label (str): Label stored in the metric records
+    """
+    previous = getattr(_local, 'label', None)
+    _local.label = label
+    try:
+        yield
+    finally:
+        _local.label = previous
+
+
+def query_hash(query):
+    """Short stable identifier for a query, independent of formatting."""
+    return hashlib.sha1(normalize_sql(query).encode('utf-8')).hexdigest()[:12]
+
+
+def _call_site():
+    """Return 'file:line (function)' for the first frame outside the DataSpell helpers."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        internal = (os.path.dirname(os.path.abspath(filename)) == _INTERNAL_DIR
+                    or any(part in filename for part in _SKIPPED_PATH_PARTS))
+        if not internal:
+            return f"{filename}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return None
+
+
+def _is_read_only(query):
+    """Only plain reads are safe to run a second time under EXPLAIN ANALYZE."""
+    normalized = normalize_sql(query)
+    first_word = normalized.split(' ', 1)[0].upper()
+    if first_word == 'WITH':
+        # e.g. WITH moved AS (DELETE ... RETURNING *) SELECT ... changes data
+        return not _WRITE_KEYWORD_RE.search(_QUOTED_RE.sub(' ', normalized))
+    return first_word in ('SELECT', 'VALUES', 'TABLE')
+
+
+class JsonlSink:
+    """Append metric records to a JSON Lines file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+
+    def to_dataframe(self):
+        """Load every record written to the file so far."""
+        return read_metrics(self.path)
+
+
+class MemorySink:
+    """Keep metric records in memory for summary tables."""
+
+    def __init__(self, max_records=100000):
+        self.max_records = max_records
+        self.records = []
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        with self._lock:
+            self.records.append(record)
+            if len(self.records) > self.max_records:
+                del self.records[:len(self.records) - self.max_records]
+
+    def to_dataframe(self):
+        """Return all records as a pandas DataFrame."""
+        import pandas as pd
+
+        with self._lock:
+            return pd.DataFrame(list(self.records))
+
+    def summary(self):
+        """Return per-query aggregates (see summarize_metrics)."""
+        return summarize_metrics(self.to_dataframe())
+
+
+def read_metrics(path):
+    """
+    Load metric records from a JSON Lines file.
+
+    Args:
+        path (str or Path): File written by JsonlSink
+
+    Returns:
+        pandas.DataFrame: One row per recorded query call
+    """
+    import pandas as pd
+
+    with open(path) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def summarize_metrics(df):
+    """
+    Aggregate metric records per query, slowest first.
+
+    Args:
+        df (pandas.DataFrame): Records from MemorySink.to_dataframe() or read_metrics()
+
+    Returns:
+        pandas.DataFrame: calls, wall time mean/p95/max, execute and server
+        time means, mean rows and total bytes per query_hash
+    """
+    if df.empty:
+        return df
+
+    grouped = df.groupby('query_hash')
+    summary = grouped.agg(
+        label=('label', 'last'),
+        query=('query', 'first'),
+        calls=('wall_seconds', 'size'),
+        mean_wall_seconds=('wall_seconds', 'mean'),
+        p95_wall_seconds=('wall_seconds', lambda s: s.quantile(0.95)),
+        max_wall_seconds=('wall_seconds', 'max'),
+        mean_execute_seconds=('execute_seconds', 'mean'),
+        mean_server_seconds=('server_seconds', 'mean'),
+        mean_rows=('rows', 'mean'),
+        total_bytes=('bytes', 'sum'),
+    )
+    summary['query'] = summary['query'].str.slice(0, 120)
+    return summary.sort_values('mean_wall_seconds', ascending=False)
+
+
+class _InstrumentedCursor:
+    """Cursor proxy that adds execute() time to a measurement."""
+
+    def __init__(self, cursor, measurement):
+        self._cursor = cursor
+        self._measurement = measurement
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._cursor.close()
+
+    def execute(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(*args, **kwargs)
+        finally:
+            self._measurement.add_execute_time(time.perf_counter() - start)
+
+
+class _InstrumentedConnection:
+    """Connection proxy whose cursors are timed."""
+
+    def __init__(self, conn, measurement):
+        self._conn = conn
+        self._measurement = measurement
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return _InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._measurement)
+
+
+class QueryMeasurement:
+    """Collects metrics for one query call; emitted to the sink on exit."""
+
+    def __init__(self, recorder, query, loader, params=None):
+        self._recorder = recorder
+        self._query = query
+        self._params = params
+        self._start = time.perf_counter()
+        self.record = {
+            'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+            'query_hash': query_hash(query),
+            'query': normalize_sql(query),
+            'loader': loader,
+            'label': getattr(_local, 'label', None),
+            'call_site': _call_site(),
+            'wall_seconds': None,
+            'pool_wait_seconds': None,
+            'endpoint': None,
+            'execute_seconds': 0.0,
+            'server_seconds': None,
+            'rows': 0,
+            'bytes': 0,
+            'error': None,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.record['wall_seconds'] = time.perf_counter() - self._start
+        if exc_value is not None:
+            self.record['error'] = f"{exc_type.__name__}: {exc_value}"
+        self._recorder.emit(self.record)
+        return False
+
+    def connected(self, conn=None):
+        """Mark the moment a pooled connection was obtained and note its endpoint."""
+        self.record['pool_wait_seconds'] = time.perf_counter() - self._start
+        self.record['endpoint'] = getattr(conn, 'endpoint', None)
+
+    def note(self, **fields):
+        """Set or override fields of the record."""
+        self.record.update(fields)
+
+    def wrap(self, conn):
+        """Wrap a connection so cursor.execute() calls are timed."""
+        return _InstrumentedConnection(conn, self)
+
+    def add_execute_time(self, seconds):
+        self.record['execute_seconds'] += seconds
+
+    def add_result(self, rows, nbytes):
+        self.record['rows'] += rows
+        self.record['bytes'] += nbytes
+
+    def add_dataframe(self, df):
+        """Count a result DataFrame (bytes approximated by its memory footprint)."""
+        self.add_result(len(df), int(df.memory_usage(index=False, deep=True).sum()))
+
+    def capture_plan(self, conn):
+        """Run EXPLAIN (ANALYZE, BUFFERS) for the query when explain mode is on."""
+        if not self._recorder.explain or not _is_read_only(self._query):
+            return
+        if conn.autocommit:
+            self.record['plan_error'] = "EXPLAIN ANALYZE is not run on autocommit connections"
+            return
+
+        # The query runs again in a read-only transaction that is rolled back,
+        # so the server refuses any write that slipped past _is_read_only()
+        try:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute("SET TRANSACTION READ ONLY;")
+                cur.execute(
+                    f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {normalize_sql(self._query)}",
+                    self._params
+                )
+                plan = cur.fetchone()[0]
+        except Exception as e:
+            self.record['plan_error'] = str(e)
+            return
+        finally:
+            conn.rollback()
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        self.record['plan'] = plan
+        self.record['server_seconds'] = plan[0].get('Execution Time', 0.0) / 1000.0
+
+
+class _NullMeasurement:
+    """Stand-in used when instrumentation is off; every hook is a no-op."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def connected(self, conn=None):
+        pass
+
+    def note(self, **fields):
+        pass
+
+    def wrap(self, conn):
+        return conn
+
+    def add_execute_time(self, seconds):
+        pass
+
+    def add_result(self, rows, nbytes):
+        pass
+
+    def add_dataframe(self, df):
+        pass
+
+    def capture_plan(self, conn):
+        pass
+
+
+NULL_MEASUREMENT = _NullMeasurement()
+
+
+class QueryRecorder:
+    """
+    Creates measurements and forwards finished records to a sink.
+
+    Args:
+        sink: Object with a write(record) method, e.g. JsonlSink or MemorySink
+        explain (bool): Also capture EXPLAIN (ANALYZE, BUFFERS) plans. This runs
+            every read-only query a second time, so only use it while profiling.
+    """
+
+    def __init__(self, sink, explain=False):
+        self.sink = sink
+        self.explain = explain
+
+    def measure(self, query, loader, params=None):
+        return QueryMeasurement(self, query, loader, params)
+
+    def emit(self, record):
+        try:
+            self.sink.write(record)
+        except Exception as e:
+            # A broken sink must never break the query itself
+            print(f"Failed to write query metrics: {e}", file=sys.stderr)
@@ -0,0 +1,165 @@
+"""
+Report pack runner for DataSpell.
+This file runs the numbered reports in the queries/*.sql files concurrently.
+
+Each report in a .sql file starts with a numbered comment header, e.g.
+
+    -- 3. Provider Workload Analysis
+    SELECT ...;
+
+The reports are independent, so they run in parallel on pooled connections
+and a full pack takes roughly as long as its slowest report.
+"""
+
+import re
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from db_config import POOL_PARAMS, query_to_dataframe
+from query_metrics import query_label
+
+# Directory holding the report .sql files
+QUERIES_DIR = Path(__file__).parent.parent / 'queries'
+
+# "-- 3. Provider Workload Analysis"
+_REPORT_HEADER_RE = re.compile(r'^\s*--\s*(\d+)\.\s*(.+?)\s*$')
+
+ReportQuery = namedtuple('ReportQuery', ['number', 'title', 'sql'])
+
+
+def split_report_file(path):
+    """
+    Split a .sql report file into its numbered statements.
+
+    Text before the first numbered header (the file description) is ignored.
+
+    Args:
+        path (str or Path): Path to the .sql file
+
+    Returns:
+        list: ReportQuery(number, title, sql) tuples in file order
+    """
+    reports = []
+    current = None
+    lines = []
+
+    def finish():
+        sql = '\n'.join(lines).strip()
+        if current is not None and sql:
+            reports.append(ReportQuery(current[0], current[1], sql))
+
+    for line in Path(path).read_text().splitlines():
+        match = _REPORT_HEADER_RE.match(line)
+        if match:
+            finish()
+            current = (int(match.group(1)), match.group(2))
+            lines = []
+        elif current is not None:
+            lines.append(line)
+    finish()
+
+    return reports
+
+
+def find_report_file(path):
+    """
+    Resolve a report file argument.
+
+    Args:
+        path (str or Path): Path to a .sql file, or a bare name such as
+            'patient_analytics' that is looked up in the queries directory
+
+    Returns:
+        Path: The .sql file
+    """
+    path = Path(path)
+    if not path.exists() and not path.is_absolute():
+        path = QUERIES_DIR / path.with_suffix('.sql').name
+    return path
+
+
+def check_unique_titles(reports):
+    """
+    Make sure no two reports share a title, since results are keyed by title.
+
+    Raises:
+        ValueError: If a title is used more than once
+    """
+    seen = {}
+    for report in reports:
+        if report.title in seen:
+            raise ValueError(f"Reports {seen[report.title]} and {report.number} are both "
+                             f"titled '{report.title}'")
+        seen[report.title] = report.number
+
+
+def _timed_query(title, sql):
+    start = time.perf_counter()
+    with query_label(title):
+        df = query_to_dataframe(sql)
+    return df, time.perf_counter() - start
+
+
+def run_reports(reports, parallelism=None):
+    """
+    Run report queries concurrently.
+
+    Args:
+        reports (list): ReportQuery tuples (see split_report_file)
+        parallelism (int): Maximum number of queries running at once, capped
+            at the connection pool's maxconn so no query waits for a
+            connection (default: maxconn; raise it with configure_pool())
+
+    Returns:
+        tuple: (dataframes, timings) where dataframes maps report title ->
+        pandas.DataFrame and timings maps report title -> seconds, both in
+        file order
+
+    Raises:
+        ValueError: If two reports have the same title
+    """
+    check_unique_titles(reports)
+    if parallelism is None:
+        parallelism = POOL_PARAMS['maxconn']
+    parallelism = max(1, min(parallelism, POOL_PARAMS['maxconn'], len(reports) or 1))
+
+    dataframes = OrderedDict()
+    timings = OrderedDict()
+
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        futures = [
+            (report.title, executor.submit(_timed_query, report.title, report.sql))
+            for report in reports
+        ]
+        try:
+            for title, future in futures:
+                dataframes[title], timings[title] = future.result()
+        except BaseException:
+            for _, future in futures:
+                future.cancel()
+            raise
+
+    return dataframes, timings
+
+
+def run_report_file(path, parallelism=None, only=None):
+    """
+    Split a .sql report file and run its reports concurrently.
+
+    Args:
+        path (str or Path): Path to the .sql file; a bare name such as
+            'patient_analytics' is looked up in the queries directory
+        parallelism (int): Maximum number of queries running at once
+        only (iterable): Report numbers to run (default: all)
+
+    Returns:
+        tuple: (dataframes, timings) as returned by run_reports()
+    """
+    reports = split_report_file(find_report_file(path))
+    if only is not None:
+        wanted = set(only)
+        reports = [report for report in reports if report.number in wanted]
+
+    return run_reports(reports, parallelism=parallelism)
@@ -0,0 +1,182 @@
+"""
+Vectorized value synthesis for DataSpell sample data.
+This file draws whole columns of fake values at once with NumPy.
+
+Calling Faker and random.choice() once per value costs microseconds each,
+which adds up to minutes per million rows. Here, values that need Faker to
+look realistic (names, addresses, paragraphs, ...) are generated once into a
+fixed-size vocabulary pool and then sampled by index. Everything else
+(choices from short lists, date offsets, flags, sizes, codes and UUIDs) is
+drawn as NumPy arrays, and only turned into Python objects at the end with
+tolist() so any loader in bulk_load.py can send them.
+"""
+
+import string
+
+import numpy as np
+
+# Values in each Faker vocabulary pool
+POOL_SIZE = 4096
+
+_HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+_LETTERS = np.frombuffer(string.ascii_letters.encode(), dtype=np.uint8)
+_DIGITS = np.frombuffer(string.digits.encode(), dtype=np.uint8)
+
+# Positions of the 32 hex digits in a 36-character UUID string
+_UUID_HEX_POSITIONS = np.array([i for i in range(36) if i not in (8, 13, 18, 23)])
+
+
+def vocabulary(values):
+    """NumPy object array of a list of values, for drawing with choose()."""
+    pool = np.empty(len(values), dtype=object)
+    pool[:] = list(values)
+    return pool
+
+
+def build_pool(make, size=POOL_SIZE):
+    """
+    Build a vocabulary pool by calling a value factory (e.g. a Faker method).
+
+    Args:
+        make (callable): Returns one value per call
+        size (int): Number of values
+
+    Returns:
+        numpy.ndarray: Object array of values
+    """
+    return vocabulary([make() for _ in range(size)])
+
+
+def choose(rng, pool, count):
+    """Draw count values uniformly from a vocabulary (list or object array)."""
+    if not isinstance(pool, np.ndarray):
+        pool = vocabulary(pool)
+    return pool[rng.integers(0, len(pool), count)]
+
+
+def with_nulls(values, keep):
+    """
+    Python list of values with None where keep is False.
+
+    Args:
+        values (numpy.ndarray): Values (datetime64 values become datetimes)
+        keep (numpy.ndarray): Boolean mask of the values to keep
+    """
+    values = np.asarray(values).astype(object)
+    values[~keep] = None
+    return values.tolist()
+
+
+def offset_times(start, offsets, unit='D'):
+    """
+    Datetimes at offsets from a start time.
+
+    Args:
+        start (datetime): Reference time (naive)
+        offsets (numpy.ndarray): Integer offsets
+        unit (str): NumPy unit of the offsets ('D' days, 's' seconds, ...)
+
+    Returns:
+        numpy.ndarray: datetime64[us] values (tolist() gives datetimes)
+    """
+    return np.datetime64(start, 'us') + offsets.astype(f'timedelta64[{unit}]')
+
+
+def offset_dates(start, days):
+    """datetime64[D] values days after a start date (tolist() gives dates)."""
+    return np.datetime64(start, 'D') + days.astype('timedelta64[D]')
+
+
+def _splitmix64(values):
+    # SplitMix64 finalizer: a bijective mix of every bit of a uint64
+    values = values + np.uint64(0x9e3779b97f4a7c15)
+    values ^= values >> np.uint64(30)
+    values *= np.uint64(0xbf58476d1ce4e5b9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94d049bb133111eb)
+    values ^= values >> np.uint64(31)
+    return values
+
+
+def _set_uuid4_bits(data):
+    data[:, 6] = (data[:, 6] & 0x0f) | 0x40
+    data[:, 8] = (data[:, 8] & 0x3f) | 0x80
+    return data
+
+
+def keyed_uuid_bytes(key, indexes):
+    """
+    Deterministic UUID (version 4 format) bytes of row indexes.
+
+    The same key and index always give the same UUID, so children can compute
+    their parents' ids from the parent's index, a whole column at a time.
+
+    Args:
+        key (int): 128-bit key, e.g. derived from the run seed and the table
+        indexes (numpy.ndarray): Non-negative row indexes
+
+    Returns:
+        numpy.ndarray: (len(indexes), 16) uint8
+    """
+    indexes = np.asarray(indexes, dtype=np.uint64)
+    words = np.empty((len(indexes), 2), dtype='>u8')
+    with np.errstate(over='ignore'):
+        words[:, 0] = _splitmix64(indexes ^ np.uint64(key & 0xffffffffffffffff))
+        words[:, 1] = _splitmix64(indexes ^ np.uint64((key >> 64) & 0xffffffffffffffff))
+    return _set_uuid4_bits(words.view(np.uint8).reshape(len(indexes), 16))
+
+
+def random_uuid_bytes(rng, count):
+    """Random UUID (version 4) bytes, (count, 16) uint8."""
+    return _set_uuid4_bits(rng.integers(0, 256, (count, 16), dtype=np.uint8))
+
+
+def uuid_strings(data):
+    """
+    Format UUID bytes as canonical strings.
+
+    Args:
+        data (numpy.ndarray): (n, 16) uint8 from keyed_uuid_bytes() or random_uuid_bytes()
+
+    Returns:
+        list: 36-character strings, e.g. '1b4e28ba-2fa1-4d2e-883f-0016d3cca427'
+    """
+    count = len(data)
+    text = np.full((count, 36), ord('-'), dtype=np.uint8)
+    digits = np.empty((count, 32), dtype=np.uint8)
+    digits[:, 0::2] = _HEX_DIGITS[data >> 4]
+    digits[:, 1::2] = _HEX_DIGITS[data & 0x0f]
+    text[:, _UUID_HEX_POSITIONS] = digits
+    return _byte_rows_to_strings(text)
+
+
+def pattern_strings(rng, pattern, count):
+    """
+    Random codes following a pattern, like Faker's bothify().
+
+    Args:
+        rng (numpy.random.Generator): Random generator
+        pattern (str): '?' is a random letter, '#' a random digit, any other
+            ASCII character is copied
+        count (int): Number of codes
+
+    Returns:
+        list: Strings of len(pattern) characters
+    """
+    text = np.empty((count, len(pattern)), dtype=np.uint8)
+    for position, character in enumerate(pattern):
+        if character == '?':
+            text[:, position] = _LETTERS[rng.integers(0, len(_LETTERS), count)]
+        elif character == '#':
+            text[:, position] = _DIGITS[rng.integers(0, len(_DIGITS), count)]
+        else:
+            text[:, position] = ord(character)
+    return _byte_rows_to_strings(text)
+
+
+def _byte_rows_to_strings(text):
+    # Each row of ASCII bytes becomes one str
+    count, width = text.shape
+    if not width:
+        return [''] * count
+    return np.ascontiguousarray(text).view(f'S{width}').ravel().astype(f'U{width}').tolist()
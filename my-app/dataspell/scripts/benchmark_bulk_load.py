@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Bulk Load Benchmark Script
+
+This script compares how fast generated sample rows are loaded with the
+loaders in bulk_load.py: multi-row INSERTs (execute_values), COPY in text
+format and COPY in binary format.
+
+Rows for one table are generated once with generate_sample_data.py, so only
+loading is timed. They are loaded into a scratch copy of the table (same
+columns, indexes and defaults, no foreign keys), which is dropped afterwards.
+
+Usage:
+    python benchmark_bulk_load.py [--table TABLE] [--rows N] [--batch-size N] [--repeat N]
+                                  [--loaders LOADER1,LOADER2,...] [--backend {numpy,python}]
+
+Options:
+    --table TABLE                Table whose rows are generated (default: audit_logs)
+    --rows N                     Number of rows to load (default: 100000)
+    --batch-size N               Rows per INSERT / COPY batch (default: 10000)
+    --repeat N                   Number of timed runs per loader (default: 3)
+    --loaders LOADER1,LOADER2    Loaders to benchmark (default: insert,copy,copy-binary)
+    --backend BACKEND            Backend generating the rows (default: numpy)
+"""
+
+import sys
+import time
+import argparse
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+# Add the parent directory to the path so we can import the db_config module
+sys.path.append(str(Path(__file__).parent.parent / 'connection'))
+
+try:
+    import psycopg2
+except ImportError:
+    print("Required packages not found. Install with:")
+    print("pip install psycopg2-binary faker python-dotenv")
+    sys.exit(1)
+
+# Import our database configuration
+try:
+    from db_config import get_connection
+    from bulk_load import DEFAULT_BATCH_SIZE, LOAD_METHODS, load_rows
+except ImportError:
+    print("Failed to import database configuration. Make sure db_config.py exists in the connection directory.")
+    sys.exit(1)
+
+import generate_sample_data as generator
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark bulk loading of generated sample rows.')
+    parser.add_argument('--table', choices=list(generator.TABLE_COLUMNS), default='audit_logs',
+                        help='Table whose rows are generated (default: audit_logs)')
+    parser.add_argument('--rows', type=int, default=100000,
+                        help='Number of rows to load (default: 100000)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Rows per INSERT / COPY batch (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs per loader (default: 3)')
+    parser.add_argument('--loaders', default=','.join(LOAD_METHODS),
+                        help=f"Loaders to benchmark (default: {','.join(LOAD_METHODS)})")
+    parser.add_argument('--backend', choices=generator.BACKENDS, default='numpy',
+                        help='Backend generating the rows (default: numpy)')
+    args = parser.parse_args()
+
+    args.loader_list = [loader.strip() for loader in args.loaders.split(',') if loader.strip()]
+    unknown = [loader for loader in args.loader_list if loader not in LOAD_METHODS]
+    if unknown:
+        parser.error(f"Unknown loaders: {', '.join(unknown)} (use: {', '.join(LOAD_METHODS)})")
+    if args.rows < 1 or args.repeat < 1 or args.batch_size < 1:
+        parser.error("--rows, --repeat and --batch-size must be at least 1")
+
+    return args
+
+def generate_table_rows(table, rows, seed=1, backend='numpy'):
+    """Generate rows of one table in memory, so generation is not timed."""
+    if table in ('users', 'patient_profiles'):
+        overrides = {'patients': rows}
+    elif table == 'providers':
+        overrides = {'providers': rows}
+    else:
+        overrides = {table: rows}
+    plan = generator.GenerationPlan(seed, generator.plan_row_counts(overrides=overrides), datetime.now(), 1, backend)
+    return list(islice(generator.table_rows(plan, table), rows))
+
+def time_loader(conn, name, scratch_table, columns, rows, batch_size, repeat):
+    """Load the rows several times with one loader and return its best time."""
+    timings = []
+    for _ in range(repeat):
+        with conn.cursor() as cur:
+            cur.execute(f"TRUNCATE {scratch_table}")
+        conn.commit()
+
+        start = time.perf_counter()
+        loaded = load_rows(conn, scratch_table, columns, rows, method=name, batch_size=batch_size)
+        timings.append(time.perf_counter() - start)
+
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT COUNT(*) FROM {scratch_table}")
+        count = cur.fetchone()[0]
+    conn.commit()
+    if count != loaded:
+        raise RuntimeError(f"{name} loaded {loaded} rows but {scratch_table} has {count}")
+
+    best = min(timings)
+    rate = loaded / best if best > 0 else float('inf')
+    print(f"{name:<24} {loaded:>12,} rows  {best:>9.3f} s  {rate:>14,.0f} rows/s")
+    return best
+
+def main():
+    """Main function to benchmark the bulk loaders."""
+    args = parse_args()
+    scratch_table = f"bench_{args.table}"
+    columns = generator.TABLE_COLUMNS[args.table]
+
+    print("=== Bulk Load Benchmark ===")
+    print(f"Table: {args.table} ({args.rows:,} rows, batches of {args.batch_size:,})")
+    print(f"Runs per loader: {args.repeat}")
+    print("=" * 40)
+
+    start = time.perf_counter()
+    rows = generate_table_rows(args.table, args.rows, backend=args.backend)
+    print(f"Generated rows with the {args.backend} backend in {time.perf_counter() - start:.2f} s "
+          f"(not included below)")
+
+    conn = get_connection(pooled=False)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {scratch_table}")
+            cur.execute(f"CREATE TABLE {scratch_table} (LIKE {args.table} INCLUDING ALL)")
+        conn.commit()
+
+        baseline = None
+        for loader in args.loader_list:
+            elapsed = time_loader(conn, loader, scratch_table, columns, rows, args.batch_size, args.repeat)
+            if baseline is None:
+                baseline = elapsed
+            else:
+                print(f"  speedup vs {args.loader_list[0]}: {baseline / elapsed:.1f}x")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {scratch_table}")
+        conn.commit()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Query Loading Benchmark Script
+
+This script compares how fast query results are loaded into pandas through
+query_to_dataframe() (pandas.read_sql) and copy_query_to_dataframe() (COPY).
+It also checks that both paths return the same columns and dtypes.
+
+Usage:
+    python benchmark_query_loading.py [--query QUERY] [--repeat N] [--engines ENGINE1,ENGINE2,...]
+
+Options:
+    --query QUERY                SQL query to load (default: SELECT * FROM audit_logs;)
+    --repeat N                   Number of timed runs per loader (default: 3)
+    --engines ENGINE1,ENGINE2    COPY parsers to benchmark: pandas, arrow (default: pandas,arrow)
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add the parent directory to the path so we can import the db_config module
+sys.path.append(str(Path(__file__).parent.parent / 'connection'))
+
+try:
+    import pandas as pd
+except ImportError:
+    print("Required packages not found. Install with:")
+    print("pip install pandas psycopg2-binary")
+    sys.exit(1)
+
+# Import our database configuration
+try:
+    from db_config import query_to_dataframe, copy_query_to_dataframe
+except ImportError:
+    print("Failed to import database configuration. Make sure db_config.py exists in the connection directory.")
+    sys.exit(1)
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark loading query results into pandas.')
+    parser.add_argument('--query', default='SELECT * FROM audit_logs;',
+                        help='SQL query to load (default: SELECT * FROM audit_logs;)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs per loader (default: 3)')
+    parser.add_argument('--engines', default='pandas,arrow',
+                        help='COPY parsers to benchmark: pandas, arrow (default: pandas,arrow)')
+    return parser.parse_args()
+
+def time_loader(name, loader, repeat):
+    """Run a loader several times and return its best time and last result."""
+    timings = []
+    df = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = loader()
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    rows = len(df)
+    rate = rows / best if best > 0 else float('inf')
+    print(f"{name:<24} {rows:>12,} rows  {best:>9.3f} s  {rate:>14,.0f} rows/s")
+    return best, df
+
+def compare_dtypes(reference, other):
+    """Return a list of columns whose dtypes differ between two DataFrames."""
+    differences = []
+    for column, ref_dtype, other_dtype in zip(reference.columns, reference.dtypes, other.dtypes):
+        if str(ref_dtype) != str(other_dtype):
+            differences.append(f"{column}: {ref_dtype} vs {other_dtype}")
+    return differences
+
+def main():
+    """Main function to benchmark the query loading paths."""
+    args = parse_args()
+    engines = [engine.strip() for engine in args.engines.split(',') if engine.strip()]
+
+    print("=== Query Loading Benchmark ===")
+    print(f"Query: {args.query}")
+    print(f"Runs per loader: {args.repeat}")
+    print("=" * 40)
+
+    # Warm up the connection pool so connection setup is not measured
+    query_to_dataframe("SELECT 1;")
+
+    baseline, reference = time_loader(
+        'read_sql', lambda: query_to_dataframe(args.query), args.repeat
+    )
+
+    for engine in engines:
+        try:
+            elapsed, df = time_loader(
+                f"COPY ({engine})",
+                lambda: copy_query_to_dataframe(args.query, engine=engine),
+                args.repeat
+            )
+        except ImportError as e:
+            print(f"COPY ({engine}) skipped: {e}")
+            continue
+
+        print(f"  speedup vs read_sql: {baseline / elapsed:.1f}x")
+        differences = compare_dtypes(reference, df)
+        if differences:
+            print("  dtype differences:")
+            for difference in differences:
+                print(f"    - {difference}")
+
+if __name__ == "__main__":
+    main()
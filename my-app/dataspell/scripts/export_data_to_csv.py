@@ -5,18 +5,102 @@ Database Data Export Script
 This script exports data from the PostgreSQL database tables to CSV files.
 It's useful for exporting data for analysis in other tools or sharing with others.
 
+All tables are read from one exported transaction snapshot, so the files are
+consistent with each other (e.g. every appointment's patient is in users.csv)
+even while the portal keeps writing. With --jobs N, N tables are exported
+concurrently, largest first.
+
+Very large tables can be split into ranges of a key or time column with
+--split; each range is exported as a numbered shard file
+(<table>.part-0001.csv, ...) and <table>.manifest.json lists the shards with
+their ranges and row counts. Shards are exported concurrently like tables.
+
+With --incremental only rows changed since the previous run are exported, as
+<table>.delta-<run>.csv files plus a manifest-<run>.json. Changes are found
+with the "updatedAt" column (timestamp for audit_logs), and the position
+reached for each table is kept in a state file. Each run re-reads a short
+overlap window so rows committed late are not missed, so a row can appear in
+more than one delta: load deltas by upserting on id. Deleted rows are not
+detected; tables without a watermark column are exported in full every run.
+
+--format parquet or --format arrow writes typed, compressed columnar files
+instead of CSV (requires pyarrow). Rows are still streamed with COPY and
+written in row groups, so memory stays bounded.
+
+CSV files can be compressed on the fly (--compression gzip or zstd) and split
+into numbered files (users.0001.csv.gz, ...) with --max-file-mb or
+--max-file-rows. Every run writes export_manifest.json and SHA256SUMS
+(checkable with `sha256sum -c SHA256SUMS`) listing each file with its row
+count, size and checksum.
+
+Full exports are checkpointed: export_checkpoint.json records the shard plan
+and every finished table, shard and chunk. If a run dies, rerun it with the
+same options plus --resume to skip the parts that were completed (their files
+are checked against the recorded sizes). With --chunk-rows N, tables larger
+than N rows are exported in key-range chunks of about N rows (on their
+primary key, or the --split time column), so a restart only repeats the
+chunks that were in progress. Chunks exported after a restart are read from
+a new snapshot. The run ends with a status line per table and exits with
+status 1 if any table failed.
+
+While tables export, a progress line per running table (rows, rows/s, MB/s
+and an ETA from the planner's row estimate) is printed every few seconds.
+export_summary.json records the throughput of every table and how its time
+split into query, transfer (server/network), encode (CPU) and write (disk).
+
+With --mask, PII is masked while it streams (requires pyarrow and a secret
+key in EXPORT_MASKING_KEY): ids and emails are replaced with keyed hash
+tokens that still join across tables, free-text PII is redacted and dates of
+birth are truncated. See export_masking.py for the default rules;
+--mask-rules replaces them with rules from a JSON file.
+
 Usage:
-    python export_data_to_csv.py [--output-dir OUTPUT_DIR] [--tables TABLE1,TABLE2,...]
+    python export_data_to_csv.py [--output-dir OUTPUT_DIR] [--tables TABLE1,TABLE2,...] [--jobs N]
+                                 [--split TABLE[:COLUMN],...] [--shards N]
+                                 [--incremental] [--state-file STATE_FILE] [--overlap SECONDS]
+                                 [--format {csv,parquet,arrow}] [--compression CODEC] [--compression-level N]
+                                 [--row-group-rows N] [--max-file-mb MB] [--max-file-rows N]
+                                 [--chunk-rows N] [--resume]
+                                 [--progress-interval SECONDS] [--summary-file SUMMARY_FILE]
+                                 [--mask] [--mask-rules RULES_FILE]
 
 Options:
     --output-dir OUTPUT_DIR    Directory to save CSV files (default: ../exports)
     --tables TABLE1,TABLE2,... Comma-separated list of tables to export (default: all tables)
+    --jobs N                   Number of tables exported concurrently (default: 1)
+    --split TABLE[:COLUMN],... Tables to export as range shards; COLUMN defaults to
+                               timestamp for audit_logs and sentAt for messages
+    --shards N                 Number of shards per split table (default: 8)
+    --incremental              Export only rows changed since the previous incremental run
+    --state-file STATE_FILE    Watermark state file (default: OUTPUT_DIR/export_state.json)
+    --overlap SECONDS          Seconds re-read before each watermark (default: 300)
+    --format FORMAT            csv, parquet or arrow (Arrow IPC stream) (default: csv)
+    --compression CODEC        CSV: none (default), gzip or zstd;
+                               Parquet: zstd (default), snappy, gzip, lz4, brotli or none;
+                               Arrow: none (default, allows zero-copy loading), zstd or lz4
+    --compression-level N      Codec compression level (default: the codec's default)
+    --row-group-rows N         Rows per Parquet row group / Arrow record batch (default: 250000)
+    --max-file-mb MB           Start a new CSV file after about MB megabytes (default: no limit)
+    --max-file-rows N          Start a new CSV file after N rows (default: no limit)
+    --chunk-rows N             Export tables larger than N rows in resumable chunks (default: off)
+    --resume                   Continue an interrupted export from export_checkpoint.json
+    --progress-interval SECONDS
+                               Seconds between progress lines, 0 to disable (default: 5)
+    --summary-file SUMMARY_FILE
+                               Run summary (default: OUTPUT_DIR/export_summary.json)
+    --mask                     Mask PII with the default rules (key from EXPORT_MASKING_KEY)
+    --mask-rules RULES_FILE    JSON file of per-table masking rules (implies --mask)
 """
 
 import sys
 import os
-import csv
+import json
+import time
+import threading
 import argparse
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 
@@ -25,7 +109,8 @@ sys.path.append(str(Path(__file__).parent.parent / 'connection'))
 
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor
+    from psycopg2 import sql
+    from psycopg2.extensions import ISOLATION_LEVEL_REPEATABLE_READ
 except ImportError:
     print("Required packages not found. Install with:")
     print("pip install psycopg2-binary")
@@ -33,11 +118,54 @@ except ImportError:
 
 # Import our database configuration
 try:
-    from db_config import get_connection
+    from db_config import get_connection, configure_pool, POOL_PARAMS
+    from export_formats import (
+        ExportOptions, ExportedFile, ColumnType, CsvFileWriter, FILE_EXTENSIONS, COMPRESSIONS,
+        DEFAULT_ROW_GROUP_ROWS, arrow_schema, file_extension, open_csv_batches, write_columnar,
+        write_csv_batches
+    )
+    from export_masking import MaskingPolicy, MASK_KEY_ENV, MIN_MASK_KEY_LENGTH, load_masking_rules
+    from export_progress import ExportProgress, current_stats, phase_breakdown
 except ImportError:
     print("Failed to import database configuration. Make sure db_config.py exists in the connection directory.")
     sys.exit(1)
 
+# Output files are written through a large buffer; COPY sends one small chunk per row
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Default range column for tables exported with --split
+SPLIT_COLUMNS = {
+    'audit_logs': 'timestamp',
+    'messages': 'sentAt',
+}
+
+# Shard boundaries are taken from a block sample of about this many rows
+SPLIT_SAMPLE_ROWS = 100000
+
+# Column tracking the last change of a row, for --incremental
+WATERMARK_COLUMNS = {
+    'audit_logs': 'timestamp',
+}
+DEFAULT_WATERMARK_COLUMN = 'updatedAt'
+
+# Transactions can commit a little after the timestamp they write, so each
+# incremental run re-reads this many seconds before the previous watermark
+INCREMENTAL_OVERLAP_SECONDS = 300
+
+DEFAULT_EXPORT_OPTIONS = ExportOptions()
+
+# Seconds between progress lines while tables export
+PROGRESS_INTERVAL_SECONDS = 5
+
+# Progress of full exports, kept in the output directory until a run succeeds
+CHECKPOINT_FILE = 'export_checkpoint.json'
+
+# A table, one shard or chunk of a table, exported to its own file(s)
+ExportUnit = namedtuple('ExportUnit', ['key', 'table', 'column', 'lower', 'upper', 'output_path'])
+
+# Final outcome for one table: status is 'exported', 'resumed' or 'failed'
+TableStatus = namedtuple('TableStatus', ['table', 'status', 'rows', 'files', 'error'])
+
 def parse_args():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description='Export PostgreSQL data to CSV files.')
@@ -45,7 +173,103 @@ def parse_args():
                         help='Directory to save CSV files (default: ../exports)')
     parser.add_argument('--tables', default='',
                         help='Comma-separated list of tables to export (default: all tables)')
-    return parser.parse_args()
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of tables exported concurrently (default: 1)')
+    parser.add_argument('--split', default='',
+                        help='Comma-separated TABLE[:COLUMN] list of tables to export as range shards')
+    parser.add_argument('--shards', type=int, default=8,
+                        help='Number of shards per split table (default: 8)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Export only rows changed since the previous incremental run')
+    parser.add_argument('--state-file', default='',
+                        help='Watermark state file (default: OUTPUT_DIR/export_state.json)')
+    parser.add_argument('--overlap', type=int, default=INCREMENTAL_OVERLAP_SECONDS,
+                        help=f'Seconds re-read before each watermark (default: {INCREMENTAL_OVERLAP_SECONDS})')
+    parser.add_argument('--format', choices=sorted(FILE_EXTENSIONS), default='csv',
+                        help='Output format: csv, parquet or arrow (default: csv)')
+    parser.add_argument('--compression', default='',
+                        help='Compression codec (default: none for csv and arrow, zstd for parquet)')
+    parser.add_argument('--compression-level', type=int, default=None,
+                        help="Compression level (default: the codec's default)")
+    parser.add_argument('--row-group-rows', type=int, default=DEFAULT_ROW_GROUP_ROWS,
+                        help=f'Rows per Parquet row group / Arrow record batch (default: {DEFAULT_ROW_GROUP_ROWS})')
+    parser.add_argument('--max-file-mb', type=float, default=None,
+                        help='Start a new CSV file after about this many megabytes (default: no limit)')
+    parser.add_argument('--max-file-rows', type=int, default=None,
+                        help='Start a new CSV file after this many rows (default: no limit)')
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help='Export tables larger than this many rows in resumable chunks (default: off)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue an interrupted export from its checkpoint')
+    parser.add_argument('--mask', action='store_true',
+                        help=f'Hash ids and emails and redact PII (key from ${MASK_KEY_ENV})')
+    parser.add_argument('--mask-rules', default='',
+                        help='JSON file of {table: {column: rule}} masking rules (implies --mask)')
+    parser.add_argument('--progress-interval', type=float, default=PROGRESS_INTERVAL_SECONDS,
+                        help=f'Seconds between progress lines, 0 to disable (default: {PROGRESS_INTERVAL_SECONDS})')
+    parser.add_argument('--summary-file', default='',
+                        help='Run summary with throughput and phase timing (default: OUTPUT_DIR/export_summary.json)')
+    args = parser.parse_args()
+    
+    if args.format != 'csv':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error(f"--format {args.format} requires pyarrow (pip install pyarrow)")
+    if args.compression and args.compression not in COMPRESSIONS[args.format]:
+        parser.error(f"--compression for {args.format} must be one of: "
+                     f"{', '.join(COMPRESSIONS[args.format])}")
+    if args.format == 'csv' and args.compression == 'zstd':
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            parser.error("--compression zstd requires zstandard (pip install zstandard)")
+    if (args.max_file_mb or args.max_file_rows) and args.format != 'csv':
+        parser.error("--max-file-mb and --max-file-rows are only supported for --format csv")
+    
+    masking = None
+    if args.mask or args.mask_rules:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--mask requires pyarrow (pip install pyarrow)")
+        # The key is read from the environment so it never shows up in the process list
+        key = os.environ.get(MASK_KEY_ENV, '')
+        if len(key) < MIN_MASK_KEY_LENGTH:
+            parser.error(f"--mask needs a secret key of at least {MIN_MASK_KEY_LENGTH} characters "
+                         f"in ${MASK_KEY_ENV}")
+        try:
+            table_rules = load_masking_rules(args.mask_rules) if args.mask_rules else None
+        except (OSError, ValueError) as e:
+            parser.error(f"--mask-rules: {e}")
+        masking = MaskingPolicy(key, table_rules)
+    args.export_options = ExportOptions(
+        file_format=args.format,
+        compression=args.compression or None,
+        row_group_rows=args.row_group_rows,
+        compression_level=args.compression_level,
+        max_file_bytes=int(args.max_file_mb * 1024 * 1024) if args.max_file_mb else None,
+        max_file_rows=args.max_file_rows,
+        masking=masking,
+    )
+    
+    if args.incremental and (args.split or args.chunk_rows or args.resume):
+        parser.error("--split, --chunk-rows and --resume cannot be combined with --incremental "
+                     "(failed incremental tables are retried by the next run)")
+    if not args.state_file:
+        args.state_file = str(Path(args.output_dir) / 'export_state.json')
+    if not args.summary_file:
+        args.summary_file = str(Path(args.output_dir) / 'export_summary.json')
+    
+    # Resolve --split into table -> range column
+    args.split_columns = {}
+    for item in filter(None, args.split.split(',')):
+        table, _, column = item.partition(':')
+        column = column or SPLIT_COLUMNS.get(table)
+        if not column:
+            parser.error(f"--split needs a column for table {table} (use {table}:COLUMN)")
+        args.split_columns[table] = column
+    return args
 
 def get_all_tables():
     """Get a list of all tables in the database."""
@@ -68,42 +292,962 @@ def get_all_tables():
     conn.close()
     return tables
 
-def export_table_to_csv(table_name, output_dir):
-    """Export a table to a CSV file."""
+def get_table_sizes(tables):
+    """
+    Get the on-disk size of each table, used to schedule the largest tables first.
+
+    Args:
+        tables (list): Table names
+
+    Returns:
+        dict: Table name -> size in bytes (0 for views and unknown names)
+    """
+    conn = get_connection()
+    
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT
+                c.relname,
+                pg_total_relation_size(c.oid)
+            FROM
+                pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE
+                n.nspname = 'public'
+                AND c.relname = ANY(%s);
+        """, (list(tables),))
+        sizes = dict(cur.fetchall())
+    
+    conn.close()
+    return {table: sizes.get(table, 0) for table in tables}
+
+def get_row_estimates(tables):
+    """
+    Get the planner's row estimate (pg_class.reltuples) of each table, for progress ETAs.
+
+    Returns:
+        dict: Table name -> estimated rows, None for views and tables never analyzed
+    """
     conn = get_connection()
-    output_path = Path(output_dir) / f"{table_name}.csv"
     
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT
+                c.relname,
+                c.reltuples::bigint
+            FROM
+                pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE
+                n.nspname = 'public'
+                AND c.relkind IN ('r', 'p', 'm')
+                AND c.relname = ANY(%s);
+        """, (list(tables),))
+        estimates = dict(cur.fetchall())
+    
+    conn.close()
+    # reltuples is -1 (or 0 before PostgreSQL 14) until the table is first analyzed
+    return {table: estimates[table] if estimates.get(table, 0) > 0 else None for table in tables}
+
+@contextmanager
+def snapshot_transaction(conn, snapshot_id=None):
+    """
+    Run the block in a read-only REPEATABLE READ transaction on conn.
+
+    Args:
+        conn: Database connection
+        snapshot_id (str): Snapshot from pg_export_snapshot() to read from
+            (default: the transaction's own snapshot)
+    """
+    # psycopg2 opens the transaction with these characteristics on the first
+    # statement, so SET TRANSACTION SNAPSHOT is still the first command in it.
+    # The session is reset afterwards so it does not stick to a pooled connection.
+    conn.rollback()
+    conn.set_session(isolation_level=ISOLATION_LEVEL_REPEATABLE_READ, readonly=True, autocommit=False)
     try:
-        # Create output directory if it doesn't exist
-        os.makedirs(output_dir, exist_ok=True)
-        
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Get the data
-            cur.execute(f"SELECT * FROM {table_name};")
-            rows = cur.fetchall()
-            
-            if not rows:
-                print(f"Table {table_name} is empty. Creating empty CSV file.")
-                with open(output_path, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow([])
-                return 0
+        if snapshot_id:
+            with conn.cursor() as cur:
+                cur.execute("SET TRANSACTION SNAPSHOT %s;", (snapshot_id,))
+        yield
+    finally:
+        if not conn.closed:
+            try:
+                conn.rollback()
+                conn.set_session(isolation_level='DEFAULT', readonly='DEFAULT')
+            except psycopg2.Error:
+                pass
+
+@contextmanager
+def exported_snapshot():
+    """
+    Export a transaction snapshot that other connections can read from.
+
+    The exporting transaction is kept open until the block exits, so every
+    worker that imports the snapshot sees exactly the same data.
+
+    Yields:
+        str: Snapshot id for SET TRANSACTION SNAPSHOT
+    """
+    conn = get_connection()
+    try:
+        with snapshot_transaction(conn):
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_export_snapshot();")
+                snapshot_id = cur.fetchone()[0]
+            yield snapshot_id
+    finally:
+        conn.close()
+
+def describe_query(cur, select_sql):
+    """
+    Get the result columns of a SELECT without running it.
+
+    Args:
+        cur: Cursor inside the export transaction
+        select_sql (psycopg2.sql.Composable): SELECT statement
+
+    Returns:
+        list: ColumnType(name, type_name, is_enum) tuples in result order
+    """
+    cur.execute(sql.SQL("SELECT * FROM ({}) AS q LIMIT 0;").format(select_sql))
+    description = cur.description
+    
+    cur.execute("SELECT oid::int, typname, typtype FROM pg_type WHERE oid = ANY(%s::oid[]);",
+                (sorted({col.type_code for col in description}),))
+    types = {oid: (typname, typtype) for oid, typname, typtype in cur.fetchall()}
+    
+    return [
+        ColumnType(col.name, types[col.type_code][0], types[col.type_code][1] == 'e')
+        for col in description
+    ]
+
+def copy_query_to_batches(cur, select_sql, output_path, options=DEFAULT_EXPORT_OPTIONS, masker=None):
+    """
+    Stream the result of a SELECT through Arrow record batches into a file.
+
+    Used for Parquet and Arrow IPC output, and for CSV that is masked on the
+    way. COPY writes CSV into a pipe from a background thread while pyarrow
+    parses it block by block on this thread, so the transfer, parsing and
+    writing overlap and only one row group is held in memory.
+
+    Args:
+        cur: Cursor inside the export transaction
+        select_sql (psycopg2.sql.Composable): SELECT statement to export
+        output_path (Path): File to write
+        options (ExportOptions): Output format settings
+        masker (TableMasker): Hashes columns of every batch before it is written
+
+    Returns:
+        list: ExportedFile for each file written
+    """
+    stats = current_stats()
+    columnar = options.file_format != 'csv'
+    if columnar:
+        # Dates and timestamps are written as ISO 8601 in UTC, the only
+        # forms the Arrow CSV parser reads regardless of the role's settings
+        cur.execute("SET LOCAL TimeZone = 'UTC';")
+        cur.execute("SET LOCAL DateStyle = 'ISO';")
+    # CSV is parsed as text so values are written back exactly as COPY sent them
+    schema = arrow_schema(describe_query(cur, select_sql), as_text=not columnar)
+    copy_sql = sql.SQL("COPY ({}) TO STDOUT WITH (FORMAT csv)").format(select_sql)
+    copy_sql = copy_sql.as_string(cur)
+    
+    read_fd, write_fd = os.pipe()
+    copy_errors = []
+    
+    def produce():
+        try:
+            with open(write_fd, 'wb', buffering=WRITE_BUFFER_SIZE) as pipe:
+                cur.copy_expert(copy_sql, pipe)
+        except BaseException as e:
+            copy_errors.append(e)
+    
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        # Closing the read end on failure makes a blocked COPY fail too
+        with open(read_fd, 'rb') as pipe:
+            batches = open_csv_batches(pipe, schema, stats)
+            if masker is not None:
+                batches = masker.mask_batches(batches, schema)
+                schema = masker.masked_schema(schema)
+            if columnar:
+                files = [write_columnar(batches, output_path, schema, options, stats)]
+            else:
+                files = write_csv_batches(batches, output_path, schema, options, stats)
+    finally:
+        producer.join()
+    
+    if copy_errors:
+        raise copy_errors[0]
+    # Parsing, masking and encoding run between reads and writes, so they get the rest
+    stats.finish('encode')
+    return files
+
+def copy_query_to_csv(cur, select_sql, output_path, options=DEFAULT_EXPORT_OPTIONS):
+    """
+    Stream the result of a SELECT straight into CSV file(s) with COPY ... HEADER.
+
+    Args:
+        cur: Cursor inside the export transaction
+        select_sql (psycopg2.sql.Composable): SELECT statement to export
+        output_path (Path): File to write
+        options (ExportOptions): Compression and file size settings
+
+    Returns:
+        list: ExportedFile for each file written
+    """
+    stats = current_stats()
+    copy_sql = sql.SQL(
+        "COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+    ).format(select_sql)
+    
+    writer = CsvFileWriter(output_path, options, stats)
+    try:
+        cur.copy_expert(copy_sql.as_string(cur), writer)
+    except BaseException:
+        writer.abort()
+        raise
+    files = writer.close()
+    # Time inside copy_expert not spent encoding or writing was spent receiving rows
+    stats.finish('transfer')
+    return files
+
+def copy_query_to_file(select_sql, output_path, snapshot_id=None, options=DEFAULT_EXPORT_OPTIONS,
+                       table_name=None):
+    """
+    Stream the result of a SELECT into a file (or numbered CSV files) using COPY.
+
+    With options.masking set, the masking rules of table_name are applied on
+    the way (see export_masking).
+
+    Args:
+        select_sql (psycopg2.sql.Composable): SELECT statement to export
+        output_path (Path): File to write
+        snapshot_id (str): Exported snapshot to read from (see exported_snapshot)
+        options (ExportOptions): Output format settings (default: CSV with header)
+        table_name (str): Table the rows come from, for its masking rules
+
+    Returns:
+        list: ExportedFile(path, rows, bytes, sha256) for each file written
+    """
+    conn = get_connection()
+    
+    try:
+        with snapshot_transaction(conn, snapshot_id), conn.cursor() as cur:
+            masker = None
+            if options.masking is not None:
+                column_names = [column.name for column in describe_query(cur, select_sql)]
+                masker = options.masking.table_masker(table_name, column_names)
+                select_sql = masker.select_sql(select_sql)
+                if not masker.hashed_columns:
+                    masker = None
             
-            # Write to CSV
-            with open(output_path, 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=rows[0].keys())
-                writer.writeheader()
-                writer.writerows(rows)
+            if options.file_format != 'csv' or masker is not None:
+                return copy_query_to_batches(cur, select_sql, output_path, options, masker)
+            return copy_query_to_csv(cur, select_sql, output_path, options)
+    finally:
+        conn.close()
+
+def output_file(output_dir, name, options=DEFAULT_EXPORT_OPTIONS):
+    """Path of an export file: output_dir/name plus the format's extension."""
+    return Path(output_dir) / f"{name}{file_extension(options)}"
+
+def count_rows(files):
+    """Total rows in a list of ExportedFile (None for a failed export counts as 0)."""
+    return sum(exported.rows for exported in files or [])
+
+def file_records(files):
+    """Describe ExportedFile tuples for a JSON manifest."""
+    return [
+        {'file': exported.path.name, 'rows': exported.rows,
+         'bytes': exported.bytes, 'sha256': exported.sha256}
+        for exported in files
+    ]
+
+def write_sha256sums(path, tables):
+    """Write the checksums of every exported file in the format read by `sha256sum -c`."""
+    with open(path, 'w') as f:
+        for files in tables.values():
+            for exported in files:
+                f.write(f"{exported.sha256}  {exported.path.name}\n")
+
+def write_export_manifest(output_dir, tables):
+    """
+    Write export_manifest.json and SHA256SUMS for the files of a full export.
+
+    Args:
+        output_dir (str): Export directory
+        tables (dict): Table -> list of ExportedFile (failed tables are left out)
+
+    Returns:
+        Path: The JSON manifest
+    """
+    manifest_path = Path(output_dir) / "export_manifest.json"
+    manifest = {
+        'exported_at': datetime.now().isoformat(timespec='seconds'),
+        'tables': {table: file_records(files) for table, files in tables.items()},
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    write_sha256sums(Path(output_dir) / "SHA256SUMS", tables)
+    return manifest_path
+
+def export_table_to_csv(table_name, output_dir, snapshot_id=None, options=DEFAULT_EXPORT_OPTIONS):
+    """
+    Export a table to a CSV (or Parquet / Arrow) file.
+
+    The rows are streamed from the server with COPY ... TO STDOUT and written
+    straight to the file, so memory use does not grow with the table size.
+
+    Args:
+        table_name (str): Name of the table (or view) to export
+        output_dir (str): Directory to write <table_name>.csv to
+        snapshot_id (str): Exported snapshot to read the table from
+            (see exported_snapshot)
+        options (ExportOptions): Output format settings
+
+    Returns:
+        list: ExportedFile for each file written
+
+    Raises:
+        psycopg2.Error, OSError: If the export fails
+    """
+    output_path = output_file(output_dir, table_name, options)
+    
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+    
+    select_sql = sql.SQL("SELECT * FROM {}").format(sql.Identifier(table_name))
+    files = copy_query_to_file(select_sql, output_path, snapshot_id, options, table_name)
+    row_count = count_rows(files)
+    
+    if row_count == 0:
+        print(f"Table {table_name} is empty. Created {output_path} without rows.")
+    elif len(files) > 1:
+        print(f"Exported {row_count} rows from {table_name} to {len(files)} files ({files[0].path.name} ...)")
+    else:
+        print(f"Exported {row_count} rows from {table_name} to {output_path}")
+    return files
+
+def plan_table_shards(table_name, column, shards, snapshot_id=None, rows_per_shard=None):
+    """
+    Split a table into ranges of a column with roughly equal row counts.
+
+    Boundaries are percentiles of a TABLESAMPLE block sample, so planning is
+    cheap even for very large tables and follows skewed data. The first
+    range is open below (and includes NULLs), the last is open above, so
+    together the ranges cover every row.
+
+    Args:
+        table_name (str): Table to split
+        column (str): Column to split on (any orderable type)
+        shards (int): Number of ranges wanted
+        snapshot_id (str): Exported snapshot to plan against
+        rows_per_shard (int): Instead of `shards`, aim for ranges of about this
+            many rows (based on the planner's row estimate)
+
+    Returns:
+        list: (lower, upper) tuples of boundary values as text, None for an
+        open end; fewer than `shards` ranges if the column has few distinct
+        values, and a single range if the table has never been analyzed
+    """
+    if not rows_per_shard and shards <= 1:
+        return [(None, None)]
+    
+    conn = get_connection()
+    
+    try:
+        with snapshot_transaction(conn, snapshot_id), conn.cursor() as cur:
+            table = sql.Identifier(table_name)
+            cur.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass;",
+                        (table.as_string(cur),))
+            estimated_rows = cur.fetchone()[0]
+            if estimated_rows <= 0:
+                # Never analyzed (-1, or 0 before PostgreSQL 14): sampling needs a row
+                # estimate, and percentiles of the whole table would mean a full sort
+                print(f"Table {table_name} has no row estimate (not analyzed yet); exporting it "
+                      f"unsplit. Run ANALYZE {table.as_string(cur)} to split it.")
+                return [(None, None)]
+            if rows_per_shard:
+                shards = max(1, -(-int(estimated_rows) // rows_per_shard))
+            if shards <= 1:
+                return [(None, None)]
+            if estimated_rows > SPLIT_SAMPLE_ROWS:
+                sample_percent = 100.0 * SPLIT_SAMPLE_ROWS / estimated_rows
+            else:
+                sample_percent = 100.0
             
-            row_count = len(rows)
-            print(f"Exported {row_count} rows from {table_name} to {output_path}")
-            return row_count
-    except Exception as e:
-        print(f"Error exporting table {table_name}: {e}")
-        return 0
+            fractions = [i / shards for i in range(1, shards)]
+            cur.execute(sql.SQL("""
+                SELECT
+                    percentile_disc(%s::float8[]) WITHIN GROUP (ORDER BY {column})::text[]
+                FROM
+                    {table} TABLESAMPLE SYSTEM (%s)
+                WHERE
+                    {column} IS NOT NULL;
+            """).format(column=sql.Identifier(column), table=table), (fractions, sample_percent))
+            boundaries = cur.fetchone()[0] or []
+    finally:
+        conn.close()
+    
+    # Duplicate percentiles (skewed or low-cardinality columns) would give empty shards
+    boundaries = list(dict.fromkeys(value for value in boundaries if value is not None))
+    return list(zip([None] + boundaries, boundaries + [None]))
+
+def shard_condition(column, lower, upper):
+    """WHERE condition selecting lower <= column < upper (NULLs go to the first shard)."""
+    column = sql.Identifier(column)
+    if lower is None and upper is None:
+        return sql.SQL("TRUE")
+    if lower is None:
+        return sql.SQL("({column} < {upper} OR {column} IS NULL)").format(
+            column=column, upper=sql.Literal(upper))
+    if upper is None:
+        return sql.SQL("{column} >= {lower}").format(column=column, lower=sql.Literal(lower))
+    return sql.SQL("{column} >= {lower} AND {column} < {upper}").format(
+        column=column, lower=sql.Literal(lower), upper=sql.Literal(upper))
+
+def export_table_where(table_name, condition, output_path, snapshot_id=None,
+                       options=DEFAULT_EXPORT_OPTIONS):
+    """
+    Export the rows of a table matching a condition to a file.
+
+    Args:
+        table_name (str): Table to export
+        condition (psycopg2.sql.Composable): WHERE condition
+        output_path (Path): File to write
+        snapshot_id (str): Exported snapshot to read from
+        options (ExportOptions): Output format settings
+
+    Returns:
+        list: ExportedFile for each file written
+
+    Raises:
+        psycopg2.Error, OSError: If the export fails
+    """
+    select_sql = sql.SQL("SELECT * FROM {} WHERE {}").format(
+        sql.Identifier(table_name), condition)
+    files = copy_query_to_file(select_sql, output_path, snapshot_id, options, table_name)
+    print(f"Exported {count_rows(files)} rows from {table_name} to {output_path}")
+    return files
+
+def export_table_shard(table_name, column, lower, upper, output_path, snapshot_id=None,
+                       options=DEFAULT_EXPORT_OPTIONS):
+    """
+    Export one range of a table to a shard file.
+
+    Args:
+        table_name (str): Table to export
+        column (str): Range column
+        lower, upper: Range boundaries (see plan_table_shards)
+        output_path (Path): Shard file to write
+        snapshot_id (str): Exported snapshot to read from
+        options (ExportOptions): Output format settings
+
+    Returns:
+        list: ExportedFile for each file written
+    """
+    return export_table_where(table_name, shard_condition(column, lower, upper),
+                              output_path, snapshot_id, options)
+
+def write_shard_manifest(table_name, column, shards, output_dir):
+    """
+    Write <table_name>.manifest.json describing a sharded export.
+
+    Args:
+        table_name (str): Exported table
+        column (str): Range column
+        shards (list): Dicts with lower, upper, rows and files for each shard
+        output_dir (str): Export directory
+
+    Returns:
+        Path: The manifest file
+    """
+    manifest_path = Path(output_dir) / f"{table_name}.manifest.json"
+    manifest = {
+        'table': table_name,
+        'split_column': column,
+        'exported_at': datetime.now().isoformat(timespec='seconds'),
+        'total_rows': sum(shard['rows'] for shard in shards),
+        'shards': shards,
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest_path
+
+def get_chunk_columns(tables):
+    """
+    Find the column to chunk each table on for --chunk-rows.
+
+    Returns:
+        dict: Table -> the --split time column (SPLIT_COLUMNS) or the
+        single-column primary key; tables with neither are left out
+    """
+    conn = get_connection()
+    
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT
+                c.relname,
+                array_agg(a.attname::text)
+            FROM
+                pg_index i
+                JOIN pg_class c ON c.oid = i.indrelid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE
+                i.indisprimary
+                AND n.nspname = 'public'
+                AND c.relname = ANY(%s)
+            GROUP BY
+                c.relname;
+        """, (list(tables),))
+        primary_keys = dict(cur.fetchall())
+    
+    conn.close()
+    
+    columns = {}
+    for table in tables:
+        if table in SPLIT_COLUMNS:
+            columns[table] = SPLIT_COLUMNS[table]
+        elif len(primary_keys.get(table, [])) == 1:
+            columns[table] = primary_keys[table][0]
+    return columns
+
+class ExportCheckpoint:
+    """
+    Progress of a full export, saved after every finished table, shard or chunk.
+
+    Args:
+        path (str or Path): Checkpoint file
+        settings (dict): Options that must match for a run to be resumed
+    """
+    
+    def __init__(self, path, settings):
+        self.path = Path(path)
+        self.settings = settings
+        self.plans = {}      # table -> {'column': ..., 'ranges': [[lower, upper], ...]}
+        self.completed = {}  # unit key -> file records
+    
+    @classmethod
+    def resume(cls, path, settings):
+        """
+        Load the checkpoint of an interrupted run.
+
+        Returns:
+            ExportCheckpoint: The saved progress, or a new checkpoint if there is none
+
+        Raises:
+            ValueError: If the checkpoint was written with different options
+        """
+        checkpoint = cls(path, settings)
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            print(f"No checkpoint found at {path}; starting a new export")
+            return checkpoint
+        
+        if saved['settings'] != settings:
+            raise ValueError(f"{path} was written by an export with different options; "
+                             "rerun with the original options or without --resume")
+        checkpoint.plans = saved['plans']
+        checkpoint.completed = saved['completed']
+        return checkpoint
+    
+    def completed_files(self, key, output_dir):
+        """Files of a unit finished by an earlier run, or None if it has to be exported."""
+        records = self.completed.get(key)
+        if records is None:
+            return None
+        files = [
+            ExportedFile(Path(output_dir) / record['file'], record['rows'], record['bytes'], record['sha256'])
+            for record in records
+        ]
+        if all(f.path.exists() and f.path.stat().st_size == f.bytes for f in files):
+            return files
+        return None
+    
+    def complete(self, key, files):
+        """Record a finished unit and save the checkpoint."""
+        self.completed[key] = file_records(files)
+        self.save()
+    
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump({'settings': self.settings, 'plans': self.plans, 'completed': self.completed}, f)
+        os.replace(temp_path, self.path)
+    
+    def remove(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+def run_tracked(progress, key, table, export, *args):
+    """Run an export function as one unit tracked by an ExportProgress (if any)."""
+    if progress is None:
+        return export(*args)
+    with progress.track(key, table):
+        return export(*args)
+
+def export_unit(unit, snapshot_id=None, options=DEFAULT_EXPORT_OPTIONS):
+    """Export one ExportUnit; returns its ExportedFile list."""
+    if unit.column is None:
+        return export_table_to_csv(unit.table, unit.output_path.parent, snapshot_id, options)
+    return export_table_shard(unit.table, unit.column, unit.lower, unit.upper,
+                              unit.output_path, snapshot_id, options)
+
+def plan_export_units(tables, split_columns, shards, chunk_rows, output_dir, snapshot_id,
+                      checkpoint, options=DEFAULT_EXPORT_OPTIONS):
+    """
+    Break the export into units: whole tables, --split shards and --chunk-rows chunks.
+
+    Range plans are stored in the checkpoint, and plans from a resumed
+    checkpoint are reused so the units line up with the interrupted run.
+
+    Returns:
+        list: ExportUnit tuples in scheduling order
+    """
+    range_columns = dict(split_columns)
+    if chunk_rows:
+        for table, column in get_chunk_columns(tables).items():
+            range_columns.setdefault(table, column)
+    
+    for table, column in range_columns.items():
+        if table in checkpoint.plans:
+            continue
+        if table in split_columns:
+            ranges = plan_table_shards(table, column, shards, snapshot_id)
+        else:
+            ranges = plan_table_shards(table, column, None, snapshot_id, rows_per_shard=chunk_rows)
+        checkpoint.plans[table] = {'column': column, 'ranges': [list(r) for r in ranges]}
+    checkpoint.save()
+    
+    units = []
+    for table in tables:
+        plan = checkpoint.plans.get(table)
+        if plan is None or (table not in split_columns and len(plan['ranges']) == 1):
+            units.append(ExportUnit(table, table, None, None, None,
+                                    output_file(output_dir, table, options)))
+            continue
+        for number, (lower, upper) in enumerate(plan['ranges'], start=1):
+            key = f"{table}.part-{number:04d}"
+            units.append(ExportUnit(key, table, plan['column'], lower, upper,
+                                    output_file(output_dir, key, options)))
+    return units
+
+def run_full_export(executor, tables, split_columns, shards, output_dir, snapshot_id,
+                    options=DEFAULT_EXPORT_OPTIONS, checkpoint=None, chunk_rows=None, progress=None):
+    """
+    Export whole tables, and split or chunked tables as range shards.
+
+    Every finished unit is recorded in the checkpoint. When all tables
+    succeed, export_manifest.json is written and the checkpoint is removed.
+
+    Args:
+        executor (ThreadPoolExecutor): Workers running the exports
+        tables (list): Tables to export, in scheduling order
+        split_columns (dict): Table -> range column for tables to shard
+        shards (int): Number of shards per split table
+        output_dir (str): Export directory
+        snapshot_id (str): Exported snapshot to read from
+        options (ExportOptions): Output format settings
+        checkpoint (ExportCheckpoint): Progress to resume from and record into
+        chunk_rows (int): Chunk tables larger than this many rows
+        progress (ExportProgress): Tracks each unit's throughput
+
+    Returns:
+        OrderedDict: Table -> TableStatus, in scheduling order
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if checkpoint is None:
+        checkpoint = ExportCheckpoint(Path(output_dir) / CHECKPOINT_FILE, {})
+    
+    units = plan_export_units(tables, split_columns, shards, chunk_rows, output_dir,
+                              snapshot_id, checkpoint, options)
+    
+    unit_files = {}
+    unit_errors = {}
+    reused = set()
+    futures = {}
+    for unit in units:
+        files = checkpoint.completed_files(unit.key, output_dir)
+        if files is not None:
+            print(f"Skipping {unit.key}: already exported by the interrupted run")
+            unit_files[unit.key] = files
+            reused.add(unit.key)
+        else:
+            futures[executor.submit(run_tracked, progress, unit.key, unit.table,
+                                    export_unit, unit, snapshot_id, options)] = unit
+    
+    for future in as_completed(futures):
+        unit = futures[future]
+        try:
+            unit_files[unit.key] = future.result()
+        except Exception as e:
+            unit_errors[unit.key] = f"{type(e).__name__}: {e}".strip()
+            print(f"Error exporting {unit.key}: {e}")
+            continue
+        checkpoint.complete(unit.key, unit_files[unit.key])
+    
+    statuses = OrderedDict()
+    for table in tables:
+        table_units = [unit for unit in units if unit.table == table]
+        files = [f for unit in table_units for f in unit_files.get(unit.key, [])]
+        errors = [unit_errors[unit.key] for unit in table_units if unit.key in unit_errors]
+        if errors:
+            statuses[table] = TableStatus(table, 'failed', count_rows(files), files, errors[0])
+            continue
+        
+        if table_units[0].column is not None:
+            shard_info = [
+                {'lower': unit.lower, 'upper': unit.upper,
+                 'rows': count_rows(unit_files[unit.key]), 'files': file_records(unit_files[unit.key])}
+                for unit in table_units
+            ]
+            manifest_path = write_shard_manifest(table, table_units[0].column, shard_info, output_dir)
+            print(f"Exported {count_rows(files)} rows from {table} in {len(table_units)} shards ({manifest_path})")
+        
+        status = 'resumed' if any(unit.key in reused for unit in table_units) else 'exported'
+        statuses[table] = TableStatus(table, status, count_rows(files), files, None)
+    
+    write_export_manifest(output_dir, {
+        table: status.files for table, status in statuses.items() if status.status != 'failed'
+    })
+    if not unit_errors:
+        checkpoint.remove()
+    return statuses
+
+def load_export_state(state_path):
+    """Load the incremental export state ({'tables': {table: {...}}})."""
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'tables': {}}
+
+def save_export_state(state_path, state):
+    """Write the incremental export state atomically."""
+    state_path = Path(state_path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = state_path.with_name(state_path.name + '.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, state_path)
+
+def get_watermark_columns(tables):
+    """
+    Find the change-tracking column of each table.
+
+    Args:
+        tables (list): Table names
+
+    Returns:
+        dict: Table -> (column, data_type) for tables that have a watermark column
+    """
+    conn = get_connection()
+    
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT
+                table_name,
+                column_name,
+                data_type
+            FROM
+                information_schema.columns
+            WHERE
+                table_schema = 'public'
+                AND table_name = ANY(%s);
+        """, (list(tables),))
+        columns = {(table, column): data_type for table, column, data_type in cur.fetchall()}
+    
+    conn.close()
+    
+    watermark_columns = {}
+    for table in tables:
+        column = WATERMARK_COLUMNS.get(table, DEFAULT_WATERMARK_COLUMN)
+        if (table, column) in columns:
+            watermark_columns[table] = (column, columns[(table, column)])
+    return watermark_columns
+
+def get_high_watermarks(watermark_columns, snapshot_id=None):
+    """
+    Read the current maximum of each table's watermark column.
+
+    Args:
+        watermark_columns (dict): Table -> (column, data_type)
+        snapshot_id (str): Exported snapshot to read from
+
+    Returns:
+        dict: Table -> maximum value as text (None for empty tables)
+    """
+    conn = get_connection()
+    
+    try:
+        high_watermarks = {}
+        with snapshot_transaction(conn, snapshot_id), conn.cursor() as cur:
+            for table, (column, _) in watermark_columns.items():
+                cur.execute(sql.SQL("SELECT max({})::text FROM {};").format(
+                    sql.Identifier(column), sql.Identifier(table)))
+                high_watermarks[table] = cur.fetchone()[0]
+        return high_watermarks
     finally:
         conn.close()
 
+def watermark_condition(column, data_type, since, until, overlap_seconds):
+    """
+    WHERE condition selecting rows changed after `since` (minus the overlap) up to `until`.
+
+    Without a previous watermark every row up to `until` is selected.
+    """
+    column_sql = sql.Identifier(column)
+    if until is None:
+        upper = sql.SQL("TRUE")
+    else:
+        upper = sql.SQL("{} <= {}").format(column_sql, sql.Literal(until))
+    
+    if since is None:
+        return sql.SQL("({} OR {} IS NULL)").format(upper, column_sql)
+    
+    lower = sql.SQL("CAST({} AS {})").format(sql.Literal(since), sql.SQL(data_type))
+    if data_type == 'date' or data_type.startswith('timestamp'):
+        lower = sql.SQL("{} - {} * interval '1 second'").format(lower, sql.Literal(overlap_seconds))
+    return sql.SQL("{} > {} AND {}").format(column_sql, lower, upper)
+
+def run_incremental_export(executor, tables, output_dir, state_path, overlap_seconds, snapshot_id,
+                           options=DEFAULT_EXPORT_OPTIONS, progress=None):
+    """
+    Export the rows changed since the previous incremental run.
+
+    Writes one <table>.delta-<run>.csv per table, a manifest-<run>.json and
+    SHA256SUMS-<run>, then advances the watermark of every table that
+    exported successfully.
+
+    Args:
+        executor (ThreadPoolExecutor): Workers running the exports
+        tables (list): Tables to export, in scheduling order
+        output_dir (str): Export directory
+        state_path (str): Watermark state file
+        overlap_seconds (int): Seconds re-read before each previous watermark
+        snapshot_id (str): Exported snapshot to read from
+        options (ExportOptions): Output format settings
+        progress (ExportProgress): Tracks each table's throughput
+
+    Returns:
+        OrderedDict: Table -> TableStatus, in scheduling order
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state = load_export_state(state_path)
+    run_id = datetime.now().strftime('%Y%m%dT%H%M%S')
+    
+    watermark_columns = get_watermark_columns(tables)
+    high_watermarks = get_high_watermarks(watermark_columns, snapshot_id)
+    
+    submitted = []
+    for table in tables:
+        previous = state['tables'].get(table, {})
+        column, data_type = watermark_columns.get(table, (None, None))
+        since = previous.get('watermark') if column and previous.get('column') == column else None
+        until = high_watermarks.get(table)
+        
+        if column is None:
+            condition = sql.SQL("TRUE")
+        else:
+            condition = watermark_condition(column, data_type, since, until, overlap_seconds)
+        
+        output_path = output_file(output_dir, f"{table}.delta-{run_id}", options)
+        entry = {
+            'table': table,
+            'mode': 'delta' if since is not None else 'full',
+            'watermark_column': column,
+            'since': since,
+            'until': until if until is not None else since,
+            'rows': None,
+            'files': [],
+        }
+        future = executor.submit(run_tracked, progress, table, table, export_table_where,
+                                 table, condition, output_path, snapshot_id, options)
+        submitted.append((entry, future))
+    
+    entries = []
+    statuses = OrderedDict()
+    for entry, future in submitted:
+        table = entry['table']
+        try:
+            files = future.result()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}".strip()
+            print(f"Error exporting table {table}: {e}")
+            entry['error'] = error
+            statuses[table] = TableStatus(table, 'failed', 0, [], error)
+            entries.append(entry)
+            continue
+        
+        entry['rows'] = count_rows(files)
+        entry['files'] = file_records(files)
+        entries.append(entry)
+        statuses[table] = TableStatus(table, 'exported', entry['rows'], files, None)
+        if entry['watermark_column']:
+            state['tables'][entry['table']] = {
+                'column': entry['watermark_column'],
+                'watermark': entry['until'],
+                'exported_at': run_id,
+            }
+    
+    manifest_path = Path(output_dir) / f"manifest-{run_id}.json"
+    with open(manifest_path, 'w') as f:
+        json.dump({'run': run_id, 'overlap_seconds': overlap_seconds, 'tables': entries}, f, indent=2)
+    write_sha256sums(Path(output_dir) / f"SHA256SUMS-{run_id}",
+                     {table: status.files for table, status in statuses.items()})
+    save_export_state(state_path, state)
+    
+    failed = [table for table, status in statuses.items() if status.status == 'failed']
+    if failed:
+        print(f"Watermarks not advanced for failed tables: {', '.join(failed)}")
+    print(f"Wrote {manifest_path} and updated {state_path}")
+    return statuses
+
+def write_export_summary(path, progress, statuses, args):
+    """
+    Write the machine-readable run summary.
+
+    Per table it holds the final status, rows and files, and under
+    "this_run" the throughput and phase seconds of the work done by this run
+    (parts skipped by --resume are not included there).
+
+    Returns:
+        dict: The summary written
+    """
+    summary = progress.summary()
+    throughput = summary.pop('tables')
+    summary = {
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+        'mode': 'incremental' if args.incremental else 'full',
+        'format': args.format,
+        'compression': args.export_options.compression,
+        'masked': args.export_options.masking is not None,
+        'jobs': args.jobs,
+        **summary,
+        'tables': {
+            table: {
+                'status': status.status,
+                'rows': status.rows,
+                'files': len(status.files),
+                'error': status.error,
+                'this_run': throughput.get(table),
+            }
+            for table, status in statuses.items()
+        },
+    }
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
 def main():
     """Main function to export data from the database to CSV files."""
     args = parse_args()
@@ -115,20 +1259,88 @@ def main():
     else:
         tables_to_export = get_all_tables()
     
-    print(f"=== Exporting PostgreSQL Data to CSV ===")
+    print(f"=== Exporting PostgreSQL Data to {args.format.upper()} ===")
     print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"Output Directory: {output_dir}")
     print(f"Tables to Export: {', '.join(tables_to_export)}")
     print("=" * 40)
     
-    # Export each table
-    total_rows = 0
-    for table in tables_to_export:
-        rows = export_table_to_csv(table, output_dir)
-        total_rows += rows
+    for table in args.split_columns:
+        if table not in tables_to_export:
+            tables_to_export.append(table)
+    
+    jobs = max(1, args.jobs)
+    # One connection per worker plus the one holding the snapshot open
+    if jobs + 1 > POOL_PARAMS['maxconn']:
+        configure_pool(maxconn=jobs + 1)
+    
+    # Largest tables first, so the wall time is close to that of the largest table
+    sizes = get_table_sizes(tables_to_export)
+    ordered = sorted(tables_to_export, key=lambda table: sizes[table], reverse=True)
+    progress = ExportProgress(get_row_estimates(tables_to_export), args.progress_interval)
+    
+    checkpoint = None
+    if not args.incremental:
+        checkpoint_path = Path(output_dir) / CHECKPOINT_FILE
+        masking = args.export_options.masking
+        settings = {
+            'tables': sorted(tables_to_export),
+            'split_columns': args.split_columns,
+            'shards': args.shards,
+            'chunk_rows': args.chunk_rows,
+            'options': {
+                **args.export_options._asdict(),
+                # Parts masked with other rules or another key must not be mixed
+                'masking': masking.describe() if masking else None,
+            },
+        }
+        if args.resume:
+            try:
+                checkpoint = ExportCheckpoint.resume(checkpoint_path, settings)
+            except ValueError as e:
+                print(f"Cannot resume: {e}")
+                sys.exit(1)
+        else:
+            checkpoint = ExportCheckpoint(checkpoint_path, settings)
+    
+    # Export each table (or each shard of a split table) from the same snapshot
+    start = time.perf_counter()
+    with exported_snapshot() as snapshot_id, progress:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            if args.incremental:
+                statuses = run_incremental_export(
+                    executor, ordered, output_dir, args.state_file, args.overlap, snapshot_id,
+                    args.export_options, progress)
+            else:
+                statuses = run_full_export(
+                    executor, ordered, args.split_columns, args.shards, output_dir, snapshot_id,
+                    args.export_options, checkpoint, args.chunk_rows, progress)
+    elapsed = time.perf_counter() - start
+    total_rows = sum(status.rows for status in statuses.values())
+    failed = [status for status in statuses.values() if status.status == 'failed']
+    
+    print("\n=== Export Status ===")
+    for status in statuses.values():
+        line = f"{status.table:<25} {status.status.upper():<9} {status.rows:>10} rows  {len(status.files):>4} files"
+        if status.error:
+            line += f"  {status.error}"
+        print(line)
+    
+    if failed:
+        print(f"\n=== Export Failed ({len(failed)} of {len(statuses)} tables) ===")
+        if not args.incremental:
+            print("Fix the problem and rerun with the same options plus --resume to continue.")
+    else:
+        print("\n=== Export Complete ===")
+    print(f"Exported {total_rows} rows from {len(tables_to_export)} tables to {output_dir} in {elapsed:.2f} s")
     
-    print("\n=== Export Complete ===")
-    print(f"Exported {total_rows} rows from {len(tables_to_export)} tables to {output_dir}")
+    summary = write_export_summary(args.summary_file, progress, statuses, args)
+    totals = summary['totals']
+    print(f"Throughput: {totals['rows_per_second']:,} rows/s, {totals['mb_per_second']:.1f} MB/s; "
+          f"time by phase: {phase_breakdown(totals['phase_seconds'])}")
+    print(f"Summary written to {args.summary_file}")
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
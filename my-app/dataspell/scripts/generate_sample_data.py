@@ -6,30 +6,96 @@ This script generates sample data for the mental health portal database.
 It creates users, patient profiles, providers, appointments, medical records,
 medications, messages, documents, and audit logs.
 
+The dataset size is set with --scale (1 = 100 patients and 10 providers) and
+can be overridden per table with --rows, e.g. for capacity tests:
+
+    python generate_sample_data.py --scale 10000 --rows audit_logs=100000000
+
+Rows are generated lazily and loaded in batches of --batch-size rows, so
+memory use stays flat however many rows are generated. Batches are streamed
+with COPY ... FROM STDIN by default (--loader copy); copy-binary sends
+PostgreSQL's binary format and insert uses multi-row INSERTs
+(execute_values). Compare them with benchmark_bulk_load.py. Ids are derived from
+the seed and each row's position (parents are never kept in memory to look
+them up), and every table draws from its own seeded random generator, so the
+same --seed, scale and overrides always produce the same data.
+
+Each batch is generated and encoded in a background thread while the
+previous one loads. With --workers N, tables are generated and loaded by N
+processes. Each table's key space is split into --shards ranges (default: one
+per worker); every shard is generated with its own seed derived from --seed
+and loaded over its own connection. A table is started as soon as the tables
+it references are loaded, so independent tables load at the same time. The
+data depends only on the seed, the shard count, --as-of and --backend, not on
+the number of workers, so a dataset can be reproduced byte for byte.
+
+Values are drawn by the numpy backend by default: realistic text (names,
+addresses, paragraphs, ...) is generated with Faker once into vocabulary
+pools, and every column is then drawn a chunk of rows at a time with NumPy
+(see connection/vector_synthesis.py). --backend python calls Faker and random
+once per value, which is much slower but draws every text value afresh.
+
 Usage:
-    python generate_sample_data.py
+    python generate_sample_data.py [--scale FACTOR] [--rows TABLE=N,...] [--seed SEED] [--batch-size N]
+                                   [--loader {copy,copy-binary,insert}] [--workers N] [--shards N]
+                                   [--as-of TIMESTAMP] [--backend {numpy,python}]
+
+Options:
+    --scale FACTOR         Multiplies the default dataset size (default: 1)
+    --rows TABLE=N,...     Exact row counts for patients, providers or a child table
+                           (appointments, medical_records, medications, messages,
+                           documents, audit_logs)
+    --seed SEED            Random seed (default: random, printed so the run can be repeated)
+    --batch-size N         Rows per INSERT / COPY batch and commit (default: 10000)
+    --loader LOADER        copy (default), copy-binary or insert
+    --workers N            Processes generating and loading shards (default: 1)
+    --shards N             Shards per table (default: --workers)
+    --as-of TIMESTAMP      Time the data is generated relative to (default: now)
+    --backend BACKEND      numpy (default, vectorized) or python (per-row Faker calls)
 
 Requirements:
     - psycopg2
     - faker
+    - numpy
     - python-dotenv
 """
 
 import os
 import sys
+import time
 import random
 import uuid
+import hashlib
+import argparse
+import functools
+from collections import OrderedDict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime, timedelta
+from itertools import chain, repeat
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Add the parent directory to the path so we can import the bulk_load module
+sys.path.append(str(Path(__file__).parent.parent / 'connection'))
+
 try:
+    import numpy as np
     import psycopg2
-    from psycopg2.extras import execute_values
     from faker import Faker
 except ImportError:
     print("Required packages not found. Install with:")
-    print("pip install psycopg2-binary faker python-dotenv")
+    print("pip install psycopg2-binary faker python-dotenv numpy")
+    sys.exit(1)
+
+try:
+    from bulk_load import LOAD_METHODS, load_rows
+    from vector_synthesis import (
+        build_pool, choose, keyed_uuid_bytes, offset_dates, offset_times,
+        pattern_strings, random_uuid_bytes, uuid_strings, vocabulary, with_nulls
+    )
+except ImportError:
+    print("Failed to import the bulk loader. Make sure bulk_load.py and vector_synthesis.py "
+          "exist in the connection directory.")
     sys.exit(1)
 
 # Load environment variables from .env file
@@ -64,12 +130,10 @@ if 'DATABASE_URL' in os.environ:
         DB_PARAMS['port'] = int(port)
         DB_PARAMS['database'] = db
 
-# Initialize Faker
-fake = Faker()
-
-# Sample data sizes
+# Sample data sizes at --scale 1
 NUM_PATIENTS = 100
 NUM_PROVIDERS = 10
+# Rows per parent at --scale 1: parents get (1 + N) / 2 rows on average
 NUM_APPOINTMENTS_PER_PATIENT = 5
 NUM_RECORDS_PER_PATIENT = 3
 NUM_MEDICATIONS_PER_PATIENT = 2
@@ -77,6 +141,22 @@ NUM_MESSAGES_PER_PATIENT = 5
 NUM_DOCUMENTS_PER_PATIENT = 2
 NUM_AUDIT_LOGS_PER_USER = 10
 
+# Rows per INSERT / COPY batch (and commit)
+BATCH_SIZE = 10000
+
+# Progress is printed every this many rows of a table
+PROGRESS_ROWS = 1000000
+
+# Batches generated and encoded ahead while the previous batch loads
+PREFETCH_BATCHES = 2
+
+# Rows drawn at a time by the numpy backend
+SYNTHESIS_CHUNK_ROWS = 65536
+
+# Value generation backends: numpy draws whole columns from vocabulary pools,
+# python calls Faker and random once per value
+BACKENDS = ('numpy', 'python')
+
 # Sample data lists
 SPECIALTIES = [
     'Psychiatry', 'Psychology', 'Therapy', 'Counseling', 
@@ -118,9 +198,254 @@ RESOURCE_TYPES = [
     'MEDICAL_RECORD', 'MEDICATION', 'MESSAGE', 'DOCUMENT'
 ]
 
-def generate_uuid():
-    """Generate a UUID string."""
-    return str(uuid.uuid4())
+# Tables in load order (parents first), with their columns
+TABLE_COLUMNS = OrderedDict([
+    ('users', [
+        'id', 'email', '"passwordHash"', '"firstName"', '"lastName"',
+        '"dateOfBirth"', '"phoneNumber"', 'role', '"createdAt"', '"updatedAt"'
+    ]),
+    ('patient_profiles', [
+        'id', '"userId"', 'address', '"emergencyContact"',
+        '"insuranceProvider"', '"insuranceId"', '"preferredPharmacy"', '"createdAt"', '"updatedAt"'
+    ]),
+    ('providers', [
+        'id', '"userId"', 'specialty', 'credentials', 'bio', '"createdAt"', '"updatedAt"'
+    ]),
+    ('appointments', [
+        'id', '"patientId"', '"providerId"', '"appointmentTime"',
+        '"appointmentType"', 'status', 'notes', '"createdAt"', '"updatedAt"'
+    ]),
+    ('medical_records', [
+        'id', '"patientId"', '"providerId"', '"recordType"',
+        'content', '"recordDate"', '"createdAt"', '"updatedAt"'
+    ]),
+    ('medications', [
+        'id', '"patientId"', '"prescriberId"', '"medicationName"',
+        'dosage', 'frequency', '"startDate"', '"endDate"', 'status', 'notes', '"createdAt"', '"updatedAt"'
+    ]),
+    ('messages', [
+        'id', '"senderId"', '"recipientId"', 'content',
+        '"isRead"', '"sentAt"', '"createdAt"', '"updatedAt"'
+    ]),
+    ('documents', [
+        'id', '"patientId"', '"documentType"', 'filename',
+        '"filePath"', '"mimeType"', '"fileSize"', '"uploadDate"', '"createdAt"', '"updatedAt"'
+    ]),
+    ('audit_logs', [
+        'id', '"userId"', 'action', '"resourceType"', '"resourceId"',
+        'details', '"ipAddress"', '"userAgent"', 'timestamp'
+    ]),
+])
+
+# Tables whose rows must be loaded before a table's (its foreign keys)
+TABLE_DEPENDENCIES = OrderedDict([
+    ('users', ()),
+    ('patient_profiles', ('users',)),
+    ('providers', ('users',)),
+    ('appointments', ('patient_profiles', 'providers')),
+    ('medical_records', ('patient_profiles', 'providers')),
+    ('medications', ('patient_profiles', 'providers')),
+    ('messages', ('users',)),
+    ('documents', ('patient_profiles',)),
+    ('audit_logs', ('users',)),
+])
+
+# Child tables: (parent, most rows per parent at --scale 1)
+CHILD_TABLES = OrderedDict([
+    ('appointments', ('patients', NUM_APPOINTMENTS_PER_PATIENT)),
+    ('medical_records', ('patients', NUM_RECORDS_PER_PATIENT)),
+    ('medications', ('patients', NUM_MEDICATIONS_PER_PATIENT)),
+    ('messages', ('patients', NUM_MESSAGES_PER_PATIENT)),
+    ('documents', ('patients', NUM_DOCUMENTS_PER_PATIENT)),
+    ('audit_logs', ('users', NUM_AUDIT_LOGS_PER_USER)),
+])
+
+# What a run generates: the seed, the row count of every table, the time the
+# data is relative to ("createdAt", appointment dates, ...), the number of
+# shards each table is split into and the backend generating the values
+GenerationPlan = namedtuple('GenerationPlan', ['seed', 'counts', 'now', 'shards', 'backend'])
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Generate sample data for the mental health portal.')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiplies the default dataset size (default: 1)')
+    parser.add_argument('--rows', default='',
+                        help='Exact row counts, e.g. patients=1000000,audit_logs=100000000')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Random seed (default: random)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help=f'Rows per INSERT / COPY batch and commit (default: {BATCH_SIZE})')
+    parser.add_argument('--loader', choices=LOAD_METHODS, default='copy',
+                        help='copy (default), copy-binary or insert (execute_values)')
+    parser.add_argument('--backend', choices=BACKENDS, default='numpy',
+                        help='numpy (default): vectorized draws from Faker vocabulary pools; '
+                             'python: Faker and random per value')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes generating and loading shards (default: 1)')
+    parser.add_argument('--shards', type=int, default=None,
+                        help='Shards per table (default: --workers)')
+    parser.add_argument('--as-of', default=None,
+                        help='Time the data is generated relative to, e.g. 2024-06-01T00:00:00 (default: now)')
+    args = parser.parse_args()
+    
+    if args.scale <= 0:
+        parser.error("--scale must be positive")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.shards is None:
+        args.shards = args.workers
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+    
+    try:
+        args.as_of = datetime.fromisoformat(args.as_of) if args.as_of else datetime.now()
+    except ValueError:
+        parser.error(f"--as-of: {args.as_of!r} is not an ISO timestamp")
+    
+    overridable = ['patients', 'providers'] + list(CHILD_TABLES)
+    args.row_overrides = {}
+    for item in args.rows.split(','):
+        if not item.strip():
+            continue
+        table, _, count = item.partition('=')
+        table = table.strip()
+        if table not in overridable:
+            parser.error(f"--rows: cannot set {table!r} (use one of: {', '.join(overridable)})")
+        try:
+            args.row_overrides[table] = int(count)
+        except ValueError:
+            parser.error(f"--rows: {item!r} is not TABLE=N")
+        minimum = 1 if table in ('patients', 'providers') else 0
+        if args.row_overrides[table] < minimum:
+            parser.error(f"--rows: {table} must be at least {minimum}")
+    
+    if args.seed is None:
+        args.seed = random.SystemRandom().randrange(2 ** 31)
+    
+    return args
+
+def plan_row_counts(scale=1.0, overrides=None):
+    """
+    Work out how many rows each table gets.
+    
+    Args:
+        scale (float): Multiplies the default sizes (NUM_PATIENTS, NUM_PROVIDERS
+            and the child tables, which grow with their parents)
+        overrides (dict): Exact counts for 'patients', 'providers' or child tables
+    
+    Returns:
+        OrderedDict: Row count of every table in TABLE_COLUMNS, plus
+        'patients' (providers are both people and a table)
+    """
+    overrides = overrides or {}
+    patients = overrides.get('patients', max(1, round(NUM_PATIENTS * scale)))
+    providers = overrides.get('providers', max(1, round(NUM_PROVIDERS * scale)))
+    
+    counts = OrderedDict([
+        ('patients', patients),
+        ('providers', providers),
+        ('users', patients + providers),
+        ('patient_profiles', patients),
+    ])
+    for table, (parent, most_per_parent) in CHILD_TABLES.items():
+        counts[table] = overrides.get(table, round(counts[parent] * (1 + most_per_parent) / 2))
+    
+    return counts
+
+def entity_id(seed, table, index):
+    """
+    Deterministic UUID (version 4 format) of the index-th row of a table.
+    
+    Children compute their parents' ids from the parent's index, so no table
+    has to be kept in memory to link rows.
+    """
+    digest = hashlib.blake2b(f"{seed}:{table}:{index}".encode(), digest_size=16).digest()
+    return str(uuid.UUID(bytes=digest, version=4))
+
+def patient_user_id(plan, patient):
+    """User id of the patient-th patient (users 0 .. patients - 1)."""
+    return entity_id(plan.seed, 'users', patient)
+
+def provider_user_id(plan, provider):
+    """User id of the provider-th provider (users after the patients)."""
+    return entity_id(plan.seed, 'users', plan.counts['patients'] + provider)
+
+def derive_seed(seed, table, shard):
+    """Seed of one shard of a table, derived from the global seed."""
+    digest = hashlib.blake2b(f"{seed}:{table}:{shard}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def shard_random(plan, table, shard):
+    """Independent, seeded random generator and Faker instance for one shard of a table."""
+    shard_seed = derive_seed(plan.seed, table, shard)
+    rng = random.Random(shard_seed)
+    fake = Faker()
+    fake.seed_instance(shard_seed)
+    return rng, fake
+
+def shard_range(total, shard, shards):
+    """The [start, stop) part of range(total) that belongs to a shard."""
+    return total * shard // shards, total * (shard + 1) // shards
+
+def spread_rows(total, parents, rng):
+    """
+    Deal total child rows out to parents.
+    
+    Each parent gets between 0 and about twice the average, and the counts
+    add up to exactly total. Counts are produced one parent at a time, so
+    memory does not grow with the number of parents.
+    
+    Yields:
+        int: Rows of each parent, in parent order
+    """
+    mean = total / parents
+    previous = 0
+    for index in range(parents):
+        if index == parents - 1:
+            boundary = total
+        else:
+            jitter = rng.uniform(-mean / 2, mean / 2)
+            boundary = min(total, max(previous, round(mean * (index + 1) + jitter)))
+        yield boundary - previous
+        previous = boundary
+
+def shard_children(plan, table, parents, shard, rng):
+    """
+    Child rows of a shard's parents.
+    
+    Child rows are split between shards in proportion to their parents, so
+    every shard knows the row indexes (and ids) it owns without waiting for
+    the others.
+    
+    Args:
+        plan (GenerationPlan): Run plan
+        table (str): Child table
+        parents (int): Number of parent rows
+        shard (int): Shard number
+        rng (random.Random): The shard's random generator
+    
+    Yields:
+        tuple: (parent index, first row index, row count) per parent
+    """
+    parent_start, parent_stop = shard_range(parents, shard, plan.shards)
+    if parent_stop == parent_start:
+        return
+    total = plan.counts[table]
+    row = total * parent_start // parents
+    row_stop = total * parent_stop // parents
+    
+    for parent, count in zip(range(parent_start, parent_stop),
+                             spread_rows(row_stop - row, parent_stop - parent_start, rng)):
+        yield parent, row, count
+        row += count
+
+def date_of_birth(rng, now, minimum_age, maximum_age):
+    """Random date of birth for an age between minimum_age and maximum_age at now."""
+    today = now.date()
+    return today - timedelta(days=rng.randint(minimum_age * 365, maximum_age * 365 + 364))
 
 def connect_to_db():
     """Connect to the PostgreSQL database."""
@@ -152,557 +477,635 @@ def clear_existing_data(conn):
         conn.commit()
         print("Cleared existing data from all tables.")
 
-def generate_users(conn):
-    """Generate user data."""
-    patient_users = []
-    provider_users = []
+def generate_users(plan, shard=0):
+    """Generate user rows: the patients, then the providers."""
+    rng, fake = shard_random(plan, 'users', shard)
+    patients = plan.counts['patients']
     
-    # Generate patient users
-    for _ in range(NUM_PATIENTS):
-        user_id = generate_uuid()
-        first_name = fake.first_name()
-        last_name = fake.last_name()
-        email = f"{first_name.lower()}.{last_name.lower()}{random.randint(1, 999)}@example.com"
-        dob = fake.date_of_birth(minimum_age=18, maximum_age=80)
-        
-        patient_users.append({
-            'id': user_id,
-            'email': email,
-            'passwordHash': 'hashed_password_placeholder',  # In a real app, use proper hashing
-            'firstName': first_name,
-            'lastName': last_name,
-            'dateOfBirth': dob,
-            'phoneNumber': fake.phone_number(),
-            'role': 'PATIENT'
-        })
-    
-    # Generate provider users
-    for _ in range(NUM_PROVIDERS):
-        user_id = generate_uuid()
+    for index in range(*shard_range(plan.counts['users'], shard, plan.shards)):
         first_name = fake.first_name()
         last_name = fake.last_name()
-        email = f"dr.{first_name.lower()}.{last_name.lower()}@example.com"
-        dob = fake.date_of_birth(minimum_age=30, maximum_age=70)
-        
-        provider_users.append({
-            'id': user_id,
-            'email': email,
-            'passwordHash': 'hashed_password_placeholder',  # In a real app, use proper hashing
-            'firstName': first_name,
-            'lastName': last_name,
-            'dateOfBirth': dob,
-            'phoneNumber': fake.phone_number(),
-            'role': 'PROVIDER'
-        })
-    
-    # Insert users into database
-    with conn.cursor() as cur:
-        user_columns = [
-            'id', 'email', '"passwordHash"', '"firstName"', '"lastName"',
-            '"dateOfBirth"', '"phoneNumber"', 'role', '"createdAt"', '"updatedAt"'
-        ]
         
-        user_values = []
-        now = datetime.now()
-        for user in patient_users + provider_users:
-            user_values.append((
-                user['id'], user['email'], user['passwordHash'],
-                user['firstName'], user['lastName'], user['dateOfBirth'],
-                user['phoneNumber'], user['role'], now, now
-            ))
+        # The index keeps emails unique at any scale
+        if index < patients:
+            email = f"{first_name.lower()}.{last_name.lower()}{index + 1}@example.com"
+            dob = date_of_birth(rng, plan.now, 18, 80)
+            role = 'PATIENT'
+        else:
+            email = f"dr.{first_name.lower()}.{last_name.lower()}{index - patients + 1}@example.com"
+            dob = date_of_birth(rng, plan.now, 30, 70)
+            role = 'PROVIDER'
         
-        execute_values(
-            cur,
-            f"""
-            INSERT INTO users ({', '.join(user_columns)})
-            VALUES %s
-            """,
-            user_values
+        yield (
+            entity_id(plan.seed, 'users', index), email,
+            'hashed_password_placeholder',  # In a real app, use proper hashing
+            first_name, last_name, dob, fake.phone_number(), role, plan.now, plan.now
         )
-        
-        conn.commit()
-        print(f"Generated {len(patient_users)} patient users and {len(provider_users)} provider users.")
-    
-    return patient_users, provider_users
 
-def generate_patient_profiles(conn, patient_users):
-    """Generate patient profile data."""
-    patient_profiles = []
+def generate_patient_profiles(plan, shard=0):
+    """Generate patient profile rows, one per patient user."""
+    rng, fake = shard_random(plan, 'patient_profiles', shard)
     
-    for user in patient_users:
-        profile_id = generate_uuid()
-        
-        patient_profiles.append({
-            'id': profile_id,
-            'user_id': user['id'],
-            'address': fake.address(),
-            'emergency_contact': f"{fake.name()}: {fake.phone_number()}",
-            'insurance_provider': fake.company(),
-            'insurance_id': fake.bothify(text='???-########'),
-            'preferred_pharmacy': fake.company()
-        })
-    
-    # Insert patient profiles into database
-    with conn.cursor() as cur:
-        profile_columns = [
-            'id', '"userId"', 'address', '"emergencyContact"',
-            '"insuranceProvider"', '"insuranceId"', '"preferredPharmacy"', '"createdAt"', '"updatedAt"'
-        ]
-        
-        profile_values = []
-        now = datetime.now()
-        for profile in patient_profiles:
-            profile_values.append((
-                profile['id'], profile['user_id'], profile['address'],
-                profile['emergency_contact'], profile['insurance_provider'],
-                profile['insurance_id'], profile['preferred_pharmacy'], now, now
-            ))
-        
-        execute_values(
-            cur,
-            f"""
-            INSERT INTO patient_profiles ({', '.join(profile_columns)})
-            VALUES %s
-            """,
-            profile_values
+    for patient in range(*shard_range(plan.counts['patients'], shard, plan.shards)):
+        yield (
+            entity_id(plan.seed, 'patient_profiles', patient), patient_user_id(plan, patient),
+            fake.address(), f"{fake.name()}: {fake.phone_number()}", fake.company(),
+            fake.bothify(text='???-########'), fake.company(), plan.now, plan.now
         )
-        
-        conn.commit()
-        print(f"Generated {len(patient_profiles)} patient profiles.")
-    
-    return patient_profiles
 
-def generate_providers(conn, provider_users):
-    """Generate provider data."""
-    providers = []
+def generate_providers(plan, shard=0):
+    """Generate provider rows, one per provider user."""
+    rng, fake = shard_random(plan, 'providers', shard)
     
-    for user in provider_users:
-        provider_id = generate_uuid()
-        
-        providers.append({
-            'id': provider_id,
-            'user_id': user['id'],
-            'specialty': random.choice(SPECIALTIES),
-            'credentials': f"{random.choice(['MD', 'PhD', 'PsyD', 'LCSW', 'LPC'])}, {random.choice(['Board Certified', 'Licensed', 'Certified'])}",
-            'bio': fake.paragraph(nb_sentences=3)
-        })
-    
-    # Insert providers into database
-    with conn.cursor() as cur:
-        provider_columns = [
-            'id', '"userId"', 'specialty', 'credentials', 'bio', '"createdAt"', '"updatedAt"'
-        ]
-        
-        provider_values = []
-        now = datetime.now()
-        for provider in providers:
-            provider_values.append((
-                provider['id'], provider['user_id'], provider['specialty'],
-                provider['credentials'], provider['bio'], now, now
-            ))
-        
-        execute_values(
-            cur,
-            f"""
-            INSERT INTO providers ({', '.join(provider_columns)})
-            VALUES %s
-            """,
-            provider_values
+    for provider in range(*shard_range(plan.counts['providers'], shard, plan.shards)):
+        yield (
+            entity_id(plan.seed, 'providers', provider), provider_user_id(plan, provider),
+            rng.choice(SPECIALTIES),
+            f"{rng.choice(['MD', 'PhD', 'PsyD', 'LCSW', 'LPC'])}, {rng.choice(['Board Certified', 'Licensed', 'Certified'])}",
+            fake.paragraph(nb_sentences=3), plan.now, plan.now
         )
-        
-        conn.commit()
-        print(f"Generated {len(providers)} providers.")
-    
-    return providers
 
-def generate_appointments(conn, patient_profiles, providers):
-    """Generate appointment data."""
-    appointments = []
+def generate_appointments(plan, shard=0):
+    """Generate appointment rows."""
+    rng, fake = shard_random(plan, 'appointments', shard)
+    providers = plan.counts['providers']
     
-    for patient in patient_profiles:
-        for _ in range(random.randint(1, NUM_APPOINTMENTS_PER_PATIENT)):
-            appointment_id = generate_uuid()
-            provider = random.choice(providers)
-            
-            # Generate a random date within the last year
-            days_ago = random.randint(-365, 30)  # Past appointments and future ones
-            appointment_date = datetime.now() + timedelta(days=days_ago)
+    for patient, index, count in shard_children(plan, 'appointments', plan.counts['patients'], shard, rng):
+        patient_id = entity_id(plan.seed, 'patient_profiles', patient)
+        for _ in range(count):
+            # Past appointments and future ones
+            days_ago = rng.randint(-365, 30)
+            appointment_date = plan.now + timedelta(days=days_ago)
             
             # Set status based on date
             if days_ago < 0:
-                status = random.choice(['COMPLETED', 'CANCELLED', 'NO_SHOW'])
+                status = rng.choice(['COMPLETED', 'CANCELLED', 'NO_SHOW'])
             else:
-                status = random.choice(['SCHEDULED', 'CONFIRMED'])
+                status = rng.choice(['SCHEDULED', 'CONFIRMED'])
             
-            appointments.append({
-                'id': appointment_id,
-                'patient_id': patient['id'],
-                'provider_id': provider['id'],
-                'appointment_time': appointment_date,
-                'appointment_type': random.choice(APPOINTMENT_TYPES),
-                'status': status,
-                'notes': fake.paragraph(nb_sentences=2) if random.random() > 0.3 else None
-            })
-    
-    # Insert appointments into database
-    with conn.cursor() as cur:
-        appointment_columns = [
-            'id', '"patientId"', '"providerId"', '"appointmentTime"',
-            '"appointmentType"', 'status', 'notes', '"createdAt"', '"updatedAt"'
-        ]
-        
-        appointment_values = []
-        now = datetime.now()
-        for appointment in appointments:
-            appointment_values.append((
-                appointment['id'], appointment['patient_id'], appointment['provider_id'],
-                appointment['appointment_time'], appointment['appointment_type'],
-                appointment['status'], appointment['notes'], now, now
-            ))
-        
-        execute_values(
-            cur,
-            f"""
-            INSERT INTO appointments ({', '.join(appointment_columns)})
-            VALUES %s
-            """,
-            appointment_values
-        )
-        
-        conn.commit()
-        print(f"Generated {len(appointments)} appointments.")
-    
-    return appointments
+            yield (
+                entity_id(plan.seed, 'appointments', index), patient_id,
+                entity_id(plan.seed, 'providers', rng.randrange(providers)),
+                appointment_date, rng.choice(APPOINTMENT_TYPES), status,
+                fake.paragraph(nb_sentences=2) if rng.random() > 0.3 else None,
+                plan.now, plan.now
+            )
+            index += 1
 
-def generate_medical_records(conn, patient_profiles, providers):
-    """Generate medical record data."""
-    medical_records = []
+def generate_medical_records(plan, shard=0):
+    """Generate medical record rows."""
+    rng, fake = shard_random(plan, 'medical_records', shard)
+    providers = plan.counts['providers']
     
-    for patient in patient_profiles:
-        for _ in range(random.randint(1, NUM_RECORDS_PER_PATIENT)):
-            record_id = generate_uuid()
-            provider = random.choice(providers)
-            
+    for patient, index, count in shard_children(plan, 'medical_records', plan.counts['patients'], shard, rng):
+        patient_id = entity_id(plan.seed, 'patient_profiles', patient)
+        for _ in range(count):
             # Generate a random date within the last year
-            days_ago = random.randint(-365, 0)
-            record_date = datetime.now() + timedelta(days=days_ago)
+            record_date = plan.now + timedelta(days=rng.randint(-365, 0))
             
-            medical_records.append({
-                'id': record_id,
-                'patient_id': patient['id'],
-                'provider_id': provider['id'],
-                'record_type': random.choice(RECORD_TYPES),
-                'content': fake.paragraph(nb_sentences=5),
-                'record_date': record_date
-            })
-    
-    # Insert medical records into database
-    with conn.cursor() as cur:
-        record_columns = [
-            'id', '"patientId"', '"providerId"', '"recordType"',
-            'content', '"recordDate"', '"createdAt"', '"updatedAt"'
-        ]
-        
-        record_values = []
-        now = datetime.now()
-        for record in medical_records:
-            record_values.append((
-                record['id'], record['patient_id'], record['provider_id'],
-                record['record_type'], record['content'], record['record_date'], now, now
-            ))
-        
-        execute_values(
-            cur,
-            f"""
-            INSERT INTO medical_records ({', '.join(record_columns)})
-            VALUES %s
-            """,
-            record_values
-        )
-        
-        conn.commit()
-        print(f"Generated {len(medical_records)} medical records.")
-    
-    return medical_records
+            yield (
+                entity_id(plan.seed, 'medical_records', index), patient_id,
+                entity_id(plan.seed, 'providers', rng.randrange(providers)),
+                rng.choice(RECORD_TYPES), fake.paragraph(nb_sentences=5), record_date,
+                plan.now, plan.now
+            )
+            index += 1
 
-def generate_medications(conn, patient_profiles, providers):
-    """Generate medication data."""
-    medications = []
+def generate_medications(plan, shard=0):
+    """Generate medication rows."""
+    rng, fake = shard_random(plan, 'medications', shard)
+    providers = plan.counts['providers']
     
-    for patient in patient_profiles:
-        for _ in range(random.randint(1, NUM_MEDICATIONS_PER_PATIENT)):
-            medication_id = generate_uuid()
-            provider = random.choice(providers)
-            
-            # Generate random dates
-            days_ago = random.randint(-180, 0)
-            start_date = datetime.now() + timedelta(days=days_ago)
+    for patient, index, count in shard_children(plan, 'medications', plan.counts['patients'], shard, rng):
+        patient_id = entity_id(plan.seed, 'patient_profiles', patient)
+        for _ in range(count):
+            start_date = plan.now + timedelta(days=rng.randint(-180, 0))
             
             # Determine if medication is active, completed, or discontinued
-            status = random.choice(['ACTIVE', 'COMPLETED', 'DISCONTINUED'])
+            status = rng.choice(['ACTIVE', 'COMPLETED', 'DISCONTINUED'])
             
             if status != 'ACTIVE':
-                end_date = start_date + timedelta(days=random.randint(30, 90))
+                end_date = start_date + timedelta(days=rng.randint(30, 90))
             else:
                 end_date = None
             
-            medications.append({
-                'id': medication_id,
-                'patient_id': patient['id'],
-                'prescriber_id': provider['id'],
-                'medication_name': random.choice(MEDICATION_NAMES),
-                'dosage': f"{random.choice(['10', '20', '25', '50', '100'])} mg",
-                'frequency': random.choice(['Once daily', 'Twice daily', 'Three times daily', 'As needed']),
-                'start_date': start_date,
-                'end_date': end_date,
-                'status': status,
-                'notes': fake.paragraph(nb_sentences=1) if random.random() > 0.5 else None
-            })
-    
-    # Insert medications into database
-    with conn.cursor() as cur:
-        medication_columns = [
-            'id', '"patientId"', '"prescriberId"', '"medicationName"',
-            'dosage', 'frequency', '"startDate"', '"endDate"', 'status', 'notes', '"createdAt"', '"updatedAt"'
-        ]
-        
-        medication_values = []
-        now = datetime.now()
-        for medication in medications:
-            medication_values.append((
-                medication['id'], medication['patient_id'], medication['prescriber_id'],
-                medication['medication_name'], medication['dosage'], medication['frequency'],
-                medication['start_date'], medication['end_date'], medication['status'],
-                medication['notes'], now, now
-            ))
-        
-        execute_values(
-            cur,
-            f"""
-            INSERT INTO medications ({', '.join(medication_columns)})
-            VALUES %s
-            """,
-            medication_values
-        )
-        
-        conn.commit()
-        print(f"Generated {len(medications)} medications.")
-    
-    return medications
+            yield (
+                entity_id(plan.seed, 'medications', index), patient_id,
+                entity_id(plan.seed, 'providers', rng.randrange(providers)),
+                rng.choice(MEDICATION_NAMES),
+                f"{rng.choice(['10', '20', '25', '50', '100'])} mg",
+                rng.choice(['Once daily', 'Twice daily', 'Three times daily', 'As needed']),
+                start_date, end_date, status,
+                fake.paragraph(nb_sentences=1) if rng.random() > 0.5 else None,
+                plan.now, plan.now
+            )
+            index += 1
 
-def generate_messages(conn, patient_users, provider_users):
-    """Generate message data."""
-    messages = []
+def generate_messages(plan, shard=0):
+    """Generate message rows between each patient and one provider."""
+    rng, fake = shard_random(plan, 'messages', shard)
+    providers = plan.counts['providers']
     
-    for patient in patient_users:
+    for patient, index, count in shard_children(plan, 'messages', plan.counts['patients'], shard, rng):
         # Assign a random provider for this patient's messages
-        provider = random.choice(provider_users)
+        patient_id = patient_user_id(plan, patient)
+        provider_id = provider_user_id(plan, rng.randrange(providers))
         
-        for _ in range(random.randint(1, NUM_MESSAGES_PER_PATIENT)):
-            message_id = generate_uuid()
-            
+        for _ in range(count):
             # Determine message direction (patient to provider or provider to patient)
-            if random.random() > 0.5:
-                sender_id = patient['id']
-                recipient_id = provider['id']
+            if rng.random() > 0.5:
+                sender_id, recipient_id = patient_id, provider_id
             else:
-                sender_id = provider['id']
-                recipient_id = patient['id']
+                sender_id, recipient_id = provider_id, patient_id
             
             # Generate a random date within the last 90 days
-            days_ago = random.randint(-90, 0)
-            sent_at = datetime.now() + timedelta(days=days_ago)
+            sent_at = plan.now + timedelta(days=rng.randint(-90, 0))
             
-            messages.append({
-                'id': message_id,
-                'sender_id': sender_id,
-                'recipient_id': recipient_id,
-                'content': fake.paragraph(nb_sentences=random.randint(1, 3)),
-                'is_read': random.random() > 0.2,  # 80% chance of being read
-                'sent_at': sent_at
-            })
-    
-    # Insert messages into database
-    with conn.cursor() as cur:
-        message_columns = [
-            'id', '"senderId"', '"recipientId"', 'content',
-            '"isRead"', '"sentAt"', '"createdAt"', '"updatedAt"'
-        ]
-        
-        message_values = []
-        now = datetime.now()
-        for message in messages:
-            message_values.append((
-                message['id'], message['sender_id'], message['recipient_id'],
-                message['content'], message['is_read'], message['sent_at'], now, now
-            ))
-        
-        execute_values(
-            cur,
-            f"""
-            INSERT INTO messages ({', '.join(message_columns)})
-            VALUES %s
-            """,
-            message_values
-        )
-        
-        conn.commit()
-        print(f"Generated {len(messages)} messages.")
-    
-    return messages
+            yield (
+                entity_id(plan.seed, 'messages', index), sender_id, recipient_id,
+                fake.paragraph(nb_sentences=rng.randint(1, 3)),
+                rng.random() > 0.2,  # 80% chance of being read
+                sent_at, plan.now, plan.now
+            )
+            index += 1
 
-def generate_documents(conn, patient_profiles):
-    """Generate document data."""
-    documents = []
+def generate_documents(plan, shard=0):
+    """Generate document rows."""
+    rng, fake = shard_random(plan, 'documents', shard)
     
-    for patient in patient_profiles:
-        for _ in range(random.randint(1, NUM_DOCUMENTS_PER_PATIENT)):
-            document_id = generate_uuid()
-            document_type = random.choice(DOCUMENT_TYPES)
+    for patient, index, count in shard_children(plan, 'documents', plan.counts['patients'], shard, rng):
+        patient_id = entity_id(plan.seed, 'patient_profiles', patient)
+        for _ in range(count):
+            document_id = entity_id(plan.seed, 'documents', index)
+            document_type = rng.choice(DOCUMENT_TYPES)
             
             # Generate a random date within the last year
-            days_ago = random.randint(-365, 0)
-            upload_date = datetime.now() + timedelta(days=days_ago)
+            upload_date = plan.now + timedelta(days=rng.randint(-365, 0))
             
-            documents.append({
-                'id': document_id,
-                'patient_id': patient['id'],
-                'document_type': document_type,
-                'filename': f"{document_type.lower().replace(' ', '_')}_{fake.bothify(text='???###')}.pdf",
-                'file_path': f"/uploads/documents/{document_id}.pdf",
-                'mime_type': 'application/pdf',
-                'file_size': random.randint(100000, 5000000),  # 100KB to 5MB
-                'upload_date': upload_date
-            })
-    
-    # Insert documents into database
-    with conn.cursor() as cur:
-        document_columns = [
-            'id', '"patientId"', '"documentType"', 'filename',
-            '"filePath"', '"mimeType"', '"fileSize"', '"uploadDate"', '"createdAt"', '"updatedAt"'
-        ]
+            yield (
+                document_id, patient_id, document_type,
+                f"{document_type.lower().replace(' ', '_')}_{fake.bothify(text='???###')}.pdf",
+                f"/uploads/documents/{document_id}.pdf", 'application/pdf',
+                rng.randint(100000, 5000000),  # 100KB to 5MB
+                upload_date, plan.now, plan.now
+            )
+            index += 1
+
+def generate_audit_logs(plan, shard=0):
+    """Generate audit log rows for patients and providers."""
+    rng, fake = shard_random(plan, 'audit_logs', shard)
+    
+    for user, index, count in shard_children(plan, 'audit_logs', plan.counts['users'], shard, rng):
+        user_id = entity_id(plan.seed, 'users', user)
+        for _ in range(count):
+            # Generate a random date within the last 30 days
+            timestamp = plan.now + timedelta(days=rng.randint(-30, 0),
+                                             hours=rng.randint(0, 23),
+                                             minutes=rng.randint(0, 59),
+                                             seconds=rng.randint(0, 59))
+            
+            action = rng.choice(AUDIT_ACTIONS)
+            
+            yield (
+                entity_id(plan.seed, 'audit_logs', index), user_id, action,
+                rng.choice(RESOURCE_TYPES),
+                str(uuid.UUID(int=rng.getrandbits(128), version=4)) if action != 'LOGIN' and action != 'LOGOUT' else None,
+                fake.sentence() if rng.random() > 0.5 else None,
+                fake.ipv4(), fake.user_agent(), timestamp
+            )
+            index += 1
+
+# Row generator of every table
+TABLE_GENERATORS = OrderedDict([
+    ('users', generate_users),
+    ('patient_profiles', generate_patient_profiles),
+    ('providers', generate_providers),
+    ('appointments', generate_appointments),
+    ('medical_records', generate_medical_records),
+    ('medications', generate_medications),
+    ('messages', generate_messages),
+    ('documents', generate_documents),
+    ('audit_logs', generate_audit_logs),
+])
+
+# Faker vocabulary pools of the numpy backend: name -> value factory
+POOL_FACTORIES = OrderedDict([
+    ('first_names', lambda fake: fake.first_name),
+    ('last_names', lambda fake: fake.last_name),
+    ('phone_numbers', lambda fake: fake.phone_number),
+    ('addresses', lambda fake: fake.address),
+    ('emergency_contacts', lambda fake: lambda: f"{fake.name()}: {fake.phone_number()}"),
+    ('companies', lambda fake: fake.company),
+    ('bios', lambda fake: lambda: fake.paragraph(nb_sentences=3)),
+    ('appointment_notes', lambda fake: lambda: fake.paragraph(nb_sentences=2)),
+    ('record_contents', lambda fake: lambda: fake.paragraph(nb_sentences=5)),
+    ('medication_notes', lambda fake: lambda: fake.paragraph(nb_sentences=1)),
+    ('message_contents', lambda fake: lambda: fake.paragraph(nb_sentences=fake.random_int(1, 3))),
+    ('audit_details', lambda fake: fake.sentence),
+    ('ip_addresses', lambda fake: fake.ipv4),
+    ('user_agents', lambda fake: fake.user_agent),
+])
+
+CREDENTIALS = [
+    f"{degree}, {standing}"
+    for degree in ['MD', 'PhD', 'PsyD', 'LCSW', 'LPC']
+    for standing in ['Board Certified', 'Licensed', 'Certified']
+]
+
+@functools.lru_cache(maxsize=None)
+def faker_pool(seed, name):
+    """
+    Vocabulary pool of realistic values, built once per process and seed.
+    
+    Pools do not depend on the shard, so every worker samples the same values.
+    """
+    fake = Faker()
+    fake.seed_instance(derive_seed(seed, 'pool', name))
+    return build_pool(POOL_FACTORIES[name](fake))
+
+def shard_generator(plan, table, shard):
+    """Seeded NumPy random generator for one shard of a table."""
+    return np.random.default_rng(derive_seed(plan.seed, table, shard))
+
+def entity_ids(plan, table, indexes):
+    """Vectorized entity ids of the numpy backend (see entity_id())."""
+    return uuid_strings(keyed_uuid_bytes(derive_seed(plan.seed, 'id', table) << 64
+                                         | derive_seed(plan.seed, 'id2', table), indexes))
+
+def shard_chunks(plan, table, shard):
+    """Yield [start, stop) row ranges of a shard of a parent table, SYNTHESIS_CHUNK_ROWS at a time."""
+    start, stop = shard_range(plan.counts[table], shard, plan.shards)
+    for chunk_start in range(start, stop, SYNTHESIS_CHUNK_ROWS):
+        yield chunk_start, min(stop, chunk_start + SYNTHESIS_CHUNK_ROWS)
+
+def shard_child_chunks(plan, table, parents, shard, rng):
+    """
+    Vectorized shard_children(): child rows of a shard's parents in chunks.
+    
+    Yields:
+        tuple: (parent indexes, child counts, first row index), with about
+        SYNTHESIS_CHUNK_ROWS child rows per chunk
+    """
+    parent_start, parent_stop = shard_range(parents, shard, plan.shards)
+    if parent_stop == parent_start:
+        return
+    total = plan.counts[table]
+    row_start = total * parent_start // parents
+    shard_rows = total * parent_stop // parents - row_start
+    shard_parents = parent_stop - parent_start
+    
+    mean = shard_rows / shard_parents
+    parents_per_chunk = max(1, SYNTHESIS_CHUNK_ROWS * shard_parents // max(1, shard_rows))
+    previous = 0
+    for first in range(0, shard_parents, parents_per_chunk):
+        positions = np.arange(first, min(shard_parents, first + parents_per_chunk))
+        # Jittered cumulative boundaries, as in spread_rows()
+        jitter = rng.uniform(-mean / 2, mean / 2, len(positions))
+        boundaries = np.clip(np.rint(mean * (positions + 1) + jitter), previous, shard_rows).astype(np.int64)
+        boundaries = np.maximum.accumulate(boundaries)
+        if positions[-1] == shard_parents - 1:
+            boundaries[-1] = shard_rows
+        counts = np.diff(boundaries, prepend=previous)
+        yield parent_start + positions, counts, row_start + previous
+        previous = int(boundaries[-1])
+
+def synthesize_users(plan, shard=0):
+    """Vectorized generate_users()."""
+    rng = shard_generator(plan, 'users', shard)
+    first_name_pool = faker_pool(plan.seed, 'first_names')
+    last_name_pool = faker_pool(plan.seed, 'last_names')
+    patients = plan.counts['patients']
+    
+    for start, stop in shard_chunks(plan, 'users', shard):
+        indexes = np.arange(start, stop)
+        count = len(indexes)
+        is_patient = indexes < patients
+        first_names = choose(rng, first_name_pool, count).tolist()
+        last_names = choose(rng, last_name_pool, count).tolist()
         
-        document_values = []
-        now = datetime.now()
-        for document in documents:
-            document_values.append((
-                document['id'], document['patient_id'], document['document_type'],
-                document['filename'], document['file_path'], document['mime_type'],
-                document['file_size'], document['upload_date'], now, now
-            ))
+        # The index keeps emails unique at any scale
+        emails = [
+            f"{first.lower()}.{last.lower()}{index + 1}@example.com" if index < patients
+            else f"dr.{first.lower()}.{last.lower()}{index - patients + 1}@example.com"
+            for first, last, index in zip(first_names, last_names, indexes.tolist())
+        ]
+        # Patients are 18 to 80 years old, providers 30 to 70
+        age_days = rng.integers(np.where(is_patient, 18, 30) * 365, np.where(is_patient, 80, 70) * 365 + 365)
         
-        execute_values(
-            cur,
-            f"""
-            INSERT INTO documents ({', '.join(document_columns)})
-            VALUES %s
-            """,
-            document_values
+        yield from zip(
+            entity_ids(plan, 'users', indexes), emails, repeat('hashed_password_placeholder'),
+            first_names, last_names, offset_dates(plan.now, -age_days).tolist(),
+            choose(rng, faker_pool(plan.seed, 'phone_numbers'), count).tolist(),
+            np.where(is_patient, 'PATIENT', 'PROVIDER').tolist(), repeat(plan.now), repeat(plan.now)
         )
-        
-        conn.commit()
-        print(f"Generated {len(documents)} documents.")
+
+def synthesize_patient_profiles(plan, shard=0):
+    """Vectorized generate_patient_profiles()."""
+    rng = shard_generator(plan, 'patient_profiles', shard)
+    companies = faker_pool(plan.seed, 'companies')
     
-    return documents
+    for start, stop in shard_chunks(plan, 'patient_profiles', shard):
+        patients = np.arange(start, stop)
+        count = len(patients)
+        yield from zip(
+            entity_ids(plan, 'patient_profiles', patients), entity_ids(plan, 'users', patients),
+            choose(rng, faker_pool(plan.seed, 'addresses'), count).tolist(),
+            choose(rng, faker_pool(plan.seed, 'emergency_contacts'), count).tolist(),
+            choose(rng, companies, count).tolist(), pattern_strings(rng, '???-########', count),
+            choose(rng, companies, count).tolist(), repeat(plan.now), repeat(plan.now)
+        )
 
-def generate_audit_logs(conn, patient_users, provider_users):
-    """Generate audit log data."""
-    audit_logs = []
+def synthesize_providers(plan, shard=0):
+    """Vectorized generate_providers()."""
+    rng = shard_generator(plan, 'providers', shard)
     
-    all_users = patient_users + provider_users
+    for start, stop in shard_chunks(plan, 'providers', shard):
+        providers = np.arange(start, stop)
+        count = len(providers)
+        yield from zip(
+            entity_ids(plan, 'providers', providers),
+            entity_ids(plan, 'users', plan.counts['patients'] + providers),
+            choose(rng, SPECIALTIES, count).tolist(), choose(rng, CREDENTIALS, count).tolist(),
+            choose(rng, faker_pool(plan.seed, 'bios'), count).tolist(), repeat(plan.now), repeat(plan.now)
+        )
+
+def synthesize_appointments(plan, shard=0):
+    """Vectorized generate_appointments()."""
+    rng = shard_generator(plan, 'appointments', shard)
+    providers = plan.counts['providers']
     
-    for user in all_users:
-        for _ in range(random.randint(1, NUM_AUDIT_LOGS_PER_USER)):
-            log_id = generate_uuid()
-            
-            # Generate a random date within the last 30 days
-            days_ago = random.randint(-30, 0)
-            timestamp = datetime.now() + timedelta(days=days_ago, 
-                                                 hours=random.randint(0, 23),
-                                                 minutes=random.randint(0, 59),
-                                                 seconds=random.randint(0, 59))
-            
-            action = random.choice(AUDIT_ACTIONS)
-            resource_type = random.choice(RESOURCE_TYPES)
-            
-            audit_logs.append({
-                'id': log_id,
-                'user_id': user['id'],
-                'action': action,
-                'resource_type': resource_type,
-                'resource_id': generate_uuid() if action != 'LOGIN' and action != 'LOGOUT' else None,
-                'details': fake.sentence() if random.random() > 0.5 else None,
-                'ip_address': fake.ipv4(),
-                'user_agent': fake.user_agent(),
-                'timestamp': timestamp
-            })
-    
-    # Insert audit logs into database
-    with conn.cursor() as cur:
-        log_columns = [
-            'id', '"userId"', 'action', '"resourceType"', '"resourceId"',
-            'details', '"ipAddress"', '"userAgent"', 'timestamp'
+    for patients, counts, first_row in shard_child_chunks(plan, 'appointments', plan.counts['patients'], shard, rng):
+        count = int(counts.sum())
+        # Past appointments are completed, cancelled or missed; future ones are booked
+        days = rng.integers(-365, 31, count)
+        status = np.where(days < 0, choose(rng, ['COMPLETED', 'CANCELLED', 'NO_SHOW'], count),
+                          choose(rng, ['SCHEDULED', 'CONFIRMED'], count))
+        yield from zip(
+            entity_ids(plan, 'appointments', np.arange(first_row, first_row + count)),
+            entity_ids(plan, 'patient_profiles', np.repeat(patients, counts)),
+            entity_ids(plan, 'providers', rng.integers(0, providers, count)),
+            offset_times(plan.now, days).tolist(), choose(rng, APPOINTMENT_TYPES, count).tolist(),
+            status.tolist(),
+            with_nulls(choose(rng, faker_pool(plan.seed, 'appointment_notes'), count), rng.random(count) > 0.3),
+            repeat(plan.now), repeat(plan.now)
+        )
+
+def synthesize_medical_records(plan, shard=0):
+    """Vectorized generate_medical_records()."""
+    rng = shard_generator(plan, 'medical_records', shard)
+    providers = plan.counts['providers']
+    
+    for patients, counts, first_row in shard_child_chunks(plan, 'medical_records', plan.counts['patients'], shard, rng):
+        count = int(counts.sum())
+        yield from zip(
+            entity_ids(plan, 'medical_records', np.arange(first_row, first_row + count)),
+            entity_ids(plan, 'patient_profiles', np.repeat(patients, counts)),
+            entity_ids(plan, 'providers', rng.integers(0, providers, count)),
+            choose(rng, RECORD_TYPES, count).tolist(),
+            choose(rng, faker_pool(plan.seed, 'record_contents'), count).tolist(),
+            offset_times(plan.now, rng.integers(-365, 1, count)).tolist(), repeat(plan.now), repeat(plan.now)
+        )
+
+def synthesize_medications(plan, shard=0):
+    """Vectorized generate_medications()."""
+    rng = shard_generator(plan, 'medications', shard)
+    providers = plan.counts['providers']
+    
+    for patients, counts, first_row in shard_child_chunks(plan, 'medications', plan.counts['patients'], shard, rng):
+        count = int(counts.sum())
+        start_dates = offset_times(plan.now, rng.integers(-180, 1, count))
+        # Active medications have no end date
+        status = choose(rng, ['ACTIVE', 'COMPLETED', 'DISCONTINUED'], count)
+        end_dates = start_dates + rng.integers(30, 91, count).astype('timedelta64[D]')
+        yield from zip(
+            entity_ids(plan, 'medications', np.arange(first_row, first_row + count)),
+            entity_ids(plan, 'patient_profiles', np.repeat(patients, counts)),
+            entity_ids(plan, 'providers', rng.integers(0, providers, count)),
+            choose(rng, MEDICATION_NAMES, count).tolist(),
+            choose(rng, ['10 mg', '20 mg', '25 mg', '50 mg', '100 mg'], count).tolist(),
+            choose(rng, ['Once daily', 'Twice daily', 'Three times daily', 'As needed'], count).tolist(),
+            start_dates.tolist(), with_nulls(end_dates, status != 'ACTIVE'), status.tolist(),
+            with_nulls(choose(rng, faker_pool(plan.seed, 'medication_notes'), count), rng.random(count) > 0.5),
+            repeat(plan.now), repeat(plan.now)
+        )
+
+def synthesize_messages(plan, shard=0):
+    """Vectorized generate_messages()."""
+    rng = shard_generator(plan, 'messages', shard)
+    patient_count = plan.counts['patients']
+    
+    for patients, counts, first_row in shard_child_chunks(plan, 'messages', patient_count, shard, rng):
+        count = int(counts.sum())
+        # Each patient writes with one provider, in either direction
+        patient_users = np.repeat(patients, counts)
+        provider_users = np.repeat(patient_count + rng.integers(0, plan.counts['providers'], len(patients)), counts)
+        from_patient = rng.random(count) > 0.5
+        yield from zip(
+            entity_ids(plan, 'messages', np.arange(first_row, first_row + count)),
+            entity_ids(plan, 'users', np.where(from_patient, patient_users, provider_users)),
+            entity_ids(plan, 'users', np.where(from_patient, provider_users, patient_users)),
+            choose(rng, faker_pool(plan.seed, 'message_contents'), count).tolist(),
+            (rng.random(count) > 0.2).tolist(),  # 80% chance of being read
+            offset_times(plan.now, rng.integers(-90, 1, count)).tolist(), repeat(plan.now), repeat(plan.now)
+        )
+
+# File name prefix of each document type
+DOCUMENT_SLUGS = vocabulary([document_type.lower().replace(' ', '_') for document_type in DOCUMENT_TYPES])
+
+def synthesize_documents(plan, shard=0):
+    """Vectorized generate_documents()."""
+    rng = shard_generator(plan, 'documents', shard)
+    document_types = vocabulary(DOCUMENT_TYPES)
+    
+    for patients, counts, first_row in shard_child_chunks(plan, 'documents', plan.counts['patients'], shard, rng):
+        count = int(counts.sum())
+        document_ids = entity_ids(plan, 'documents', np.arange(first_row, first_row + count))
+        types = rng.integers(0, len(DOCUMENT_TYPES), count)
+        filenames = [
+            f"{slug}_{code}.pdf"
+            for slug, code in zip(DOCUMENT_SLUGS[types].tolist(), pattern_strings(rng, '???###', count))
         ]
-        
-        log_values = []
-        for log in audit_logs:
-            log_values.append((
-                log['id'], log['user_id'], log['action'], log['resource_type'],
-                log['resource_id'], log['details'], log['ip_address'],
-                log['user_agent'], log['timestamp']
-            ))
-        
-        execute_values(
-            cur,
-            f"""
-            INSERT INTO audit_logs ({', '.join(log_columns)})
-            VALUES %s
-            """,
-            log_values
+        yield from zip(
+            document_ids, entity_ids(plan, 'patient_profiles', np.repeat(patients, counts)),
+            document_types[types].tolist(), filenames,
+            [f"/uploads/documents/{document_id}.pdf" for document_id in document_ids], repeat('application/pdf'),
+            rng.integers(100000, 5000001, count).tolist(),  # 100KB to 5MB
+            offset_times(plan.now, rng.integers(-365, 1, count)).tolist(), repeat(plan.now), repeat(plan.now)
         )
-        
-        conn.commit()
-        print(f"Generated {len(audit_logs)} audit logs.")
+
+def synthesize_audit_logs(plan, shard=0):
+    """Vectorized generate_audit_logs()."""
+    rng = shard_generator(plan, 'audit_logs', shard)
     
-    return audit_logs
+    for users, counts, first_row in shard_child_chunks(plan, 'audit_logs', plan.counts['users'], shard, rng):
+        count = int(counts.sum())
+        actions = choose(rng, AUDIT_ACTIONS, count)
+        # Any second of the last 30 days (and of today)
+        seconds = rng.integers(-30, 1, count) * 86400 + rng.integers(0, 86400, count)
+        yield from zip(
+            entity_ids(plan, 'audit_logs', np.arange(first_row, first_row + count)),
+            entity_ids(plan, 'users', np.repeat(users, counts)),
+            actions.tolist(), choose(rng, RESOURCE_TYPES, count).tolist(),
+            with_nulls(np.array(uuid_strings(random_uuid_bytes(rng, count)), dtype=object),
+                       (actions != 'LOGIN') & (actions != 'LOGOUT')),
+            with_nulls(choose(rng, faker_pool(plan.seed, 'audit_details'), count), rng.random(count) > 0.5),
+            choose(rng, faker_pool(plan.seed, 'ip_addresses'), count).tolist(),
+            choose(rng, faker_pool(plan.seed, 'user_agents'), count).tolist(),
+            offset_times(plan.now, seconds, 's').tolist()
+        )
 
-def main():
-    """Main function to generate sample data."""
-    print("Connecting to database...")
-    conn = connect_to_db()
+# Vectorized row generator of every table
+TABLE_SYNTHESIZERS = OrderedDict([
+    ('users', synthesize_users),
+    ('patient_profiles', synthesize_patient_profiles),
+    ('providers', synthesize_providers),
+    ('appointments', synthesize_appointments),
+    ('medical_records', synthesize_medical_records),
+    ('medications', synthesize_medications),
+    ('messages', synthesize_messages),
+    ('documents', synthesize_documents),
+    ('audit_logs', synthesize_audit_logs),
+])
+
+def table_rows(plan, table, shard=0):
+    """Rows of one shard of a table, from the plan's backend."""
+    generators = TABLE_SYNTHESIZERS if plan.backend == 'numpy' else TABLE_GENERATORS
+    return generators[table](plan, shard)
+
+def load_table(conn, table, rows, loader='copy', batch_size=BATCH_SIZE):
+    """
+    Load a table's generated rows in batches, printing progress for big tables.
     
-    print("Clearing existing data...")
-    clear_existing_data(conn)
+    Args:
+        conn: Database connection
+        table (str): Table name (a key of TABLE_COLUMNS)
+        rows (iterator): Row tuples
+        loader (str): copy, copy-binary or insert (see bulk_load.LOAD_METHODS)
+        batch_size (int): Rows per statement and commit
     
-    print("Generating users...")
-    patient_users, provider_users = generate_users(conn)
+    Returns:
+        int: Rows loaded
+    """
+    start = time.perf_counter()
+    next_progress = [PROGRESS_ROWS]
     
-    print("Generating patient profiles...")
-    patient_profiles = generate_patient_profiles(conn, patient_users)
+    def report(loaded):
+        if loaded >= next_progress[0]:
+            print(f"  {table}: {loaded:,} rows ({loaded / (time.perf_counter() - start):,.0f} rows/s)")
+            next_progress[0] += PROGRESS_ROWS
     
-    print("Generating providers...")
-    providers = generate_providers(conn, provider_users)
+    return load_rows(conn, table, TABLE_COLUMNS[table], rows, method=loader,
+                     batch_size=batch_size, on_batch=report, prefetch=PREFETCH_BATCHES)
+
+def load_shard(plan, table, shard, loader='copy', batch_size=BATCH_SIZE):
+    """
+    Generate and load one shard of a table over its own connection (worker process entry point).
     
-    print("Generating appointments...")
-    generate_appointments(conn, patient_profiles, providers)
+    Returns:
+        int: Rows loaded
+    """
+    conn = connect_to_db()
+    try:
+        return load_rows(conn, table, TABLE_COLUMNS[table], table_rows(plan, table, shard),
+                         method=loader, batch_size=batch_size, prefetch=PREFETCH_BATCHES)
+    finally:
+        conn.close()
+
+def critical_path_rows(plan, table):
+    """Rows of a table plus those of its longest chain of dependent tables."""
+    dependents = [child for child, parents in TABLE_DEPENDENCIES.items() if table in parents]
+    return plan.counts[table] + max((critical_path_rows(plan, child) for child in dependents), default=0)
+
+def load_concurrently(plan, workers, loader='copy', batch_size=BATCH_SIZE):
+    """
+    Load every table with a pool of worker processes, as soon as its parents are loaded.
     
-    print("Generating medical records...")
-    generate_medical_records(conn, patient_profiles, providers)
+    Each (table, shard) is a task loaded over its own connection. A table's
+    shards are queued once all of TABLE_DEPENDENCIES of the table are
+    complete, so independent tables (e.g. appointments, medications and
+    audit_logs) load at the same time and foreign keys always find their
+    parent rows. Ready tables are queued by critical_path_rows(), so the
+    tables that hold up the most work start first and the total time
+    approaches that of the longest chain of tables.
     
-    print("Generating medications...")
-    generate_medications(conn, patient_profiles, providers)
+    Args:
+        plan (GenerationPlan): Run plan
+        workers (int): Worker processes (and connections)
+        loader (str): copy, copy-binary or insert (see bulk_load.LOAD_METHODS)
+        batch_size (int): Rows per statement and commit
     
-    print("Generating messages...")
-    generate_messages(conn, patient_users, provider_users)
+    Returns:
+        OrderedDict: Rows loaded per table, in completion order
+    """
+    waiting = OrderedDict((table, set(TABLE_DEPENDENCIES[table])) for table in TABLE_COLUMNS)
+    shards_left = dict.fromkeys(TABLE_COLUMNS, plan.shards)
+    started = {}
+    loaded = OrderedDict()
+    running = {}
     
-    print("Generating documents...")
-    generate_documents(conn, patient_profiles)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while waiting or running:
+            ready = [table for table, parents in waiting.items() if not parents]
+            for table in sorted(ready, key=lambda name: -critical_path_rows(plan, name)):
+                del waiting[table]
+                started[table] = time.perf_counter()
+                print(f"Generating {table.replace('_', ' ')} ({plan.shards} shards)...")
+                for shard in range(plan.shards):
+                    running[pool.submit(load_shard, plan, table, shard, loader, batch_size)] = table
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                table = running.pop(future)
+                loaded[table] = loaded.get(table, 0) + future.result()
+                shards_left[table] -= 1
+                if shards_left[table]:
+                    continue
+                
+                elapsed = time.perf_counter() - started[table]
+                print(f"Generated {loaded[table]:,} {table.replace('_', ' ')} in {elapsed:.1f} s "
+                      f"({loaded[table] / elapsed if elapsed else 0:,.0f} rows/s).")
+                for parents in waiting.values():
+                    parents.discard(table)
+    
+    return loaded
+
+def main():
+    """Main function to generate sample data."""
+    args = parse_args()
+    counts = plan_row_counts(args.scale, args.row_overrides)
+    plan = GenerationPlan(args.seed, counts, args.as_of, args.shards, args.backend)
+    
+    print(f"Seed: {plan.seed}, as of {plan.now.isoformat()}, {plan.shards} shard(s), {plan.backend} backend "
+          f"(pass --seed {plan.seed} --as-of {plan.now.isoformat()} --shards {plan.shards} "
+          f"--backend {plan.backend} to generate the same data again)")
+    print(f"Planned rows: {sum(counts[table] for table in TABLE_COLUMNS):,} "
+          f"({counts['patients']:,} patients, {counts['providers']:,} providers), "
+          f"loader: {args.loader}, workers: {args.workers}")
+    
+    print("Connecting to database...")
+    conn = connect_to_db()
+    
+    print("Clearing existing data...")
+    clear_existing_data(conn)
     
-    print("Generating audit logs...")
-    generate_audit_logs(conn, patient_users, provider_users)
+    start = time.perf_counter()
+    if args.workers == 1:
+        for table in TABLE_COLUMNS:
+            print(f"Generating {table.replace('_', ' ')}...")
+            table_start = time.perf_counter()
+            rows = chain.from_iterable(
+                table_rows(plan, table, shard) for shard in range(plan.shards)
+            )
+            loaded = load_table(conn, table, rows, loader=args.loader, batch_size=args.batch_size)
+            elapsed = time.perf_counter() - table_start
+            print(f"Generated {loaded:,} {table.replace('_', ' ')} in {elapsed:.1f} s "
+                  f"({loaded / elapsed if elapsed else 0:,.0f} rows/s).")
+        conn.close()
+    else:
+        conn.close()
+        load_concurrently(plan, args.workers, loader=args.loader, batch_size=args.batch_size)
     
-    conn.close()
-    print("Sample data generation complete!")
+    print(f"Sample data generation complete in {time.perf_counter() - start:.1f} s!")
 
 if __name__ == "__main__":
     main()
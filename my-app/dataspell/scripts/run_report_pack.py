@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Report Pack Runner Script
+
+This script runs all numbered reports in a .sql file from the queries directory
+concurrently and prints per-report timings. Results can be saved as CSV files.
+
+With --export-dir the reports run offline with DuckDB on the files of an
+export made by export_data_to_csv.py (CSV, Parquet or Arrow) instead of on
+the database (requires duckdb).
+
+Usage:
+    python run_report_pack.py REPORT_FILE [--parallelism N] [--reports 1,3,...] [--output-dir OUTPUT_DIR]
+                              [--export-dir EXPORT_DIR] [--threads N]
+
+Options:
+    REPORT_FILE              .sql file or name in queries/ (e.g. operational_reports)
+    --parallelism N          Maximum number of reports running at once (default: pool size)
+    --reports 1,3,...        Comma-separated report numbers to run (default: all)
+    --output-dir OUTPUT_DIR  Directory to save one CSV file per report (default: don't save)
+    --export-dir EXPORT_DIR  Run the reports on the exported files in EXPORT_DIR instead of the database
+    --threads N              DuckDB threads with --export-dir (default: one per core)
+"""
+
+import sys
+import os
+import re
+import time
+import argparse
+from pathlib import Path
+
+# Add the parent directory to the path so we can import the db_config module
+sys.path.append(str(Path(__file__).parent.parent / 'connection'))
+
+try:
+    import psycopg2
+    import pandas as pd
+except ImportError:
+    print("Required packages not found. Install with:")
+    print("pip install psycopg2-binary pandas")
+    sys.exit(1)
+
+# Import our database configuration
+try:
+    from db_config import configure_pool, POOL_PARAMS
+    from report_runner import run_report_file
+    from offline_reports import run_offline_report_file
+except ImportError:
+    print("Failed to import database configuration. Make sure db_config.py exists in the connection directory.")
+    sys.exit(1)
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Run a pack of SQL reports concurrently.')
+    parser.add_argument('report_file',
+                        help='.sql file or name in queries/ (e.g. operational_reports)')
+    parser.add_argument('--parallelism', type=int, default=None,
+                        help='Maximum number of reports running at once (default: pool size)')
+    parser.add_argument('--reports', default='',
+                        help='Comma-separated report numbers to run (default: all)')
+    parser.add_argument('--output-dir', default='',
+                        help="Directory to save one CSV file per report (default: don't save)")
+    parser.add_argument('--export-dir', default='',
+                        help='Run the reports on the exported files in this directory instead of the database')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='DuckDB threads with --export-dir (default: one per core)')
+    args = parser.parse_args()
+
+    if args.export_dir:
+        try:
+            import duckdb  # noqa: F401
+        except ImportError:
+            parser.error("--export-dir requires duckdb (pip install duckdb)")
+        if not os.path.isdir(args.export_dir):
+            parser.error(f"--export-dir: {args.export_dir} is not a directory")
+
+    return args
+
+def report_filename(title):
+    """Turn a report title into a file name."""
+    return re.sub(r'[^a-z0-9]+', '_', title.lower()).strip('_') + '.csv'
+
+def main():
+    """Main function to run a report pack."""
+    args = parse_args()
+    only = [int(n) for n in args.reports.split(',') if n.strip()] or None
+
+    if args.parallelism and args.parallelism > POOL_PARAMS['maxconn']:
+        configure_pool(maxconn=args.parallelism)
+
+    print(f"=== Running Report Pack ===")
+    print(f"Report File: {args.report_file}")
+    if args.export_dir:
+        print(f"Export Directory: {args.export_dir} (offline, DuckDB)")
+    print("=" * 40)
+
+    start = time.perf_counter()
+    if args.export_dir:
+        dataframes, timings = run_offline_report_file(args.report_file, args.export_dir, only=only,
+                                                      threads=args.threads)
+    else:
+        dataframes, timings = run_report_file(args.report_file, parallelism=args.parallelism, only=only)
+    total = time.perf_counter() - start
+
+    for title, df in dataframes.items():
+        print(f"{title:<45} {len(df):>8} rows  {timings[title]:>7.2f} s")
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for title, df in dataframes.items():
+            df.to_csv(Path(args.output_dir) / report_filename(title), index=False)
+        print(f"\nSaved {len(dataframes)} reports to {args.output_dir}")
+
+    print("\n=== Report Pack Complete ===")
+    print(f"Wall time: {total:.2f} s (sum of report times: {sum(timings.values()):.2f} s)")
+
+if __name__ == "__main__":
+    main()
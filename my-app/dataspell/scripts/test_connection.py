@@ -106,7 +106,7 @@ def get_schema_info():
             
             for table_name in key_tables:
                 if any(t['table_name'] == table_name for t in tables):
-                    cur.execute(f"""
+                    cur.execute("""
                         SELECT 
                             column_name, 
                             data_type, 
@@ -115,10 +115,10 @@ def get_schema_info():
                             information_schema.columns 
                         WHERE 
                             table_schema = 'public' AND 
-                            table_name = '{table_name}'
+                            table_name = %s
                         ORDER BY 
                             ordinal_position;
-                    """)
+                    """, (table_name,))
                     columns = cur.fetchall()
                     
                     print(f"\n{table_name} Columns:")
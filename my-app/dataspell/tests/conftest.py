@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The modules under test are imported the way the scripts import them
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / 'connection'))
+sys.path.insert(0, str(ROOT / 'scripts'))
@@ -0,0 +1,112 @@
+"""Event-loop ownership and leak handling of the async connection pool."""
+
+import asyncio
+import gc
+
+import pytest
+
+import async_db
+
+
+class FakeAsyncConnection:
+    closed = 0
+
+    def isexecuting(self):
+        return False
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture(autouse=True)
+def fake_connections(monkeypatch):
+    async def connect_async(params=None):
+        return FakeAsyncConnection()
+
+    monkeypatch.setattr(async_db, 'connect_async', connect_async)
+    yield
+    async_db.close_async_pool()
+
+
+def test_each_event_loop_gets_its_own_pool():
+    async def use_pool():
+        pool = async_db.get_async_pool()
+        assert async_db.get_async_pool() is pool
+        conn = await async_db.get_connection_async()
+        conn.close()
+        return pool
+
+    first = asyncio.run(use_pool())
+    # A second asyncio.run(), as in a notebook kernel, must not reuse the
+    # pool (and semaphore) bound to the first, now closed, loop
+    second = asyncio.run(use_pool())
+
+    assert first is not second
+    assert first._loop.is_closed()
+    assert len(async_db._async_pools) == 1
+
+
+def test_async_with_returns_connection():
+    async def run():
+        pool = async_db.get_async_pool()
+        async with await async_db.get_connection_async() as conn:
+            assert not conn.closed
+        assert conn.closed
+        assert len(pool._idle) == 1
+
+    asyncio.run(run())
+
+
+def test_leaked_connection_gives_back_its_slot(monkeypatch):
+    monkeypatch.setitem(async_db.POOL_PARAMS, 'maxconn', 1)
+
+    async def run():
+        pool = async_db.get_async_pool()
+        leaked = await async_db.get_connection_async()
+        raw = leaked.raw_connection
+        with pytest.warns(ResourceWarning):
+            del leaked
+            gc.collect()
+        assert raw.closed
+
+        # The only slot is free again
+        conn = await asyncio.wait_for(pool.acquire(), 1)
+        pool.release(conn)
+
+    asyncio.run(run())
+
+
+def test_gather_dataframes_runs_queries_concurrently(monkeypatch):
+    running = []
+
+    async def query(sql, params=None, timeout=None):
+        running.append(sql)
+        await asyncio.sleep(0.05)
+        return sql.upper()
+
+    monkeypatch.setattr(async_db, 'query_to_dataframe_async', query)
+
+    async def run():
+        return await asyncio.wait_for(
+            async_db.gather_dataframes({'a': 'select 1', 'b': 'select 2', 'c': 'select 3'}), 0.12)
+
+    assert asyncio.run(run()) == {'a': 'SELECT 1', 'b': 'SELECT 2', 'c': 'SELECT 3'}
+
+
+def test_gather_dataframes_cancels_the_rest_on_failure(monkeypatch):
+    cancelled = []
+
+    async def query(sql, params=None, timeout=None):
+        if sql == 'bad':
+            raise RuntimeError("syntax error")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(sql)
+            raise
+
+    monkeypatch.setattr(async_db, 'query_to_dataframe_async', query)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(async_db.gather_dataframes({'slow': 'slow', 'bad': 'bad'}))
+    assert cancelled == ['slow']
@@ -0,0 +1,190 @@
+"""Encoding rows for COPY FROM STDIN and loading them in batches."""
+
+import struct
+import threading
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+import bulk_load
+from bulk_load import binary_encoders, encode_binary_rows, encode_text_rows, load_rows
+
+USER_ID = '6f1d2b3c-4d5e-4f60-8a7b-9c0d1e2f3a4b'
+
+
+def test_text_rows_are_escaped():
+    rows = [(1, 'tab\there', None, True), (2, 'back\\slash\nnew\rline', '', False),
+            (3, 'ünï', datetime(2024, 6, 1, 12, 30, 0, 5), 1.5)]
+
+    assert encode_text_rows(rows) == (
+        b'1\ttab\\there\t\\N\tt\n'
+        b'2\tback\\\\slash\\nnew\\rline\t\tf\n'
+        + '3\tünï\t2024-06-01 12:30:00.000005\t1.5\n'.encode('utf-8')
+    )
+
+
+@pytest.mark.parametrize('type_name, value, field', [
+    ('int2', 7, b'\x00\x00\x00\x02\x00\x07'),
+    ('int4', -1, b'\x00\x00\x00\x04\xff\xff\xff\xff'),
+    ('int8', 2 ** 40, b'\x00\x00\x00\x08' + struct.pack('!q', 2 ** 40)),
+    ('float8', 1.5, b'\x00\x00\x00\x08\x3f\xf8\x00\x00\x00\x00\x00\x00'),
+    ('bool', True, b'\x00\x00\x00\x01\x01'),
+    ('bool', False, b'\x00\x00\x00\x01\x00'),
+    ('text', 'é', b'\x00\x00\x00\x02\xc3\xa9'),
+    # Microseconds since 2000-01-01
+    ('timestamp', datetime(2000, 1, 2, 0, 0, 1, 500000), b'\x00\x00\x00\x08' + struct.pack('!q', 86401500000)),
+    ('timestamp', datetime(1999, 12, 31, 23, 59, 59), b'\x00\x00\x00\x08' + struct.pack('!q', -1000000)),
+    ('timestamptz', datetime(2000, 1, 1, 1, 0, tzinfo=timezone(timedelta(hours=1))),
+     b'\x00\x00\x00\x08' + struct.pack('!q', 0)),
+    # Days since 2000-01-01
+    ('date', date(1999, 12, 31), b'\x00\x00\x00\x04\xff\xff\xff\xff'),
+    ('date', datetime(2000, 1, 3, 18, 0), b'\x00\x00\x00\x04\x00\x00\x00\x02'),
+    ('uuid', USER_ID, b'\x00\x00\x00\x10' + uuid.UUID(USER_ID).bytes),
+])
+def test_binary_fields(type_name, value, field):
+    [encode] = binary_encoders([(type_name, 'b')])
+
+    assert encode(value) == field
+
+
+def test_enums_are_sent_as_text():
+    [encode] = binary_encoders([('user_role', 'e')])
+
+    assert encode('PATIENT') == b'\x00\x00\x00\x07PATIENT'
+
+
+def test_type_without_binary_encoder_is_rejected():
+    with pytest.raises(ValueError, match="numeric"):
+        binary_encoders([('numeric', 'b')])
+
+
+def test_binary_stream_layout():
+    encoders = binary_encoders([('int4', 'b'), ('text', 'b')])
+
+    data = encode_binary_rows([(1, 'a'), (2, None)], encoders)
+
+    assert data == (
+        b'PGCOPY\n\xff\r\n\x00' + b'\x00' * 8
+        + b'\x00\x02' + b'\x00\x00\x00\x04\x00\x00\x00\x01' + b'\x00\x00\x00\x01a'
+        + b'\x00\x02' + b'\x00\x00\x00\x04\x00\x00\x00\x02' + b'\xff\xff\xff\xff'
+        + b'\xff\xff'
+    )
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.statements.append(query)
+
+    def fetchall(self):
+        return [('id', 'uuid', 'b'), ('role', 'user_role', 'e')]
+
+    def copy_expert(self, statement, file):
+        self.conn.statements.append(statement)
+        self.conn.copied.append(file.read())
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def test_rows_are_copied_in_committed_batches():
+    conn = FakeConnection()
+    progress = []
+    rows = ((USER_ID, role) for role in ['PATIENT'] * 5)
+
+    loaded = load_rows(conn, 'users', ['id', 'role'], rows, batch_size=2, on_batch=progress.append)
+
+    assert loaded == 5
+    assert progress == [2, 4, 5]
+    assert conn.commits == 3
+    assert conn.statements[0] == "COPY users (id, role) FROM STDIN WITH (FORMAT text)"
+    assert conn.copied[-1] == f'{USER_ID}\tPATIENT\n'.encode()
+
+
+def test_binary_copy_looks_up_column_types_once():
+    conn = FakeConnection()
+
+    load_rows(conn, 'users', ['id', 'role'], [(USER_ID, 'PATIENT')] * 3, method='copy-binary', batch_size=2)
+
+    assert sum('pg_attribute' in statement for statement in conn.statements) == 1
+    assert all(data.startswith(b'PGCOPY') for data in conn.copied)
+
+
+def test_insert_uses_execute_values(monkeypatch):
+    conn = FakeConnection()
+    batches = []
+    monkeypatch.setattr(bulk_load, 'execute_values',
+                        lambda cur, statement, batch, page_size: batches.append((statement, len(batch))))
+
+    load_rows(conn, 'users', ['id'], iter([(n,) for n in range(25)]), method='insert', batch_size=10)
+
+    assert batches == [("INSERT INTO users (id) VALUES %s", 10), ("INSERT INTO users (id) VALUES %s", 10),
+                       ("INSERT INTO users (id) VALUES %s", 5)]
+    assert conn.commits == 3
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        load_rows(FakeConnection(), 'users', ['id'], [], method='upsert')
+
+
+def test_prefetched_load_matches_serial_load():
+    serial, prefetched = FakeConnection(), FakeConnection()
+    rows = [(USER_ID, 'PATIENT')] * 7
+
+    assert load_rows(serial, 'users', ['id', 'role'], rows, batch_size=3) == 7
+    assert load_rows(prefetched, 'users', ['id', 'role'], iter(rows), batch_size=3, prefetch=2) == 7
+    assert prefetched.copied == serial.copied
+    assert prefetched.commits == 3
+
+
+def test_prefetch_reraises_generation_errors():
+    def rows():
+        yield (USER_ID, 'PATIENT')
+        raise RuntimeError("generator failed")
+
+    conn = FakeConnection()
+
+    with pytest.raises(RuntimeError, match="generator failed"):
+        load_rows(conn, 'users', ['id', 'role'], rows(), batch_size=1, prefetch=1)
+    assert conn.commits == 1
+
+
+def test_prefetch_stops_the_producer_when_loading_fails():
+    produced = []
+
+    def rows():
+        for n in range(1000):
+            produced.append(n)
+            yield (USER_ID, 'PATIENT')
+
+    def fail(loaded):
+        raise RuntimeError("load failed")
+
+    with pytest.raises(RuntimeError, match="load failed"):
+        load_rows(FakeConnection(), 'users', ['id', 'role'], rows(), batch_size=1, on_batch=fail, prefetch=2)
+    # Only the batches queued ahead were generated, and the thread has exited
+    assert len(produced) < 10
+    assert not any(thread.name == 'bulk-load-prefetch' for thread in threading.enumerate())
@@ -0,0 +1,133 @@
+"""Checkout, reuse and cleanup of pooled connections."""
+
+import pytest
+from psycopg2 import extensions
+
+import db_config
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.isolation_level = None
+        self.readonly = None
+        self.deferrable = None
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def cursor(self):
+        return FakeCursor()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    connections = []
+
+    def connect(params=None, **options):
+        conn = FakeConnection()
+        connections.append(conn)
+        return conn
+
+    monkeypatch.setattr(db_config, '_connect', connect)
+    return connections
+
+
+def test_released_connection_is_reused(opened):
+    pool = db_config.ConnectionPool({'host': 'fake'}, minconn=0, maxconn=2)
+
+    conn = pool.acquire()
+    pool.release(conn)
+
+    assert pool.acquire() is conn
+    assert len(opened) == 1
+    assert pool.stats() == {'open': 1, 'idle': 0, 'in_use': 1, 'maxconn': 2}
+
+
+def test_acquire_times_out_when_pool_is_exhausted(opened):
+    pool = db_config.ConnectionPool({'host': 'fake'}, minconn=0, maxconn=1)
+    pool.acquire()
+
+    with pytest.raises(db_config.PoolTimeoutError):
+        pool.acquire(timeout=0.01)
+
+
+def test_release_rolls_back_open_transaction(opened):
+    pool = db_config.ConnectionPool({'host': 'fake'}, minconn=0, maxconn=1)
+    conn = pool.acquire()
+    conn.status = extensions.TRANSACTION_STATUS_INERROR
+    conn.autocommit = True
+
+    pool.release(conn)
+
+    assert conn.rollbacks == 1
+    assert conn.autocommit is False
+    assert pool.acquire() is conn
+
+
+def test_broken_connection_is_replaced(opened):
+    pool = db_config.ConnectionPool({'host': 'fake'}, minconn=0, maxconn=1)
+    conn = pool.acquire()
+    conn.status = extensions.TRANSACTION_STATUS_UNKNOWN
+
+    pool.release(conn)
+
+    assert conn.closed
+    assert pool.stats()['open'] == 0
+    assert pool.acquire() is not conn
+
+
+def test_idle_connections_are_closed_down_to_minconn(opened):
+    pool = db_config.ConnectionPool({'host': 'fake'}, minconn=1, maxconn=3, max_idle_seconds=60)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    # Both have been idle for longer than max_idle_seconds
+    pool._idle = [(conn, last_used - 120) for conn, last_used in pool._idle]
+
+    assert pool.acquire() is second
+    assert first.closed
+    assert pool.stats()['open'] == 1
+
+
+def test_pooled_connection_close_returns_it_to_the_pool(opened):
+    pool = db_config.ConnectionPool({'host': 'fake'}, minconn=0, maxconn=1)
+    conn = db_config.PooledConnection(pool, pool.acquire())
+
+    conn.close()
+    conn.close()
+
+    assert conn.closed
+    assert not opened[0].closed
+    assert pool.stats() == {'open': 1, 'idle': 1, 'in_use': 0, 'maxconn': 1}
+
+
+def test_closed_pool_refuses_checkouts(opened):
+    pool = db_config.ConnectionPool({'host': 'fake'}, minconn=0, maxconn=1)
+    pool.release(pool.acquire())
+    pool.close()
+
+    assert opened[0].closed
+    with pytest.raises(db_config.PoolTimeoutError):
+        pool.acquire()
@@ -0,0 +1,107 @@
+"""Parsing of COPY ... TO STDOUT output into typed DataFrames."""
+
+from collections import namedtuple
+from contextlib import contextmanager
+
+import pandas as pd
+import pytest
+
+import db_config
+
+Column = namedtuple('Column', ['name', 'type_code'])
+
+# id int4, name text, score float8, active bool, created timestamp, name again
+COLUMNS = [Column('id', 23), Column('name', 25), Column('score', 701),
+           Column('active', 16), Column('created', 1114), Column('name', 25)]
+
+COPY_OUTPUT = (
+    b'1,Ana,1.5,t,2024-01-02 03:04:05,x\n'
+    b'2,"",\\N,f,2024-01-02 03:04:05.5,"a,""b"""\n'
+    b'3,\\N,2,\\N,\\N,"two\nlines"\n'
+)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.statements.append(query)
+        self.description = COLUMNS
+
+    def mogrify(self, query, params):
+        return query.replace('%s', "'%s'" % params[0]).encode()
+
+    def copy_expert(self, sql, file):
+        self.conn.statements.append(sql)
+        file.write(COPY_OUTPUT)
+
+
+class FakeConnection:
+    encoding = 'UTF8'
+    autocommit = False
+
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = FakeConnection()
+
+    @contextmanager
+    def connection(readonly=False):
+        yield conn
+
+    monkeypatch.setattr(db_config, 'connection', connection)
+    return conn
+
+
+@pytest.mark.parametrize('engine', ['pandas', 'arrow'])
+def test_copy_result_is_typed_like_read_sql(conn, engine):
+    df = db_config.copy_query_to_dataframe("SELECT * FROM users;", engine=engine)
+
+    assert list(df.columns) == ['id', 'name', 'score', 'active', 'created', 'name']
+    assert df['id'].tolist() == [1, 2, 3]
+    assert df['score'].dtype == 'float64'
+    assert pd.isna(df['score'][1])
+    assert df.iloc[:, 3].tolist()[:2] == [True, False]
+    assert pd.isna(df.iloc[2, 3])
+    assert df['created'].dtype.kind == 'M'
+    assert df['created'][1] == pd.Timestamp('2024-01-02 03:04:05.5')
+    # Empty strings and NULLs stay apart; quoted delimiters and newlines survive
+    assert df.iloc[:, 1].tolist()[:2] == ['Ana', '']
+    assert pd.isna(df.iloc[2, 1])
+    assert df.iloc[:, 5].tolist() == ['x', 'a,"b"', 'two\nlines']
+
+
+def test_copy_binds_parameters_client_side(conn):
+    db_config.copy_query_to_dataframe("SELECT * FROM users WHERE role = %s;", ('PATIENT',),
+                                      engine='pandas')
+
+    copy = conn.statements[-1]
+    assert copy.startswith("COPY (SELECT * FROM users WHERE role = 'PATIENT') TO STDOUT")
+
+
+def test_unknown_engine_is_rejected(conn):
+    with pytest.raises(ValueError):
+        db_config.copy_query_to_dataframe("SELECT 1", engine='polars')
+
+
+@pytest.mark.parametrize('query, stripped', [
+    ("SELECT 1;", "SELECT 1"),
+    ("  SELECT 1 ; ;\n", "SELECT 1"),
+    ("SELECT ';'", "SELECT ';'"),
+])
+def test_strip_statement(query, stripped):
+    assert db_config._strip_statement(query) == stripped
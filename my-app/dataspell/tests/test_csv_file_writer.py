@@ -0,0 +1,89 @@
+"""Compressed, size-bounded CSV files written from COPY output."""
+
+import gzip
+import hashlib
+
+import pytest
+
+from export_formats import CsvFileWriter, ExportOptions
+
+HEADER = b'id,email\n'
+ROWS = [b'u%d,user%d@example.com\n' % (n, n) for n in range(10)]
+
+
+def copy_into(writer, rows=ROWS):
+    # COPY writes the header and then one row per call
+    writer.write(HEADER)
+    for row in rows:
+        writer.write(row)
+    return writer.close()
+
+
+def test_unbounded_export_is_one_file(tmp_path):
+    [exported] = copy_into(CsvFileWriter(tmp_path / 'users.csv', ExportOptions()))
+
+    data = (tmp_path / 'users.csv').read_bytes()
+    assert data == HEADER + b''.join(ROWS)
+    assert (exported.rows, exported.bytes) == (10, len(data))
+    assert exported.sha256 == hashlib.sha256(data).hexdigest()
+
+
+def test_row_limit_splits_into_numbered_files(tmp_path):
+    options = ExportOptions(max_file_rows=4)
+
+    files = copy_into(CsvFileWriter(tmp_path / 'users.csv', options))
+
+    assert [exported.path.name for exported in files] == ['users.0001.csv', 'users.0002.csv',
+                                                         'users.0003.csv']
+    assert [exported.rows for exported in files] == [4, 4, 2]
+    # Every file starts with the header and the rows are in order
+    assert b''.join(exported.path.read_bytes()[len(HEADER):] for exported in files) == b''.join(ROWS)
+    assert all(exported.path.read_bytes().startswith(HEADER) for exported in files)
+
+
+def test_size_limit_splits_into_numbered_files(tmp_path):
+    limit = len(HEADER) + 3 * len(ROWS[0])
+
+    files = copy_into(CsvFileWriter(tmp_path / 'users.csv', ExportOptions(max_file_bytes=limit)))
+
+    assert len(files) > 1
+    assert sum(exported.rows for exported in files) == 10
+    assert all(exported.bytes <= limit for exported in files)
+    assert [exported.bytes for exported in files] == [f.path.stat().st_size for f in files]
+
+
+def test_gzip_files_round_trip(tmp_path):
+    options = ExportOptions(compression='gzip', max_file_rows=5)
+
+    files = copy_into(CsvFileWriter(tmp_path / 'users.csv.gz', options))
+
+    assert [exported.path.name for exported in files] == ['users.0001.csv.gz', 'users.0002.csv.gz']
+    assert gzip.decompress(files[0].path.read_bytes()) == HEADER + b''.join(ROWS[:5])
+    assert files[1].sha256 == hashlib.sha256(files[1].path.read_bytes()).hexdigest()
+
+
+def test_empty_result_gets_header_only(tmp_path):
+    [exported] = copy_into(CsvFileWriter(tmp_path / 'users.csv', ExportOptions(max_file_rows=4)), [])
+
+    assert exported.rows == 0
+    assert exported.path.read_bytes() == HEADER
+
+
+def test_abort_removes_every_file(tmp_path):
+    writer = CsvFileWriter(tmp_path / 'users.csv', ExportOptions(max_file_rows=4))
+    writer.write(HEADER)
+    for row in ROWS[:6]:
+        writer.write(row)
+
+    writer.abort()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_zstd_files_round_trip(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+
+    [exported] = copy_into(CsvFileWriter(tmp_path / 'users.csv.zst', ExportOptions(compression='zstd')))
+
+    data = zstandard.ZstdDecompressor().stream_reader(exported.path.read_bytes()).read()
+    assert data == HEADER + b''.join(ROWS)
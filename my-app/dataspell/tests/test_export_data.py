@@ -0,0 +1,356 @@
+"""Streaming table exports through COPY: whole, in range shards, or incrementally."""
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from psycopg2 import sql
+
+import export_data_to_csv as export
+from export_formats import ExportedFile
+
+USERS_CSV = [b'id,email,role\n', b'u1,ana@example.com,PATIENT\n', b'u2,"b,c@example.com",PROVIDER\n']
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.statements.append(query % params if params else query)
+
+    def copy_expert(self, query, file):
+        self.conn.statements.append(query)
+        if self.conn.error is not None:
+            file.write(self.conn.rows[0])
+            raise self.conn.error
+        # COPY sends the header and then one message per row
+        for row in self.conn.rows:
+            file.write(row)
+        self.rowcount = len(self.conn.rows) - 1
+
+
+class FakeConnection:
+    def __init__(self, rows, error=None):
+        self.rows = rows
+        self.error = error
+        self.statements = []
+        self.sessions = []
+        self.closed = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def set_session(self, **settings):
+        self.sessions.append(settings)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture(autouse=True)
+def quote_without_server(monkeypatch):
+    # Identifiers are quoted by libpq, which needs a live connection
+    monkeypatch.setattr(sql.ext, 'quote_ident', lambda name, context: '"%s"' % name.replace('"', '""'))
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    def serve(rows, error=None):
+        conn = FakeConnection(rows, error)
+        monkeypatch.setattr(export, 'get_connection', lambda: conn)
+        return conn
+
+    return serve
+
+
+def test_table_is_streamed_with_copy(serve, tmp_path):
+    conn = serve(USERS_CSV)
+
+    [exported] = export.export_table_to_csv('users', tmp_path)
+
+    assert exported.rows == 2
+    assert (tmp_path / 'users.csv').read_bytes() == b''.join(USERS_CSV)
+    assert exported.sha256 == hashlib.sha256(b''.join(USERS_CSV)).hexdigest()
+    assert conn.statements == ['COPY (SELECT * FROM "users") TO STDOUT WITH (FORMAT csv, HEADER true)']
+    assert conn.closed
+
+
+def test_table_is_read_from_the_shared_snapshot(serve, tmp_path):
+    conn = serve(USERS_CSV)
+
+    export.export_table_to_csv('users', tmp_path, snapshot_id='00000003-0000001B-1')
+
+    assert conn.statements[0] == 'SET TRANSACTION SNAPSHOT 00000003-0000001B-1;'
+    assert conn.statements[1].startswith('COPY')
+    assert conn.sessions[0]['readonly'] is True
+
+
+def test_table_name_is_quoted(serve, tmp_path):
+    conn = serve([b'id\n'])
+
+    export.export_table_to_csv('Users"; DROP TABLE users; --', tmp_path / 'out')
+
+    assert 'FROM "Users""; DROP TABLE users; --")' in conn.statements[0]
+
+
+def test_empty_table_gets_header_only(serve, tmp_path):
+    serve([b'id,email,role\n'])
+
+    [exported] = export.export_table_to_csv('users', tmp_path)
+
+    assert exported.rows == 0
+    assert (tmp_path / 'users.csv').read_bytes() == b'id,email,role\n'
+
+
+def test_failed_export_leaves_no_file(serve, tmp_path):
+    conn = serve(USERS_CSV, error=RuntimeError("connection lost"))
+
+    with pytest.raises(RuntimeError, match="connection lost"):
+        export.export_table_to_csv('users', tmp_path)
+    assert not (tmp_path / 'users.csv').exists()
+    assert conn.closed
+
+
+def render(composable):
+    """Render composed SQL without a server connection."""
+    if isinstance(composable, sql.Composed):
+        return ''.join(render(part) for part in composable)
+    if isinstance(composable, sql.Identifier):
+        return '"%s"' % composable.string
+    if isinstance(composable, sql.Literal):
+        return "'%s'" % composable.wrapped
+    return composable.string
+
+
+class PlanningCursor(FakeCursor):
+    def execute(self, query, params=None):
+        self.conn.statements.append((query, params))
+
+    def fetchone(self):
+        return self.conn.results.pop(0)
+
+
+class PlanningConnection(FakeConnection):
+    def __init__(self, *results):
+        super().__init__([])
+        self.results = list(results)
+
+    def cursor(self):
+        return PlanningCursor(self)
+
+
+def test_shards_come_from_sampled_percentiles(monkeypatch):
+    conn = PlanningConnection((1e6,), (['10', '20', '20', None, '30'],))
+    monkeypatch.setattr(export, 'get_connection', lambda: conn)
+
+    ranges = export.plan_table_shards('audit_logs', 'timestamp', 5)
+
+    # Repeated percentiles of a skewed column do not produce empty shards
+    assert ranges == [(None, '10'), ('10', '20'), ('20', '30'), ('30', None)]
+    percentiles, (fractions, sample_percent) = conn.statements[-1]
+    assert 'TABLESAMPLE SYSTEM' in render(percentiles)
+    assert fractions == [0.2, 0.4, 0.6, 0.8]
+    assert sample_percent == 100.0 * export.SPLIT_SAMPLE_ROWS / 1e6
+
+
+def test_table_without_statistics_is_not_split(monkeypatch, capsys):
+    conn = PlanningConnection((-1.0,))
+    monkeypatch.setattr(export, 'get_connection', lambda: conn)
+
+    assert export.plan_table_shards('audit_logs', 'timestamp', 8) == [(None, None)]
+    # No percentiles over the whole table
+    assert len(conn.statements) == 1
+    assert 'ANALYZE "audit_logs"' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('lower, upper, condition', [
+    (None, None, 'TRUE'),
+    (None, '10', '("id" < \'10\' OR "id" IS NULL)'),
+    ('10', '20', '"id" >= \'10\' AND "id" < \'20\''),
+    ('20', None, '"id" >= \'20\''),
+])
+def test_shard_condition(lower, upper, condition):
+    assert render(export.shard_condition('id', lower, upper)) == condition
+
+
+@pytest.fixture
+def fake_exports(monkeypatch):
+    """Exports that write nothing; tables in `failing` raise, the others have 2 rows per file."""
+    failing = set()
+    exported = []
+
+    def files(name, output_path):
+        exported.append(output_path.name)
+        if name in failing:
+            raise RuntimeError(f"{name} failed")
+        return [ExportedFile(output_path, 2, 20, 'c0ffee')]
+
+    def export_table_to_csv(table, output_dir, snapshot_id=None, options=None):
+        return files(table, export.output_file(output_dir, table))
+
+    def export_table_shard(table, column, lower, upper, output_path, *args):
+        return files(output_path.name.split('.csv')[0], output_path)
+
+    monkeypatch.setattr(export, 'export_table_to_csv', export_table_to_csv)
+    monkeypatch.setattr(export, 'export_table_shard', export_table_shard)
+    monkeypatch.setattr(export, 'plan_table_shards',
+                        lambda table, column, shards, *args, **kwargs: [(None, '10'), ('10', None)])
+    return failing, exported
+
+
+def run_full_export(tmp_path, checkpoint=None, tables=('users', 'messages'), split=('messages',)):
+    split_columns = {table: 'sentAt' for table in split}
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        return export.run_full_export(executor, list(tables), split_columns, 2, tmp_path, None,
+                                      checkpoint=checkpoint)
+
+
+def test_sharded_export_writes_manifest(fake_exports, tmp_path):
+    statuses = run_full_export(tmp_path)
+
+    assert [(status.status, status.rows) for status in statuses.values()] == [('exported', 2),
+                                                                             ('exported', 4)]
+    manifest = json.loads((tmp_path / 'messages.manifest.json').read_text())
+    assert manifest['total_rows'] == 4
+    assert [shard['files'] for shard in manifest['shards']] == [
+        [{'file': 'messages.part-0001.csv', 'rows': 2, 'bytes': 20, 'sha256': 'c0ffee'}],
+        [{'file': 'messages.part-0002.csv', 'rows': 2, 'bytes': 20, 'sha256': 'c0ffee'}],
+    ]
+    assert [(shard['lower'], shard['upper']) for shard in manifest['shards']] == [(None, '10'),
+                                                                                  ('10', None)]
+    assert (tmp_path / 'SHA256SUMS').read_text().count('c0ffee') == 3
+    # A finished export leaves no checkpoint behind
+    assert not (tmp_path / export.CHECKPOINT_FILE).exists()
+
+
+def test_failed_shard_fails_its_table(fake_exports, tmp_path):
+    failing, _ = fake_exports
+    failing.add('messages.part-0002')
+
+    statuses = run_full_export(tmp_path)
+
+    assert statuses['messages'].status == 'failed'
+    assert statuses['messages'].error == 'RuntimeError: messages.part-0002 failed'
+    assert not (tmp_path / 'messages.manifest.json').exists()
+    manifest = json.loads((tmp_path / 'export_manifest.json').read_text())
+    assert list(manifest['tables']) == ['users']
+
+
+def test_resumed_export_skips_finished_units(fake_exports, tmp_path):
+    failing, exported = fake_exports
+    settings = {'format': 'csv'}
+    failing.add('messages.part-0002')
+    run_full_export(tmp_path, export.ExportCheckpoint.resume(tmp_path / 'checkpoint.json', settings))
+    # Finished units are only skipped if their files are still there
+    for name in ('users.csv', 'messages.part-0001.csv'):
+        (tmp_path / name).write_bytes(b'x' * 20)
+
+    failing.clear()
+    del exported[:]
+    checkpoint = export.ExportCheckpoint.resume(tmp_path / 'checkpoint.json', settings)
+    statuses = run_full_export(tmp_path, checkpoint)
+
+    assert exported == ['messages.part-0002.csv']
+    assert [status.status for status in statuses.values()] == ['resumed', 'resumed']
+    assert not (tmp_path / 'checkpoint.json').exists()
+
+
+def test_missing_file_is_exported_again(fake_exports, tmp_path):
+    failing, exported = fake_exports
+    failing.add('messages.part-0002')
+    run_full_export(tmp_path, export.ExportCheckpoint.resume(tmp_path / 'checkpoint.json', {}))
+
+    failing.clear()
+    del exported[:]
+    run_full_export(tmp_path, export.ExportCheckpoint.resume(tmp_path / 'checkpoint.json', {}))
+
+    assert sorted(exported) == ['messages.part-0001.csv', 'messages.part-0002.csv', 'users.csv']
+
+
+def test_checkpoint_with_other_options_is_refused(tmp_path):
+    export.ExportCheckpoint(tmp_path / 'checkpoint.json', {'format': 'csv'}).save()
+
+    with pytest.raises(ValueError, match="different options"):
+        export.ExportCheckpoint.resume(tmp_path / 'checkpoint.json', {'format': 'parquet'})
+
+
+@pytest.mark.parametrize('since, until, condition', [
+    (None, None, '(TRUE OR "updatedAt" IS NULL)'),
+    (None, '2024-05-01', '("updatedAt" <= \'2024-05-01\' OR "updatedAt" IS NULL)'),
+    ('2024-04-01', '2024-05-01',
+     '"updatedAt" > CAST(\'2024-04-01\' AS timestamp without time zone) - \'300\' * interval \'1 second\''
+     ' AND "updatedAt" <= \'2024-05-01\''),
+])
+def test_watermark_condition(since, until, condition):
+    rendered = export.watermark_condition('updatedAt', 'timestamp without time zone', since, until, 300)
+
+    assert render(rendered) == condition
+
+
+def test_integer_watermark_has_no_overlap():
+    rendered = export.watermark_condition('version', 'bigint', '41', '45', 300)
+
+    assert render(rendered) == '"version" > CAST(\'41\' AS bigint) AND "version" <= \'45\''
+
+
+@pytest.fixture
+def incremental(monkeypatch):
+    exported = {}
+    high_watermarks = {}
+
+    def export_table_where(table, condition, output_path, *args):
+        exported[table] = render(condition)
+        if table == 'messages':
+            raise RuntimeError("connection lost")
+        return [ExportedFile(output_path, 3, 30, 'c0ffee')]
+
+    monkeypatch.setattr(export, 'get_watermark_columns', lambda tables: {
+        table: ('updatedAt', 'timestamp without time zone') for table in tables if table != 'settings'})
+    monkeypatch.setattr(export, 'get_high_watermarks',
+                        lambda columns, snapshot_id=None: dict(high_watermarks))
+    monkeypatch.setattr(export, 'export_table_where', export_table_where)
+    return exported, high_watermarks
+
+
+def test_incremental_export_advances_watermarks(incremental, tmp_path):
+    exported, high_watermarks = incremental
+    state_path = tmp_path / 'export_state.json'
+    tables = ['users', 'messages', 'settings']
+
+    high_watermarks.update(users='2024-05-01', messages='2024-05-02')
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = export.run_incremental_export(executor, tables, tmp_path, state_path, 0, None)
+
+    assert [(status.status, status.rows) for status in results.values()] == [
+        ('exported', 3), ('failed', 0), ('exported', 3)]
+    state = export.load_export_state(state_path)
+    # Failed tables and tables without a watermark column keep no watermark
+    assert state['tables'] == {'users': {'column': 'updatedAt', 'watermark': '2024-05-01',
+                                         'exported_at': state['tables']['users']['exported_at']}}
+    assert exported['settings'] == 'TRUE'
+
+    high_watermarks.update(users='2024-06-01')
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        export.run_incremental_export(executor, tables, tmp_path / 'next', state_path, 0, None)
+
+    assert "CAST('2024-05-01' AS" in exported['users']
+    assert 'IS NULL' in exported['messages']
+    assert export.load_export_state(state_path)['tables']['users']['watermark'] == '2024-06-01'
+    manifest = json.loads(next((tmp_path / 'next').glob('manifest-*.json')).read_text())
+    assert [entry['mode'] for entry in manifest['tables']] == ['delta', 'full', 'full']
+
+
+def test_missing_state_file_starts_from_scratch(tmp_path):
+    assert export.load_export_state(tmp_path / 'missing.json') == {'tables': {}}
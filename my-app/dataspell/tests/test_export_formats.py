@@ -0,0 +1,140 @@
+"""Parsing COPY CSV output into Arrow batches and writing them as columnar or CSV files."""
+
+import io
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+from export_formats import (ColumnType, ExportOptions, arrow_schema, open_csv_batches, write_columnar,
+                            write_csv_batches)
+
+COLUMNS = [ColumnType('id', 'int4', False), ColumnType('role', 'user_role', True),
+           ColumnType('status', 'text', False), ColumnType('notes', 'text', False),
+           ColumnType('createdAt', 'timestamptz', False), ColumnType('total', 'numeric', False)]
+
+COPY_OUTPUT = (
+    b'1,PATIENT,active,"",2024-01-02 03:04:05+00,1.10\n'
+    b'2,PROVIDER,inactive,,2024-01-02 03:04:05.5+00,\n'
+    b'3,PATIENT,active,"two\nlines, ""quoted""",,100000000000000000000.01\n'
+)
+
+
+def read_all(data, columns=COLUMNS):
+    schema = arrow_schema(columns)
+    return pa.Table.from_batches(list(open_csv_batches(io.BytesIO(data), schema)), schema)
+
+
+def test_arrow_schema_keeps_precision_and_encodes_categories():
+    schema = arrow_schema(COLUMNS)
+
+    assert schema.field('id').type == pa.int32()
+    # Enums and known category columns are dictionary encoded
+    assert schema.field('role').type == pa.dictionary(pa.int32(), pa.string())
+    assert pa.types.is_dictionary(schema.field('status').type)
+    assert schema.field('notes').type == pa.string()
+    assert schema.field('createdAt').type == pa.timestamp('us', tz='UTC')
+    # numeric has no exact Arrow type and stays text
+    assert schema.field('total').type == pa.string()
+
+
+def test_copy_csv_keeps_nulls_and_empty_strings_apart():
+    table = read_all(COPY_OUTPUT)
+
+    assert table.column('notes').to_pylist() == ['', None, 'two\nlines, "quoted"']
+    assert table.column('total').to_pylist() == ['1.10', None, '100000000000000000000.01']
+    assert table.column('createdAt').null_count == 1
+    assert table.column('role').to_pylist() == ['PATIENT', 'PROVIDER', 'PATIENT']
+
+
+def test_single_column_null_row_is_kept():
+    table = read_all(b'a\n\n""\n', [ColumnType('note', 'text', False)])
+
+    assert table.column('note').to_pylist() == ['a', None, '']
+
+
+def batches_of(ids, size):
+    schema = pa.schema([pa.field('id', pa.int32())])
+    for start in range(0, len(ids), size):
+        yield pa.RecordBatch.from_arrays([pa.array(ids[start:start + size], pa.int32())], schema=schema)
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'arrow'])
+def test_columnar_file_is_written_in_row_groups(tmp_path, file_format):
+    schema = pa.schema([pa.field('id', pa.int32())])
+    path = tmp_path / f'users.{file_format}'
+    options = ExportOptions(file_format, None, row_group_rows=4)
+
+    exported = write_columnar(batches_of(list(range(10)), 3), path, schema, options)
+
+    assert exported.rows == 10
+    assert exported.bytes == path.stat().st_size
+    if file_format == 'parquet':
+        metadata = pq.ParquetFile(path).metadata
+        assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [4, 4, 2]
+        assert pq.read_table(path).column('id').to_pylist() == list(range(10))
+    else:
+        table = pa.ipc.open_stream(pa.memory_map(str(path))).read_all()
+        assert table.column('id').to_pylist() == list(range(10))
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'arrow'])
+def test_failed_stream_leaves_no_file(tmp_path, file_format):
+    schema = pa.schema([pa.field('id', pa.int32())])
+    path = tmp_path / f'users.{file_format}'
+
+    def failing_batches():
+        yield from batches_of([1, 2, 3], 3)
+        raise pa.ArrowInvalid("CSV parse error: Expected 1 columns, got 2")
+
+    with pytest.raises(pa.ArrowInvalid):
+        write_columnar(failing_batches(), path, schema, ExportOptions(file_format, None, 2))
+
+    assert not path.exists()
+
+
+# COPY (FORMAT csv, HEADER) output captured from PostgreSQL for the same rows
+MIXED_COPY_OUTPUT = (
+    b'id,note,"a,b"\n'
+    b'1,plain,x\n'
+    b'2,"",\n'
+    b'3,,"say ""hi"""\n'
+    b'4,"two\nlines","c\rd"\n'
+    b'5,\\.,"a,b"\n'
+)
+
+
+def rewrite_as_csv(copy_output, columns, tmp_path, **options):
+    header, body = copy_output.split(b'\n', 1)
+    schema = arrow_schema(columns, as_text=True)
+    batches = open_csv_batches(io.BytesIO(body), schema)
+    return write_csv_batches(batches, tmp_path / 'users.csv', schema, ExportOptions(**options))
+
+
+def test_csv_batches_are_written_like_copy(tmp_path):
+    columns = [ColumnType('id', 'int4', False), ColumnType('note', 'text', False),
+               ColumnType('a,b', 'text', False)]
+
+    [exported] = rewrite_as_csv(MIXED_COPY_OUTPUT, columns, tmp_path)
+
+    assert exported.path.read_bytes() == MIXED_COPY_OUTPUT
+    assert exported.rows == 5
+
+
+def test_single_column_csv_quotes_end_of_data_marker(tmp_path):
+    copy_output = b'note\n"\\."\n\n""\n'
+
+    [exported] = rewrite_as_csv(copy_output, [ColumnType('note', 'text', False)], tmp_path)
+
+    assert exported.path.read_bytes() == copy_output
+
+
+def test_csv_batches_respect_row_limit(tmp_path):
+    columns = [ColumnType('id', 'int4', False), ColumnType('note', 'text', False),
+               ColumnType('a,b', 'text', False)]
+
+    files = rewrite_as_csv(MIXED_COPY_OUTPUT, columns, tmp_path, max_file_rows=2)
+
+    assert [exported.rows for exported in files] == [2, 2, 1]
+    assert all(exported.path.read_bytes().startswith(b'id,note,"a,b"\n') for exported in files)
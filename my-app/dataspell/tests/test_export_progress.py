@@ -0,0 +1,84 @@
+"""Throughput, phase timing and progress lines of export runs."""
+
+import io
+import threading
+
+import pytest
+
+from export_formats import CsvFileWriter, ExportOptions
+from export_progress import NULL_STATS, ExportProgress, ExportStats, current_stats, phase_breakdown
+
+
+def test_finish_books_unmeasured_time_to_the_remainder(monkeypatch):
+    clock = iter([10.0, 12.0])
+    monkeypatch.setattr('export_progress.time.perf_counter', lambda: next(clock))
+    stats = ExportStats('users', 'users')
+    stats.first_data = 10.5
+    stats.add_time('write', 0.25)
+
+    stats.finish('transfer')
+
+    assert stats.seconds == {'query': 0.5, 'transfer': 1.25, 'encode': 0.0, 'write': 0.25}
+
+
+def test_tracking_is_per_thread():
+    progress = ExportProgress({}, interval=0)
+    seen = {}
+
+    def export(key):
+        with progress.track(key, 'audit_logs') as stats:
+            seen[key] = current_stats() is stats
+
+    threads = [threading.Thread(target=export, args=(f'audit_logs.part-000{n}',)) for n in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert seen == {'audit_logs.part-0001': True, 'audit_logs.part-0002': True}
+    assert current_stats() is NULL_STATS
+
+
+def test_writer_reports_rows_and_bytes(tmp_path):
+    progress = ExportProgress({'users': 4}, interval=0)
+
+    with progress.track('users', 'users'):
+        writer = CsvFileWriter(tmp_path / 'users.csv', ExportOptions(), current_stats())
+        writer.write(b'id\n')
+        for n in range(4):
+            writer.write(b'%d\n' % n)
+        writer.close()
+
+    summary = progress.summary()
+    table = summary['tables']['users']
+    assert (table['rows'], table['bytes_read'], table['bytes_written']) == (4, 11, 11)
+    assert table['estimated_rows'] == 4
+    assert summary['totals']['errors'] == []
+
+
+def test_failed_unit_records_its_error():
+    progress = ExportProgress({}, interval=0)
+
+    with pytest.raises(RuntimeError):
+        with progress.track('users', 'users'):
+            raise RuntimeError("connection lost")
+
+    assert progress.summary()['tables']['users']['errors'] == ['RuntimeError: connection lost']
+
+
+def test_progress_line_with_estimate():
+    progress = ExportProgress({'audit_logs': 1000}, interval=0, stream=io.StringIO())
+    stats = ExportStats('audit_logs', 'audit_logs')
+    stats.started -= 10
+    stats.add_rows(250, 2 * 1024 * 1024)
+
+    line = progress.progress_line('audit_logs', [stats])
+
+    assert line.startswith('  audit_logs: 250 / 1,000 rows (25%)  25 rows/s  0.2 MB/s  ETA 30s')
+
+
+def test_phase_breakdown():
+    assert phase_breakdown({'query': 1, 'transfer': 6, 'encode': 2, 'write': 1}) == \
+        'query 10%, transfer 60%, encode 20%, write 10%'
+    assert phase_breakdown(dict.fromkeys(['query', 'transfer', 'encode', 'write'], 0)) == \
+        'no time recorded'
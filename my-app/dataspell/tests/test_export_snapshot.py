@@ -0,0 +1,172 @@
+"""Transaction handling of the export snapshot on pooled connections."""
+
+import pytest
+from psycopg2 import ProgrammingError
+from psycopg2 import extensions
+
+import db_config
+import export_data_to_csv as export
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.execute(query)
+
+    def fetchone(self):
+        return ('00000003-0000001B-1',)
+
+
+class FakeConnection:
+    """
+    Tracks transaction state the way psycopg2 does.
+
+    Outside autocommit, the first statement opens a transaction with the
+    session characteristics; only commit() or rollback() end it.
+    """
+
+    def __init__(self):
+        self.closed = 0
+        self.autocommit_value = False
+        self.isolation_level = None
+        self.readonly = None
+        self.deferrable = None
+        self.in_transaction = False
+        self.transactions = []
+
+    @property
+    def autocommit(self):
+        return self.autocommit_value
+
+    @autocommit.setter
+    def autocommit(self, value):
+        if self.in_transaction:
+            raise ProgrammingError("set_session cannot be used inside a transaction")
+        self.autocommit_value = value
+
+    def set_session(self, isolation_level=None, readonly=None, deferrable=None, autocommit=None):
+        if self.in_transaction:
+            raise ProgrammingError("set_session cannot be used inside a transaction")
+        default = lambda value, current: None if value == 'DEFAULT' else current if value is None else value
+        self.isolation_level = default(isolation_level, self.isolation_level)
+        self.readonly = default(readonly, self.readonly)
+        self.deferrable = default(deferrable, self.deferrable)
+        if autocommit is not None:
+            self.autocommit_value = autocommit
+
+    def execute(self, query):
+        if query.lstrip().upper().startswith(('BEGIN', 'ROLLBACK', 'COMMIT')):
+            # The server would only warn, leaving psycopg2 out of step
+            raise AssertionError(f"Transaction control sent as a statement: {query}")
+        if not self.autocommit_value and not self.in_transaction:
+            self.in_transaction = True
+            self.transactions.append({'isolation_level': self.isolation_level,
+                                      'readonly': self.readonly, 'statements': []})
+        if self.transactions and self.in_transaction:
+            self.transactions[-1]['statements'].append(query)
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.in_transaction = False
+
+    def commit(self):
+        self.in_transaction = False
+
+    def get_transaction_status(self):
+        if self.closed:
+            return extensions.TRANSACTION_STATUS_UNKNOWN
+        return extensions.TRANSACTION_STATUS_INTRANS if self.in_transaction else extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    raw = FakeConnection()
+    monkeypatch.setattr(db_config, '_connect', lambda params=None: raw)
+    pool = db_config.ConnectionPool({'host': 'fake'}, minconn=0, maxconn=1)
+    pool.raw = raw
+    return pool
+
+
+def test_snapshot_transaction_is_repeatable_read_and_read_only(pool):
+    conn = db_config.PooledConnection(pool, pool.acquire())
+
+    with export.snapshot_transaction(conn, '00000003-0000001B-1'):
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1;")
+
+    transaction = pool.raw.transactions[-1]
+    assert transaction['isolation_level'] == extensions.ISOLATION_LEVEL_REPEATABLE_READ
+    assert transaction['readonly'] is True
+    # Importing a snapshot must be the first statement of the transaction
+    assert transaction['statements'][0].startswith("SET TRANSACTION SNAPSHOT")
+    conn.close()
+
+
+def test_pooled_connection_is_returned_clean(pool):
+    conn = db_config.PooledConnection(pool, pool.acquire())
+    with export.snapshot_transaction(conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_export_snapshot();")
+    conn.close()
+
+    raw = pool.raw
+    assert pool.stats()['idle'] == 1
+    assert raw.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE
+    assert raw.autocommit is False
+    assert (raw.isolation_level, raw.readonly, raw.deferrable) == (None, None, None)
+
+    # The next user of the pooled connection gets a default transaction
+    conn = db_config.PooledConnection(pool, pool.acquire())
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1;")
+    assert raw.transactions[-1]['isolation_level'] is None
+    assert raw.transactions[-1]['readonly'] is None
+    conn.close()
+
+
+def test_snapshot_transaction_resets_after_error(pool):
+    conn = db_config.PooledConnection(pool, pool.acquire())
+    with pytest.raises(RuntimeError):
+        with export.snapshot_transaction(conn):
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            raise RuntimeError("export failed")
+
+    assert pool.raw.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE
+    assert pool.raw.readonly is None
+    conn.close()
+
+
+def test_pool_resets_session_left_by_caller(pool):
+    conn = db_config.PooledConnection(pool, pool.acquire())
+    conn.set_session(isolation_level=extensions.ISOLATION_LEVEL_SERIALIZABLE, readonly=True)
+    conn.autocommit = True
+    conn.close()
+
+    raw = pool.raw
+    assert raw.autocommit is False
+    assert (raw.isolation_level, raw.readonly) == (None, None)
+
+
+def test_pooled_connection_forwards_attribute_writes(pool):
+    conn = db_config.PooledConnection(pool, pool.acquire())
+    conn.autocommit = True
+
+    assert pool.raw.autocommit is True
+    assert 'autocommit' not in vars(conn)
+    conn.close()
+    with pytest.raises(AttributeError):
+        conn.autocommit = False
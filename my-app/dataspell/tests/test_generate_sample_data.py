@@ -0,0 +1,191 @@
+"""Planning and streaming, sharded generation of sample data."""
+
+import random
+import threading
+import time
+import types
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import chain
+
+import numpy as np
+import pytest
+
+import generate_sample_data as generator
+from generate_sample_data import GenerationPlan, plan_row_counts
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+
+def make_plan(scale=0.1, seed=7, shards=1, backend='python', **overrides):
+    return GenerationPlan(seed, plan_row_counts(scale, overrides), NOW, shards, backend)
+
+
+def all_rows(plan, table):
+    return list(chain.from_iterable(generator.table_rows(plan, table, shard) for shard in range(plan.shards)))
+
+
+def expected_ids(plan, table):
+    count = plan.counts[table]
+    if plan.backend == 'numpy':
+        return generator.entity_ids(plan, table, np.arange(count))
+    return [generator.entity_id(plan.seed, table, index) for index in range(count)]
+
+
+def test_row_counts_grow_with_scale():
+    counts = plan_row_counts(10)
+
+    assert (counts['patients'], counts['providers'], counts['users']) == (1000, 100, 1100)
+    assert counts['patient_profiles'] == 1000
+    # Children average half of the most rows per parent, plus one half
+    assert counts['appointments'] == 3000
+    assert counts['audit_logs'] == 1100 * 11 // 2
+
+
+def test_row_overrides_win():
+    counts = plan_row_counts(1, {'providers': 3, 'audit_logs': 0})
+
+    assert counts['providers'] == 3
+    assert counts['users'] == 103
+    assert counts['audit_logs'] == 0
+
+
+@pytest.mark.parametrize('total, parents', [(0, 5), (7, 3), (1000, 1), (10, 100)])
+def test_spread_rows_adds_up(total, parents):
+    counts = list(generator.spread_rows(total, parents, random.Random(1)))
+
+    assert len(counts) == parents
+    assert sum(counts) == total
+    assert min(counts) >= 0
+
+
+def test_entity_ids_are_deterministic_uuid4():
+    first = generator.entity_id(7, 'users', 3)
+
+    assert first == generator.entity_id(7, 'users', 3)
+    assert uuid.UUID(first).version == 4
+    assert len({first, generator.entity_id(8, 'users', 3), generator.entity_id(7, 'users', 4),
+                generator.entity_id(7, 'providers', 3)}) == 4
+
+
+@pytest.mark.parametrize('backend', generator.BACKENDS)
+@pytest.mark.parametrize('table', list(generator.TABLE_COLUMNS))
+def test_rows_are_streamed_and_match_columns(table, backend):
+    plan = make_plan(backend=backend)
+    rows = generator.table_rows(plan, table)
+
+    assert isinstance(rows, types.GeneratorType)
+    rows = list(rows)
+    assert len(rows) == plan.counts[table]
+    assert {len(row) for row in rows} <= {len(generator.TABLE_COLUMNS[table])}
+
+
+@pytest.mark.parametrize('backend', generator.BACKENDS)
+@pytest.mark.parametrize('table', list(generator.TABLE_COLUMNS))
+def test_shards_cover_every_row_once(table, backend):
+    plan = make_plan(shards=3, backend=backend)
+
+    ids = [row[0] for row in all_rows(plan, table)]
+
+    # Row i of a table has the same id however the table is sharded
+    assert ids == expected_ids(plan, table)
+
+
+def test_shard_ranges_partition_the_rows():
+    ranges = [generator.shard_range(10, shard, 4) for shard in range(4)]
+
+    assert ranges == [(0, 2), (2, 5), (5, 7), (7, 10)]
+    assert [generator.shard_range(2, shard, 4) for shard in range(4)] == [(0, 0), (0, 1), (1, 1), (1, 2)]
+
+
+def test_shards_are_independent():
+    plan = make_plan(shards=4)
+
+    # A shard is generated the same way whether or not the others run
+    assert list(generator.generate_messages(plan, 2)) == list(generator.generate_messages(plan, 2))
+    assert generator.derive_seed(7, 'messages', 2) != generator.derive_seed(7, 'messages', 3)
+
+
+@pytest.mark.parametrize('backend', generator.BACKENDS)
+def test_same_seed_gives_same_rows(backend):
+    first = all_rows(make_plan(seed=11, shards=2, backend=backend), 'appointments')
+
+    assert first == all_rows(make_plan(seed=11, shards=2, backend=backend), 'appointments')
+    assert first != all_rows(make_plan(seed=12, shards=2, backend=backend), 'appointments')
+
+
+@pytest.mark.parametrize('backend', generator.BACKENDS)
+def test_children_reference_generated_parents(backend):
+    plan = make_plan(shards=3, backend=backend)
+    patients = {row[0] for row in all_rows(plan, 'patient_profiles')}
+    providers = {row[0] for row in all_rows(plan, 'providers')}
+    users = {row[0] for row in all_rows(plan, 'users')}
+
+    for row in all_rows(plan, 'appointments'):
+        assert row[1] in patients and row[2] in providers
+    assert {row[1] for row in all_rows(plan, 'audit_logs')} <= users
+
+
+def test_numpy_rows_are_plain_python_values():
+    plan = make_plan(backend='numpy')
+
+    # Loaders encode str, int, float, bool, datetime and None, not NumPy scalars
+    for table in generator.TABLE_COLUMNS:
+        for row in generator.table_rows(plan, table):
+            assert not any(isinstance(value, np.generic) for value in row), table
+
+
+def test_numpy_ids_are_deterministic_uuid4():
+    plan = make_plan(backend='numpy')
+
+    ids = generator.entity_ids(plan, 'users', np.arange(50))
+
+    assert ids == generator.entity_ids(plan, 'users', np.arange(50))
+    assert {uuid.UUID(value).version for value in ids} == {4}
+    assert len(set(ids)) == 50
+    assert set(ids).isdisjoint(generator.entity_ids(plan, 'providers', np.arange(50)))
+
+
+def test_dependencies_come_first_in_table_order():
+    tables = list(generator.TABLE_COLUMNS)
+
+    assert list(generator.TABLE_DEPENDENCIES) == tables
+    for table, parents in generator.TABLE_DEPENDENCIES.items():
+        assert all(tables.index(parent) < tables.index(table) for parent in parents)
+
+
+def test_critical_path_counts_the_longest_chain():
+    plan = make_plan()
+    counts = plan.counts
+
+    assert generator.critical_path_rows(plan, 'audit_logs') == counts['audit_logs']
+    assert generator.critical_path_rows(plan, 'providers') == counts['providers'] + max(
+        counts['appointments'], counts['medical_records'], counts['medications'])
+    assert generator.critical_path_rows(plan, 'users') == max(
+        generator.critical_path_rows(plan, table) for table in generator.TABLE_COLUMNS)
+
+
+def test_tables_start_once_their_parents_are_loaded(monkeypatch):
+    events = []
+    lock = threading.Lock()
+
+    def load_shard(plan, table, shard, loader, batch_size):
+        with lock:
+            events.append(('start', table))
+        time.sleep(0.01)
+        with lock:
+            events.append(('done', table))
+        return shard + 1
+
+    monkeypatch.setattr(generator, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(generator, 'load_shard', load_shard)
+
+    loaded = generator.load_concurrently(make_plan(shards=2), workers=4)
+
+    assert sorted(loaded) == sorted(generator.TABLE_COLUMNS)
+    assert set(loaded.values()) == {3}
+    for table, parents in generator.TABLE_DEPENDENCIES.items():
+        first_start = events.index(('start', table))
+        for parent in parents:
+            assert max(i for i, event in enumerate(events) if event == ('done', parent)) < first_start
@@ -0,0 +1,96 @@
+"""Running reports with DuckDB on exported table files."""
+
+import gzip
+import json
+
+import pytest
+
+from offline_reports import find_export_files, translate_report_sql
+from report_runner import ReportQuery
+
+USERS_CSV = b'id,role,age\nu1,PATIENT,30\nu2,PROVIDER,41\nu3,PATIENT,\n'
+
+
+def test_export_files_are_grouped_by_table(tmp_path):
+    for name in ('users.csv', 'messages.part-0002.csv.gz', 'messages.part-0001.csv.gz',
+                 'audit_logs.0001.parquet', 'users.delta-20240601T000000.csv', 'notes.txt',
+                 'export_manifest.json.tmp'):
+        (tmp_path / name).write_bytes(b'')
+
+    found = find_export_files(tmp_path)
+
+    assert {table: (file_format, [path.name for path in paths])
+            for table, (file_format, paths) in found.items()} == {
+        'audit_logs': ('parquet', ['audit_logs.0001.parquet']),
+        'messages': ('csv', ['messages.part-0001.csv.gz', 'messages.part-0002.csv.gz']),
+        'users': ('csv', ['users.csv']),
+    }
+
+
+def test_manifest_lists_the_complete_files(tmp_path):
+    for name in ('users.csv', 'messages.0001.csv', 'messages.0002.csv'):
+        (tmp_path / name).write_bytes(b'')
+    # messages.0002.csv is left over from an interrupted run
+    (tmp_path / 'export_manifest.json').write_text(json.dumps({'tables': {
+        'users': [{'file': 'users.csv'}], 'messages': [{'file': 'messages.0001.csv'}]}}))
+
+    found = find_export_files(tmp_path)
+
+    assert [path.name for path in found['messages'][1]] == ['messages.0001.csv']
+
+
+def test_mixed_formats_are_rejected(tmp_path):
+    (tmp_path / 'users.csv').write_bytes(b'')
+    (tmp_path / 'users.parquet').write_bytes(b'')
+
+    with pytest.raises(ValueError, match="users"):
+        find_export_files(tmp_path)
+
+
+@pytest.mark.parametrize('sql, translated', [
+    ('SELECT "startTime"::time FROM appointments',
+     'SELECT time_of_day("startTime") FROM appointments'),
+    ('SELECT a.created::TIME, created::timestamp FROM a',
+     'SELECT time_of_day(a.created), created::timestamp FROM a'),
+])
+def test_translate_report_sql(sql, translated):
+    assert translate_report_sql(sql) == translated
+
+
+@pytest.fixture
+def export_dir(tmp_path):
+    pytest.importorskip('duckdb')
+    (tmp_path / 'users.0001.csv.gz').write_bytes(gzip.compress(USERS_CSV))
+    (tmp_path / 'users.0002.csv.gz').write_bytes(gzip.compress(b'id,role,age\nu4,ADMIN,7\n'))
+    return tmp_path
+
+
+def test_reports_run_on_exported_csv(export_dir):
+    from offline_reports import connect_export, run_offline_reports
+
+    reports = [ReportQuery(1, 'Roles', 'SELECT role, COUNT(*) AS n FROM users GROUP BY role ORDER BY role;'),
+               ReportQuery(2, 'Average', 'SELECT SUM(age) / COUNT(age) AS average FROM users;')]
+    con = connect_export(export_dir)
+
+    dataframes, timings = run_offline_reports(con, reports)
+
+    assert dataframes['Roles'].values.tolist() == [['ADMIN', 1], ['PATIENT', 2], ['PROVIDER', 1]]
+    # Integer division truncates, as in PostgreSQL
+    assert dataframes['Average']['average'].tolist() == [26]
+    assert list(timings) == ['Roles', 'Average']
+
+
+def test_duplicate_titles_are_rejected_before_running(export_dir):
+    from offline_reports import connect_export, run_offline_reports
+
+    reports = [ReportQuery(1, 'Totals', 'SELECT 1'), ReportQuery(2, 'Totals', 'SELECT * FROM missing')]
+
+    with pytest.raises(ValueError, match="Reports 1 and 2"):
+        run_offline_reports(connect_export(export_dir), reports)
+
+
+def test_missing_table_is_reported(export_dir):
+    from offline_reports import connect_export
+
+    with pytest.raises(ValueError, match="appointments"):
+        connect_export(export_dir, tables=['users', 'appointments'])
@@ -0,0 +1,80 @@
+"""Memory-compact dtypes for portal query results."""
+
+import pandas as pd
+
+from portal_dtypes import CATEGORY_MIN_ROWS, compact_dataframe, memory_report
+
+
+def test_known_columns_get_compact_dtypes():
+    df = pd.DataFrame({
+        'role': ['PATIENT', 'PROVIDER', 'PATIENT', 'PATIENT'],
+        'userId': ['u1', 'u1', 'u2', 'u1'],
+        'fileSize': [10.0, None, 2048.0, 7.0],
+        'isRead': [True, False, None, True],
+        'createdAt': ['2024-01-02 03:04:05', '2024-02-03 00:00:00', None, '2024-03-04 12:00:00'],
+    })
+
+    compact = compact_dataframe(df)
+
+    assert compact['role'].dtype == 'category'
+    assert compact['userId'].dtype == 'category'
+    assert str(compact['fileSize'].dtype) == 'Int16'
+    assert compact['fileSize'].isna().tolist() == [False, True, False, False]
+    assert str(compact['isRead'].dtype) == 'boolean'
+    assert compact['createdAt'].dtype.kind == 'M'
+    assert compact.attrs['memory_report']['after_bytes'] < compact.attrs['memory_report']['before_bytes']
+    assert memory_report(compact).startswith('Memory: ')
+    # The input is not modified
+    assert df['role'].dtype != 'category'
+
+
+def test_unparseable_timestamps_are_kept():
+    df = pd.DataFrame({'createdAt': ['2024-01-02 03:04:05', 'yesterday']})
+
+    compact = compact_dataframe(df)
+
+    assert compact['createdAt'].tolist() == ['2024-01-02 03:04:05', 'yesterday']
+
+
+def test_free_text_stays_text():
+    # Few distinct names in a small result still look like free text
+    df = pd.DataFrame({'firstName': ['Ana', 'Ben', 'Ana', 'Ana', 'Ben', 'Ana']})
+
+    assert compact_dataframe(df)['firstName'].dtype == df['firstName'].dtype
+
+
+def test_low_cardinality_text_in_a_large_result_becomes_category():
+    rows = CATEGORY_MIN_ROWS
+    df = pd.DataFrame({
+        'channel': ['email', 'sms'] * (rows // 2),
+        'note': [f'note {i % (rows // 10)}' for i in range(rows)],
+    })
+
+    compact = compact_dataframe(df)
+
+    assert compact['channel'].dtype == 'category'
+    assert compact['note'].dtype == df['note'].dtype
+
+
+def test_unmapped_columns_by_content():
+    df = pd.DataFrame({
+        'visitCount': [1, 2, 3],
+        'clinicId': ['c1', 'c2', 'c3'],
+        'empty': [None, None, None],
+    })
+
+    compact = compact_dataframe(df)
+
+    assert str(compact['visitCount'].dtype) == 'int8'
+    assert compact['clinicId'].tolist() == ['c1', 'c2', 'c3']
+    assert compact['clinicId'].dtype != 'category'
+    assert compact['empty'].dtype == object
+
+
+def test_column_kinds_override_the_schema_map():
+    df = pd.DataFrame({'status': ['a', 'b'], 'code': ['x', 'x']})
+
+    compact = compact_dataframe(df, column_kinds={'status': None, 'code': 'category'})
+
+    assert compact['status'].dtype == df['status'].dtype
+    assert compact['code'].dtype == 'category'
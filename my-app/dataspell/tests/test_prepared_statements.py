@@ -0,0 +1,138 @@
+"""Server-side prepared statements for parameterized queries."""
+
+from contextlib import contextmanager
+
+import pandas as pd
+import psycopg2
+import pytest
+
+import db_config
+from db_config import _prepared_execute, _to_server_placeholders
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        if query.startswith('PREPARE') and self.conn.fail_prepare:
+            raise psycopg2.ProgrammingError("could not determine data type of parameter $1")
+        self.conn.statements.append(query)
+
+
+class FakeConnection:
+    def __init__(self, fail_prepare=False):
+        self.fail_prepare = fail_prepare
+        self.statements = []
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.mark.parametrize('query, sql, signature', [
+    ("SELECT * FROM users WHERE id = %s AND role = %s;",
+     "SELECT * FROM users WHERE id = $1 AND role = $2", 2),
+    ("SELECT * FROM users WHERE id = %(id)s OR \"userId\" = %(id)s AND role = %(role)s",
+     "SELECT * FROM users WHERE id = $1 OR \"userId\" = $1 AND role = $2", ('id', 'role')),
+    ("SELECT 100 %% 7 FROM users WHERE id = %s", "SELECT 100 % 7 FROM users WHERE id = $1", 1),
+    # Placeholders inside literals, quoted identifiers and comments are left alone
+    ("SELECT '%s' AS x FROM t WHERE a = %s -- 100%s", "SELECT '%s' AS x FROM t WHERE a = $1 -- 100%s", 1),
+    ("SELECT 'it''s %s', \"odd %s name\" FROM t /* %s */ WHERE a = %s",
+     "SELECT 'it''s %s', \"odd %s name\" FROM t /* %s */ WHERE a = $1", 1),
+    ("SELECT E'\\'%s', $$%s$$, $q$ %s $q$ FROM t WHERE a = %s",
+     "SELECT E'\\'%s', $$%s$$, $q$ %s $q$ FROM t WHERE a = $1", 1),
+    ("SELECT '100%%' FROM t WHERE a LIKE %s", "SELECT '100%' FROM t WHERE a LIKE $1", 1),
+])
+def test_placeholders_become_server_parameters(query, sql, signature):
+    name, rewritten, names = _to_server_placeholders(query)
+
+    assert rewritten == sql
+    assert names == signature
+    assert name.startswith('dataspell_')
+
+
+def test_mixed_placeholder_styles_are_rejected():
+    with pytest.raises(ValueError):
+        _to_server_placeholders("SELECT %s, %(id)s")
+
+
+def test_statement_is_prepared_once_per_connection():
+    conn = FakeConnection()
+    query = "SELECT * FROM users WHERE id = %(id)s"
+
+    first = _prepared_execute(conn, query, {'id': 'u1'})
+    second = _prepared_execute(conn, query, {'id': 'u2'})
+
+    assert sum(s.startswith('PREPARE') for s in conn.statements) == 1
+    assert first[0] == second[0] == f"EXECUTE {_to_server_placeholders(query)[0]} (%s)"
+    assert (first[1], second[1]) == (['u1'], ['u2'])
+    assert db_config.prepared_statement_count(conn) == 1
+
+
+def test_oldest_statements_are_deallocated(monkeypatch):
+    monkeypatch.setattr(db_config, 'MAX_PREPARED_STATEMENTS', 2)
+    conn = FakeConnection()
+
+    for column in ('a', 'b', 'c'):
+        _prepared_execute(conn, f"SELECT {column} FROM t WHERE id = %s", (1,))
+
+    oldest = _to_server_placeholders("SELECT a FROM t WHERE id = %s")[0]
+    assert conn.statements[-1] == f"DEALLOCATE {oldest}"
+    assert db_config.prepared_statement_count(conn) == 2
+
+
+def test_wrong_parameter_count_is_rejected():
+    with pytest.raises(ValueError):
+        _prepared_execute(FakeConnection(), "SELECT * FROM t WHERE a = %s AND b = %s", (1,))
+
+
+def test_unpreparable_query_falls_back_to_client_binding():
+    conn = FakeConnection(fail_prepare=True)
+
+    assert _prepared_execute(conn, "SELECT * FROM t WHERE a = %s OR %s IS NULL", (1, 1)) is None
+    assert conn.rollbacks == 1
+    assert db_config.prepared_statement_count(conn) == 0
+
+
+@pytest.fixture
+def served(monkeypatch):
+    conn = FakeConnection()
+    calls = []
+
+    @contextmanager
+    def connection(readonly=False):
+        yield conn
+
+    def read_sql(sql, con, params=None):
+        calls.append((sql, params))
+        return pd.DataFrame({'id': [1]})
+
+    monkeypatch.setattr(db_config, 'connection', connection)
+    monkeypatch.setattr(pd, 'read_sql', read_sql)
+    return conn, calls
+
+
+def test_prepare_is_opt_in(served):
+    conn, calls = served
+    db_config.query_to_dataframe("SELECT * FROM t WHERE a = %s", (1,), use_cache=False)
+
+    assert calls == [("SELECT * FROM t WHERE a = %s", (1,))]
+    assert conn.statements == []
+
+
+def test_prepared_query_runs_execute(served):
+    conn, calls = served
+    db_config.query_to_dataframe("SELECT * FROM t WHERE a = %s", (1,), use_cache=False, prepare=True)
+
+    name = _to_server_placeholders("SELECT * FROM t WHERE a = %s")[0]
+    assert calls == [(f"EXECUTE {name} (%s)", [1])]
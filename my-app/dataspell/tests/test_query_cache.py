@@ -0,0 +1,109 @@
+"""Which tables a cached query depends on, and what invalidation drops."""
+
+import pandas as pd
+import pytest
+
+import query_cache
+from query_cache import ANY_TABLE, QueryCache, cache_key, referenced_tables
+
+
+@pytest.mark.parametrize('query, tables', [
+    ("SELECT * FROM appointments a, users u WHERE a.\"userId\" = u.id", {'appointments', 'users'}),
+    ('SELECT * FROM "public"."Users" JOIN sessions s USING (id)', {'users', 'sessions'}),
+    ("SELECT * FROM users u, LATERAL (SELECT * FROM appointments a WHERE a.\"userId\" = u.id) x",
+     {'users', 'appointments'}),
+    ("SELECT * FROM users u CROSS JOIN LATERAL generate_series(1, 3) g, audit_logs",
+     {'users', 'audit_logs'}),
+    ("SELECT * FROM (users u JOIN roles r ON u.role = r.name), teams", {'users', 'roles', 'teams'}),
+    ("SELECT * FROM (SELECT 1 FROM files) AS f (n), users", {'files', 'users'}),
+    ("DELETE FROM audit_logs USING users, sessions WHERE false", {'audit_logs', 'users', 'sessions'}),
+    ("WITH recent AS (SELECT * FROM appointments) SELECT * FROM recent r, users",
+     {'appointments', 'users'}),
+    ("SELECT EXTRACT(EPOCH FROM now() - \"createdAt\") FROM audit_logs", {'audit_logs'}),
+    ("SELECT 'FROM a, b' FROM users", {'users'}),
+    ("SELECT now()", set()),
+])
+def test_referenced_tables(query, tables):
+    assert referenced_tables(query) == tables
+
+
+def test_unparseable_from_list_matches_any_table():
+    assert referenced_tables("SELECT * FROM 42") == {ANY_TABLE}
+
+
+def test_invalidate_drops_every_table_of_a_comma_join():
+    cache = QueryCache(cache_dir=None)
+    df = pd.DataFrame({'id': [1]})
+    cache.put("SELECT * FROM appointments a, users u", df)
+    cache.put("SELECT * FROM appointments", df)
+
+    assert cache.invalidate('users') == 1
+    assert cache.get("SELECT * FROM appointments a, users u") is None
+    assert cache.get("SELECT * FROM appointments") is not None
+
+
+def test_invalidate_drops_entries_with_unknown_tables():
+    cache = QueryCache(cache_dir=None)
+    df = pd.DataFrame({'id': [1]})
+    cache.put("SELECT * FROM 42", df)
+    cache.put("SELECT * FROM files", df)
+
+    assert cache.invalidate('users') == 1
+    assert cache.get("SELECT * FROM 42") is None
+    assert cache.get("SELECT * FROM files") is not None
+
+
+def test_formatting_differences_share_a_key():
+    assert cache_key("SELECT *\n  FROM users; -- all") == cache_key("SELECT * FROM users")
+    assert cache_key("SELECT 'a  b'") != cache_key("SELECT 'a b'")
+    assert cache_key("SELECT %s", (1,)) != cache_key("SELECT %s", (2,))
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    cache = QueryCache(cache_dir=None, default_ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, 'time', lambda: now[0])
+    cache.put("SELECT * FROM users", pd.DataFrame({'id': [1]}))
+
+    now[0] += 9
+    assert cache.get("SELECT * FROM users") is not None
+    now[0] += 2
+    assert cache.get("SELECT * FROM users") is None
+    assert cache.stats()['expired'] == 1
+
+
+def test_cached_result_is_a_copy():
+    cache = QueryCache(cache_dir=None)
+    cache.put("SELECT * FROM users", pd.DataFrame({'id': [1]}))
+
+    df = cache.get("SELECT * FROM users")
+    df.loc[0, 'id'] = 2
+
+    assert cache.get("SELECT * FROM users")['id'].tolist() == [1]
+
+
+def test_evicted_entries_spill_to_parquet_and_come_back(tmp_path):
+    pytest.importorskip('pyarrow')
+    first = pd.DataFrame({'id': range(1000), 'user id': range(1000)})
+    nbytes = int(first.memory_usage(index=True, deep=True).sum())
+    cache = QueryCache(max_bytes=nbytes, cache_dir=tmp_path)
+
+    cache.put("SELECT * FROM users", first)
+    cache.put("SELECT * FROM files", first.copy())
+
+    stats = cache.stats()
+    assert (stats['evictions'], stats['spills'], stats['disk_entries']) == (1, 1, 1)
+    restored = cache.get("SELECT * FROM users")
+    assert list(restored.columns) == ['id', 'user id']
+    assert restored['id'].tolist() == list(range(1000))
+    assert cache.stats()['disk_hits'] == 1
+
+
+def test_invalidate_drops_spilled_entries(tmp_path):
+    pytest.importorskip('pyarrow')
+    cache = QueryCache(max_bytes=1, cache_dir=tmp_path)
+    cache.put("SELECT * FROM users", pd.DataFrame({'id': [1]}))
+
+    assert cache.stats()['disk_entries'] == 1
+    assert cache.invalidate('users') == 1
+    assert cache.get("SELECT * FROM users") is None
@@ -0,0 +1,114 @@
+"""Per-query metric records and which queries explain mode may run a second time."""
+
+import pytest
+
+from query_metrics import MemorySink, QueryRecorder, _is_read_only, query_hash, query_label
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.statements.append(query)
+
+    def fetchone(self):
+        return ([{'Plan': {}, 'Execution Time': 12.5}],)
+
+
+class FakeConnection:
+    autocommit = False
+
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.statements.append('<rollback>')
+
+
+@pytest.mark.parametrize('query', [
+    "SELECT * FROM users",
+    "  -- recent\nselect 1;",
+    "VALUES (1), (2)",
+    "TABLE users",
+    "WITH recent AS (SELECT * FROM appointments) SELECT * FROM recent",
+    # Keywords inside literals and quoted identifiers do not count
+    "WITH x AS (SELECT 'delete me' AS \"update\") SELECT * FROM x",
+])
+def test_reads_are_read_only(query):
+    assert _is_read_only(query)
+
+
+@pytest.mark.parametrize('query', [
+    "INSERT INTO users DEFAULT VALUES",
+    "UPDATE users SET role = 'PATIENT'",
+    "WITH moved AS (DELETE FROM audit_logs RETURNING *) SELECT count(*) FROM moved",
+    "with x as (update users set role = role returning id) select * from x",
+    "WITH x AS (INSERT INTO users DEFAULT VALUES RETURNING id) SELECT * FROM x",
+    "WITH src AS (SELECT 1) MERGE INTO users u USING src ON false WHEN NOT MATCHED THEN DO NOTHING",
+])
+def test_writes_are_not_read_only(query):
+    assert not _is_read_only(query)
+
+
+def test_measurement_records_label_result_and_error():
+    sink = MemorySink()
+    recorder = QueryRecorder(sink)
+
+    with query_label('Monthly totals'):
+        with recorder.measure("SELECT *\n FROM users;", 'read_sql') as measurement:
+            measurement.add_result(3, 120)
+    with pytest.raises(ZeroDivisionError):
+        with recorder.measure("SELECT 1 / 0", 'read_sql'):
+            1 / 0
+
+    first, second = sink.records
+    assert first['label'] == 'Monthly totals'
+    assert first['query'] == 'SELECT * FROM users'
+    assert first['query_hash'] == query_hash('SELECT * FROM users')
+    assert (first['rows'], first['bytes'], first['error']) == (3, 120, None)
+    assert first['wall_seconds'] >= 0
+    assert second['label'] is None
+    assert second['error'].startswith('ZeroDivisionError')
+
+
+def test_explain_mode_records_server_time_in_read_only_transaction():
+    sink = MemorySink()
+    conn = FakeConnection()
+
+    with QueryRecorder(sink, explain=True).measure("SELECT * FROM users", 'read_sql') as measurement:
+        measurement.capture_plan(conn)
+
+    assert sink.records[0]['server_seconds'] == 0.0125
+    explain = conn.statements.index('SET TRANSACTION READ ONLY;')
+    assert conn.statements[explain + 1].startswith('EXPLAIN (ANALYZE')
+    assert conn.statements[-1] == '<rollback>'
+
+
+def test_explain_mode_skips_writes():
+    conn = FakeConnection()
+
+    with QueryRecorder(MemorySink(), explain=True).measure("DELETE FROM users", 'read_sql') as measurement:
+        measurement.capture_plan(conn)
+
+    assert conn.statements == []
+
+
+def test_summary_groups_calls_per_query():
+    sink = MemorySink()
+    recorder = QueryRecorder(sink)
+    for query in ("SELECT 1", "  SELECT 1;", "SELECT 2"):
+        with recorder.measure(query, 'read_sql'):
+            pass
+
+    summary = sink.summary()
+    assert sorted(summary['calls']) == [1, 2]
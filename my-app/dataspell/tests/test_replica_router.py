@@ -0,0 +1,132 @@
+"""Replica lag probing of the read replica router."""
+
+import pytest
+
+import db_config
+
+
+class FakeCursor:
+    def __init__(self, lag=1.5):
+        self.lag = lag
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchone(self):
+        return (self.lag,)
+
+
+class FakeConnection:
+    closed = 0
+
+    def __init__(self, host=None, lag=1.5):
+        self.host = host
+        self.lag = lag
+
+    def cursor(self):
+        return FakeCursor(self.lag)
+
+    def close(self):
+        self.closed = 1
+
+
+def test_busy_replica_pool_does_not_mark_replica_down(monkeypatch):
+    probes = []
+
+    def connect(params=None, **options):
+        conn = FakeConnection()
+        probes.append((conn, options))
+        return conn
+
+    monkeypatch.setattr(db_config, '_connect', connect)
+    router = db_config.ReplicaRouter([{'host': 'replica1'}], probe_timeout_seconds=3)
+    params = router.endpoints[0]
+
+    # Every pooled connection to the replica is checked out
+    pool = db_config.ConnectionPool(params, minconn=0, maxconn=1)
+    monkeypatch.setitem(db_config._pools, db_config._pool_key(params), pool)
+    pool.acquire()
+
+    assert router.lag(params) == 1.5
+    assert router.candidates() == [params]
+
+    # The pool's own connection, then the probe's dedicated one
+    assert len(probes) == 2
+    conn, options = probes[1]
+    assert options['connect_timeout'] == 3
+    assert conn.closed
+
+
+def test_unreachable_replica_is_skipped(monkeypatch):
+    def connect(params=None, **options):
+        raise OSError("connection refused")
+
+    monkeypatch.setattr(db_config, '_connect', connect)
+    router = db_config.ReplicaRouter([{'host': 'replica1'}])
+
+    assert router.lag(router.endpoints[0]) is None
+    assert router.candidates() == []
+
+
+@pytest.fixture
+def hosts(monkeypatch):
+    """Replay lag per host; a host missing from the dict is unreachable."""
+    lags = {'primary': 0}
+
+    def connect(params=None, **options):
+        host = (params or db_config.DB_PARAMS)['host']
+        if host not in lags:
+            raise OSError("connection refused")
+        return FakeConnection(host, lags[host])
+
+    monkeypatch.setattr(db_config, '_connect', connect)
+    monkeypatch.setitem(db_config.DB_PARAMS, 'host', 'primary')
+    yield lags
+    db_config.configure_replicas([])
+    db_config.close_pool()
+
+
+def test_lagging_replica_is_skipped(hosts):
+    hosts.update({'replica1': 45.0, 'replica2': 0.5})
+    router = db_config.ReplicaRouter([{'host': 'replica1'}, {'host': 'replica2'}], max_lag_seconds=30)
+
+    assert [params['host'] for params in router.candidates()] == ['replica2']
+
+
+def test_least_loaded_replica_is_preferred(hosts):
+    hosts.update({'replica1': 0, 'replica2': 0})
+    db_config.configure_replicas([{'host': 'replica1'}, {'host': 'replica2'}])
+
+    first = db_config.get_read_connection()
+    second = db_config.get_read_connection()
+
+    assert {first.raw_connection.host, second.raw_connection.host} == {'replica1', 'replica2'}
+    first.close()
+    second.close()
+
+
+def test_reads_fall_back_to_primary(hosts):
+    db_config.configure_replicas([{'host': 'replica1'}])
+
+    conn = db_config.get_read_connection()
+
+    assert conn.raw_connection.host == 'primary'
+    assert db_config.replica_status()[0]['lag_seconds'] is None
+    conn.close()
+
+
+def test_use_primary_bypasses_replicas(hosts):
+    hosts['replica1'] = 0
+    db_config.configure_replicas([{'host': 'replica1'}])
+
+    with db_config.use_primary():
+        conn = db_config.get_read_connection()
+
+    assert conn.raw_connection.host == 'primary'
+    conn.close()
@@ -0,0 +1,96 @@
+"""Splitting report files and running their reports concurrently."""
+
+import threading
+import time
+
+import pytest
+
+import report_runner
+from report_runner import ReportQuery, split_report_file
+
+REPORT_FILE = """\
+-- Patient Analytics Queries
+-- Shared description, not a report
+
+-- 1. Active Patients
+SELECT count(*)
+FROM users;
+
+-- 2. Roles
+-- grouped by role
+SELECT role, count(*) FROM users GROUP BY role;
+
+-- 3. Empty report
+"""
+
+
+@pytest.fixture
+def fake_queries(monkeypatch):
+    state = {'running': 0, 'peak': 0, 'sql': []}
+    lock = threading.Lock()
+
+    def query_to_dataframe(sql):
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+            state['sql'].append(sql)
+        time.sleep(0.02)
+        with lock:
+            state['running'] -= 1
+        return sql
+
+    monkeypatch.setattr(report_runner, 'query_to_dataframe', query_to_dataframe)
+    return state
+
+
+def test_split_report_file(tmp_path):
+    path = tmp_path / 'patients.sql'
+    path.write_text(REPORT_FILE)
+
+    assert split_report_file(path) == [
+        ReportQuery(1, 'Active Patients', 'SELECT count(*)\nFROM users;'),
+        ReportQuery(2, 'Roles', '-- grouped by role\nSELECT role, count(*) FROM users GROUP BY role;'),
+    ]
+
+
+def test_shipped_report_files_have_unique_titles():
+    for path in sorted(report_runner.QUERIES_DIR.glob('*.sql')):
+        report_runner.check_unique_titles(split_report_file(path))
+
+
+def test_results_keep_file_order(fake_queries):
+    reports = [ReportQuery(n, f'Report {n}', f'SELECT {n}') for n in (3, 1, 2)]
+
+    dataframes, timings = report_runner.run_reports(reports, parallelism=3)
+
+    assert list(dataframes.items()) == [('Report 3', 'SELECT 3'), ('Report 1', 'SELECT 1'),
+                                        ('Report 2', 'SELECT 2')]
+    assert list(timings) == ['Report 3', 'Report 1', 'Report 2']
+    assert fake_queries['peak'] > 1
+
+
+def test_parallelism_is_capped_at_pool_size(fake_queries, monkeypatch):
+    monkeypatch.setitem(report_runner.POOL_PARAMS, 'maxconn', 2)
+    reports = [ReportQuery(n, f'Report {n}', f'SELECT {n}') for n in range(6)]
+
+    report_runner.run_reports(reports, parallelism=6)
+
+    assert fake_queries['peak'] <= 2
+
+
+def test_duplicate_titles_are_rejected(fake_queries):
+    reports = [ReportQuery(1, 'Totals', 'SELECT 1'), ReportQuery(4, 'Totals', 'SELECT 4')]
+
+    with pytest.raises(ValueError, match="Reports 1 and 4"):
+        report_runner.run_reports(reports)
+    assert fake_queries['sql'] == []
+
+
+def test_failed_report_raises(monkeypatch):
+    def query_to_dataframe(sql):
+        raise RuntimeError(sql)
+
+    monkeypatch.setattr(report_runner, 'query_to_dataframe', query_to_dataframe)
+
+    with pytest.raises(RuntimeError, match='SELECT 1'):
+        report_runner.run_reports([ReportQuery(1, 'Broken', 'SELECT 1')])
@@ -0,0 +1,113 @@
+"""Chunked reading of query results over a named cursor."""
+
+from collections import namedtuple
+from contextlib import contextmanager
+
+import pandas as pd
+import pytest
+
+import db_config
+
+Column = namedtuple('Column', ['name'])
+
+
+class FakeNamedCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.description = None
+        self.fetch_sizes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        self.query = query
+
+    def fetchmany(self, size):
+        self.fetch_sizes.append(size)
+        self.description = [Column('id'), Column('role')]
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cursor_obj = FakeNamedCursor(rows)
+        self.cursor_names = []
+
+    def cursor(self, name=None):
+        self.cursor_names.append(name)
+        return self.cursor_obj
+
+
+@pytest.fixture
+def serve_rows(monkeypatch):
+    def serve(rows):
+        conn = FakeConnection(rows)
+
+        @contextmanager
+        def connection(readonly=False):
+            yield conn
+
+        monkeypatch.setattr(db_config, 'connection', connection)
+        return conn
+
+    return serve
+
+
+def test_stream_query_yields_bounded_chunks(serve_rows):
+    conn = serve_rows([(i, 'PATIENT') for i in range(5)])
+
+    chunks = list(db_config.stream_query("SELECT id, role FROM users", chunksize=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert list(chunks[0].columns) == ['id', 'role']
+    assert pd.concat(chunks)['id'].tolist() == [0, 1, 2, 3, 4]
+    # Rows are read through a server-side cursor, never all at once
+    assert conn.cursor_names[0].startswith('dataspell_stream_')
+    assert set(conn.cursor_obj.fetch_sizes) == {2}
+
+
+def test_stream_query_yields_empty_frame_with_columns(serve_rows):
+    serve_rows([])
+
+    chunks = list(db_config.stream_query("SELECT id, role FROM users WHERE false"))
+
+    assert len(chunks) == 1
+    assert chunks[0].empty
+    assert list(chunks[0].columns) == ['id', 'role']
+
+
+def test_stream_query_rejects_non_positive_chunksize(serve_rows):
+    serve_rows([])
+
+    with pytest.raises(ValueError):
+        next(db_config.stream_query("SELECT 1", chunksize=0))
+
+
+def test_reduce_query_folds_chunks(serve_rows):
+    serve_rows([(i, 'PATIENT' if i % 2 else 'PROVIDER') for i in range(7)])
+
+    counts = db_config.reduce_query(
+        "SELECT id, role FROM users",
+        lambda total, chunk: total.add(chunk['role'].value_counts(), fill_value=0),
+        initial=pd.Series(dtype='float64'),
+        chunksize=3,
+    )
+
+    assert counts.to_dict() == {'PATIENT': 3, 'PROVIDER': 4}
+
+
+def test_reduce_query_starts_from_first_chunk(serve_rows):
+    serve_rows([(i, 'PATIENT') for i in range(5)])
+
+    total = db_config.reduce_query(
+        "SELECT id, role FROM users",
+        lambda total, chunk: pd.concat([total, chunk]),
+        chunksize=2,
+    )
+
+    assert total['id'].tolist() == [0, 1, 2, 3, 4]
@@ -0,0 +1,92 @@
+"""Drawing columns of fake values with NumPy."""
+
+import string
+import uuid
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from vector_synthesis import (build_pool, choose, keyed_uuid_bytes, offset_dates, offset_times, pattern_strings,
+                              random_uuid_bytes, uuid_strings, vocabulary, with_nulls)
+
+KEY = 0x0123456789abcdef_fedcba9876543210
+
+
+def test_uuid_strings_match_the_uuid_module():
+    data = random_uuid_bytes(np.random.default_rng(1), 20)
+
+    assert uuid_strings(data) == [str(uuid.UUID(bytes=bytes(row))) for row in data]
+    assert {uuid.UUID(value).version for value in uuid_strings(data)} == {4}
+    assert {uuid.UUID(value).variant for value in uuid_strings(data)} == {uuid.RFC_4122}
+
+
+def test_keyed_uuids_depend_on_key_and_index():
+    indexes = np.arange(1000)
+
+    first = keyed_uuid_bytes(KEY, indexes)
+
+    assert first.shape == (1000, 16)
+    assert np.array_equal(first, keyed_uuid_bytes(KEY, indexes))
+    # Any index gives the same UUID whichever batch it is computed in
+    assert np.array_equal(first[500:], keyed_uuid_bytes(KEY, indexes[500:]))
+    assert len({bytes(row) for row in first}) == 1000
+    assert not np.array_equal(first, keyed_uuid_bytes(KEY + 1, indexes))
+    assert not np.array_equal(first, keyed_uuid_bytes(KEY + (1 << 64), indexes))
+
+
+def test_pattern_strings_follow_the_pattern():
+    codes = pattern_strings(np.random.default_rng(2), 'RX-??##', 200)
+
+    assert len(codes) == 200
+    for code in codes:
+        assert code[:3] == 'RX-'
+        assert all(character in string.ascii_letters for character in code[3:5])
+        assert code[5:].isdigit()
+    assert len(set(codes)) > 100
+
+
+def test_empty_pattern_gives_empty_strings():
+    assert pattern_strings(np.random.default_rng(2), '', 3) == ['', '', '']
+
+
+def test_choose_draws_from_the_vocabulary():
+    rng = np.random.default_rng(3)
+
+    drawn = choose(rng, ['a', 'b', 'c'], 500)
+
+    assert set(drawn.tolist()) == {'a', 'b', 'c'}
+    assert choose(rng, vocabulary([('x', 1)]), 2).tolist() == [('x', 1), ('x', 1)]
+
+
+def test_pool_calls_the_factory_once_per_value():
+    calls = iter(range(10))
+
+    pool = build_pool(lambda: next(calls), size=5)
+
+    assert pool.tolist() == [0, 1, 2, 3, 4]
+
+
+def test_with_nulls_gives_python_values():
+    values = with_nulls(np.array([1, 2, 3]), np.array([True, False, True]))
+
+    assert values == [1, None, 3]
+    assert all(type(value) is int for value in values if value is not None)
+
+
+def test_offsets_become_datetimes_and_dates():
+    start = datetime(2024, 6, 1, 12, 0, 0)
+
+    times = with_nulls(offset_times(start, np.array([0, -1, 90]), unit='s'), np.array([True, True, False]))
+    dates = offset_dates(start, np.array([0, 31])).tolist()
+
+    assert times == [start, datetime(2024, 6, 1, 11, 59, 59), None]
+    assert dates == [date(2024, 6, 1), date(2024, 7, 2)]
+
+
+@pytest.mark.parametrize('unit, offset, expected', [
+    ('D', 2, datetime(2024, 6, 3, 12, 0)),
+    ('m', -30, datetime(2024, 6, 1, 11, 30)),
+])
+def test_offset_units(unit, offset, expected):
+    assert offset_times(datetime(2024, 6, 1, 12, 0), np.array([offset]), unit=unit).tolist() == [expected]